@@ -1,22 +1,29 @@
 from abc import ABC, abstractmethod
-from copy import deepcopy
+from array import array
 from dataclasses import dataclass, field
 from enum import Enum
 from itertools import groupby
 from random import randint
-from typing import List
-import logging
+from typing import Dict, List, Tuple
+from engine.score_table import RollScores, RollScoreTable, get_roll_key
 from state.yahtzee.player import Player
 
 NO_BONUS_AMOUNT = 0
 MINIMUM_UPPER_SECTION_SCORE_FOR_BONUS = 63
 UPPER_SECTION_BONUS_POINTS = 35
 
+DICE_PER_ROLL = 5
+
+
 @dataclass(init=False)
 class Die():
+    # Dice are created by the thousand, so they only carry their id and face value, or for a die of a Roll, the
+    # Roll's bytes that its face value is read from and written to
+    __slots__ = ("_die_id", "_face_value", "_face_values")
+
     def __init__(self, die_id: int, face_value: int = None):
+        self._face_values = None
         self.die_id = die_id
-        self.log = logging.getLogger(__name__)
 
         if face_value == None:
             face_value = Die._get_random_face_value()
@@ -32,14 +39,30 @@ class Die():
         if 1 <= id <= 5:
             self._die_id = id
 
+    @staticmethod
+    def view(face_values: bytearray, die_id: int) -> "Die":
+        """
+        Die die_id of a Roll's face_values. Rolling it or setting its face value changes the Roll.
+        """
+        die = Die.__new__(Die)
+        die._die_id = die_id
+        die._face_value = None
+        die._face_values = face_values
+        return die
+
     @property
     def face_value(self) -> int:
+        if self._face_values is not None:
+            return self._face_values[self._die_id - 1]
         return self._face_value
 
     @face_value.setter
     def face_value(self, value: int):
         if 1 <= value <= 6:
-            self._face_value = value
+            if self._face_values is not None:
+                self._face_values[self._die_id - 1] = value
+            else:
+                self._face_value = value
 
     def roll(self):
         rolled_face_value = Die._get_random_face_value()
@@ -62,25 +85,76 @@ class Die():
             "face_value": self.face_value
         }
 
-@dataclass(frozen=True, init=True)
 class Roll():
-    dice: List[Die] = field(default_factory=lambda: Roll._get_default_dice())
+    """
+    A roll is stored as five bytes, the face value of die 1 through die 5.
+    The Die objects handed out by dice and get_die_by_id are views of those bytes (see Die.view): rolling one, or
+    setting its face value, changes the roll.
+    """
+    __slots__ = ("_face_values",)
+
+    def __init__(self, dice: List[Die] = None):
+        if dice is None:
+            self._face_values = bytearray(Die._get_random_face_value() for i in range(DICE_PER_ROLL))
+        else:
+            if len(dice) != DICE_PER_ROLL:
+                raise ValueError(f"A roll needs {DICE_PER_ROLL} dice, got {len(dice)}")
+            self._face_values = bytearray(DICE_PER_ROLL)
+            try:
+                for die in dice:
+                    self._face_values[die.die_id - 1] = die.face_value
+            except AttributeError as error:
+                # Die leaves out an id or face value that is out of range
+                raise ValueError(f"A roll needs dice with ids from 1 to {DICE_PER_ROLL} and face values from 1 to 6") from error
+            Roll._check_face_values(self._face_values)
 
     @staticmethod
-    def _get_default_dice() -> List[Die]:
-        return [Die(1), Die(2), Die(3), Die(4), Die(5)]
+    def from_face_values(face_values) -> "Roll":
+        roll = Roll.__new__(Roll)
+        roll._face_values = bytearray(face_values)
+        Roll._check_face_values(roll._face_values)
+        return roll
+
+    @staticmethod
+    def _check_face_values(face_values: bytearray):
+        # A die id that was left out, or given twice, leaves a 0 behind
+        if len(face_values) != DICE_PER_ROLL or min(face_values) < 1 or max(face_values) > 6:
+            raise ValueError(f"A roll needs {DICE_PER_ROLL} dice, one per id, with face values from 1 to 6, "
+                             f"got {list(face_values)}")
+
+    @property
+    def dice(self) -> List[Die]:
+        return [Die.view(self._face_values, die_id) for die_id in range(1, DICE_PER_ROLL + 1)]
+
+    def get_face_values(self) -> bytes:
+        return bytes(self._face_values)
 
     def roll_selected_dice(self, dice_to_roll: List[Die]):
-        return [die.roll() if die in dice_to_roll else die for die in self.dice]
+        for die in dice_to_roll:
+            if die is not None:
+                self._face_values[die.die_id - 1] = Die._get_random_face_value()
+        return self.dice
+
+    def get_key(self) -> int:
+        return get_roll_key(self._face_values)
 
     def get_die_by_id(self, id: int):
-        for d in self.dice:
-            if d.die_id == id:
-                return d
+        if 1 <= id <= DICE_PER_ROLL:
+            return Die.view(self._face_values, id)
         return None
 
+    def __eq__(self, other):
+        if not isinstance(other, Roll):
+            return NotImplemented
+
+        return self._face_values == other._face_values
+
+    def __repr__(self):
+        return f"Roll({list(self._face_values)})"
+
     def to_dict(self):
-        return [die.to_dict() for die in self.dice]
+        return [{"die_id": die_id, "face_value": face_value}
+                for die_id, face_value in enumerate(self._face_values, start=1)]
 
 
 class ScoreType(Enum):
@@ -104,11 +178,14 @@ class SectionType(Enum):
 
 @dataclass
 class Score(ABC):
-    _selected_roll: Roll = None
+    # The face values of the selected roll, see Roll.get_face_values
+    _selected_roll: bytes = None
 
     @property
     def selected_roll(self) -> Roll:
-        return self._selected_roll
+        if self._selected_roll is None:
+            return None
+        return Roll.from_face_values(self._selected_roll)
 
     @property
     @abstractmethod
@@ -120,16 +197,16 @@ class Score(ABC):
     def section_type(self) -> SectionType:
         pass
 
-    @abstractmethod
     def is_valid_for_roll(self, roll: Roll) -> bool:
-        pass
+        return self._is_valid_for_roll_scores(ROLL_SCORE_TABLE.lookup(roll))
 
     def calculate_points(self) -> int:
         if self._selected_roll is None:
             return None
 
-        if self.is_valid_for_roll(self._selected_roll):
-            return self._calculate_points_internal(self._selected_roll)
+        roll_scores = ROLL_SCORE_TABLE.lookup_face_values(self._selected_roll)
+        if self._is_valid_for_roll_scores(roll_scores):
+            return roll_scores.points[ROLL_SCORE_TABLE.get_column(self.score_type())]
         else:
             return 0
 
@@ -141,15 +218,25 @@ class Score(ABC):
     def calculate_yahtzee_bonus_points(self, input_roll) -> int:
         return self._calculate_points_internal(input_roll)
 
+    def _calculate_points_internal(self, input_roll) -> int:
+        return ROLL_SCORE_TABLE.lookup(input_roll).points[ROLL_SCORE_TABLE.get_column(self.score_type())]
+
+    def _is_valid_for_roll_scores(self, roll_scores: RollScores) -> bool:
+        return roll_scores.is_valid[ROLL_SCORE_TABLE.get_column(self.score_type())]
 
+    # The scoring rules. These are only used to build ROLL_SCORE_TABLE, everything else looks the answers up there.
     @abstractmethod
-    def _calculate_points_internal(self, input_roll) -> int:
+    def _is_valid_for_face_values(self, face_values: Tuple[int, ...]) -> bool:
+        pass
+
+    @abstractmethod
+    def _calculate_points_for_face_values(self, face_values: Tuple[int, ...]) -> int:
         pass
 
     @selected_roll.setter
     def selected_roll(self, roll: Roll):
         if self._selected_roll is None and roll is not None:
-            self._selected_roll = roll
+            self._selected_roll = roll.get_face_values()
 
     def to_dict(self):
         return {
@@ -163,11 +250,11 @@ class UpperSectionScore(Score, ABC):
     def section_type(self) -> SectionType:
         return SectionType.UPPER
 
-    def is_valid_for_roll(self, roll: Roll) -> bool:
+    def _is_valid_for_face_values(self, face_values: Tuple[int, ...]) -> bool:
         return True
 
-    def _calculate_points_internal(self, input_roll) -> int:
-        return sum([die.face_value for die in input_roll.dice if die.face_value == self._die_value()])
+    def _calculate_points_for_face_values(self, face_values: Tuple[int, ...]) -> int:
+        return sum([face_value for face_value in face_values if face_value == self._die_value()])
 
     @abstractmethod
     def _die_value(self) -> int:
@@ -223,12 +310,9 @@ class SixesScore(UpperSectionScore):
 
 @dataclass
 class GroupedScore(Score, ABC):
-    def _get_length_of_groups_of_dice(self, roll: Roll) -> List[int]:
-        #sort dice by face value
-        dicelist = sorted(roll.dice, key=lambda die: die.face_value, reverse=True)
-
+    def _get_length_of_groups_of_dice(self, face_values: Tuple[int, ...]) -> List[int]:
         # Group dice by their face value
-        grouped_dice = [list(iterator) for key, iterator in groupby(dicelist, lambda die: die.face_value)]
+        grouped_dice = [list(iterator) for key, iterator in groupby(sorted(face_values, reverse=True))]
 
         # Get the length of each group of dice
         return [len(group_of_dice) for group_of_dice in grouped_dice]
@@ -242,13 +326,13 @@ class ThreeOfAKindScore(GroupedScore):
     def score_type(self) -> ScoreType:
         return ScoreType.THREE_OF_A_KIND
 
-    def is_valid_for_roll(self, roll: Roll) -> bool:
-        length_of_groups_of_dice = self._get_length_of_groups_of_dice(roll)
+    def _is_valid_for_face_values(self, face_values: Tuple[int, ...]) -> bool:
+        length_of_groups_of_dice = self._get_length_of_groups_of_dice(face_values)
 
         return len([length_of_group_of_dice for length_of_group_of_dice in length_of_groups_of_dice if length_of_group_of_dice >= 3]) == 1
 
-    def _calculate_points_internal(self, input_roll) -> int:
-        return sum([die.face_value for die in input_roll.dice])
+    def _calculate_points_for_face_values(self, face_values: Tuple[int, ...]) -> int:
+        return sum(face_values)
 
 @dataclass
 class FourOfAKindScore(GroupedScore):
@@ -258,14 +342,14 @@ class FourOfAKindScore(GroupedScore):
     def score_type(self) -> ScoreType:
         return ScoreType.FOUR_OF_A_KIND
 
-    def is_valid_for_roll(self, roll: Roll) -> bool:
-        length_of_groups_of_dice = self._get_length_of_groups_of_dice(roll)
+    def _is_valid_for_face_values(self, face_values: Tuple[int, ...]) -> bool:
+        length_of_groups_of_dice = self._get_length_of_groups_of_dice(face_values)
 
         # One group of 4 or more dice
         return len([length_of_group_of_dice for length_of_group_of_dice in length_of_groups_of_dice if length_of_group_of_dice >= 4]) == 1
 
-    def _calculate_points_internal(self, input_roll) -> int:
-        return sum([die.face_value for die in input_roll.dice])
+    def _calculate_points_for_face_values(self, face_values: Tuple[int, ...]) -> int:
+        return sum(face_values)
 
 @dataclass
 class FullHouseScore(GroupedScore):
@@ -277,17 +361,18 @@ class FullHouseScore(GroupedScore):
     def score_type(self) -> ScoreType:
         return ScoreType.FULL_HOUSE
 
-    def is_valid_for_roll(self, roll: Roll) -> bool:
-        if(not self.is_yahtzee_bonus):
-            length_of_groups_of_dice = self._get_length_of_groups_of_dice(roll)
+    def _is_valid_for_roll_scores(self, roll_scores: RollScores) -> bool:
+        # Any roll counts as a full house when it is scored as a yahtzee bonus
+        return self.is_yahtzee_bonus or super()._is_valid_for_roll_scores(roll_scores)
 
-            # Two groups of dice: one with 3 dice and one with 2 dice
-            return len([length_of_group_of_dice for length_of_group_of_dice in length_of_groups_of_dice if length_of_group_of_dice == 3]) == 1 and \
-                   len([length_of_group_of_dice for length_of_group_of_dice in length_of_groups_of_dice if length_of_group_of_dice == 2]) == 1
-        else:
-            return True
+    def _is_valid_for_face_values(self, face_values: Tuple[int, ...]) -> bool:
+        length_of_groups_of_dice = self._get_length_of_groups_of_dice(face_values)
 
-    def _calculate_points_internal(self, input_roll) -> int:
+        # Two groups of dice: one with 3 dice and one with 2 dice
+        return len([length_of_group_of_dice for length_of_group_of_dice in length_of_groups_of_dice if length_of_group_of_dice == 3]) == 1 and \
+               len([length_of_group_of_dice for length_of_group_of_dice in length_of_groups_of_dice if length_of_group_of_dice == 2]) == 1
+
+    def _calculate_points_for_face_values(self, face_values: Tuple[int, ...]) -> int:
         return 25
 
 @dataclass
@@ -300,21 +385,21 @@ class SmallStraightScore(Score):
     def score_type(self) -> ScoreType:
         return ScoreType.SMALL_STRAIGHT
 
-    def is_valid_for_roll(self, roll: Roll) -> bool:
-        if (not self.is_yahtzee_bonus):
-            small_straight_variation_one_die_face_values = set([1, 2, 3, 4])
-            small_straight_variation_two_die_face_values = set([2, 3, 4, 5])
-            small_straight_variation_three_die_face_values = set([3, 4, 5, 6])
+    def _is_valid_for_roll_scores(self, roll_scores: RollScores) -> bool:
+        return self.is_yahtzee_bonus or super()._is_valid_for_roll_scores(roll_scores)
 
-            roll_face_values = set([die.face_value for die in roll.dice])
+    def _is_valid_for_face_values(self, face_values: Tuple[int, ...]) -> bool:
+        small_straight_variation_one_die_face_values = set([1, 2, 3, 4])
+        small_straight_variation_two_die_face_values = set([2, 3, 4, 5])
+        small_straight_variation_three_die_face_values = set([3, 4, 5, 6])
 
-            return (small_straight_variation_one_die_face_values <= roll_face_values) or \
-                   (small_straight_variation_two_die_face_values <= roll_face_values) or \
-                   (small_straight_variation_three_die_face_values <= roll_face_values)
-        else:
-            return True
+        roll_face_values = set(face_values)
 
-    def _calculate_points_internal(self, input_roll) -> int:
+        return (small_straight_variation_one_die_face_values <= roll_face_values) or \
+               (small_straight_variation_two_die_face_values <= roll_face_values) or \
+               (small_straight_variation_three_die_face_values <= roll_face_values)
+
+    def _calculate_points_for_face_values(self, face_values: Tuple[int, ...]) -> int:
         return 30
 
 @dataclass
@@ -327,21 +412,19 @@ class LargeStraightScore(Score):
     def score_type(self) -> ScoreType:
         return ScoreType.LARGE_STRAIGHT
 
-    def is_valid_for_roll(self, roll: Roll) -> bool:
-        if (not self.is_yahtzee_bonus):
-
-            large_straight_variation_one_die_face_values = set([1, 2, 3, 4, 5])
-            large_straight_variation_two_die_face_values = set([2, 3, 4, 5, 6])
+    def _is_valid_for_roll_scores(self, roll_scores: RollScores) -> bool:
+        return self.is_yahtzee_bonus or super()._is_valid_for_roll_scores(roll_scores)
 
-            roll_face_values = set([die.face_value for die in roll.dice])
+    def _is_valid_for_face_values(self, face_values: Tuple[int, ...]) -> bool:
+        large_straight_variation_one_die_face_values = set([1, 2, 3, 4, 5])
+        large_straight_variation_two_die_face_values = set([2, 3, 4, 5, 6])
 
-            return (large_straight_variation_one_die_face_values <= roll_face_values) or \
-                   (large_straight_variation_two_die_face_values <= roll_face_values)
-        else:
+        roll_face_values = set(face_values)
 
-            return True
+        return (large_straight_variation_one_die_face_values <= roll_face_values) or \
+               (large_straight_variation_two_die_face_values <= roll_face_values)
 
-    def _calculate_points_internal(self, input_roll) -> int:
+    def _calculate_points_for_face_values(self, face_values: Tuple[int, ...]) -> int:
         return 40
 
 @dataclass
@@ -352,11 +435,11 @@ class ChanceScore(Score):
     def score_type(self) -> ScoreType:
         return ScoreType.CHANCE
 
-    def is_valid_for_roll(self, roll: Roll) -> bool:
+    def _is_valid_for_face_values(self, face_values: Tuple[int, ...]) -> bool:
         return True
 
-    def _calculate_points_internal(self, input_roll) -> int:
-        return sum([die.face_value for die in input_roll.dice])
+    def _calculate_points_for_face_values(self, face_values: Tuple[int, ...]) -> int:
+        return sum(face_values)
 
 @dataclass
 class YahtzeeScore(GroupedScore):
@@ -366,13 +449,13 @@ class YahtzeeScore(GroupedScore):
     def score_type(self) -> ScoreType:
         return ScoreType.YAHTZEE
 
-    def is_valid_for_roll(self, roll: Roll) -> bool:
-        length_of_groups_of_dice = self._get_length_of_groups_of_dice(roll)
+    def _is_valid_for_face_values(self, face_values: Tuple[int, ...]) -> bool:
+        length_of_groups_of_dice = self._get_length_of_groups_of_dice(face_values)
 
         # One group of 5 dice
         return len([length_of_group_of_dice for length_of_group_of_dice in length_of_groups_of_dice if length_of_group_of_dice == 5]) == 1
 
-    def _calculate_points_internal(self, input_roll) -> int:
+    def _calculate_points_for_face_values(self, face_values: Tuple[int, ...]) -> int:
         return 50
 
 @dataclass(init=True)
@@ -381,14 +464,46 @@ class Scorecard():
     scores: List[Score] = field(default_factory=lambda: Scorecard._get_initial_scorecard())
     yahtzeebonus: int = 0
 
+    # Running totals, kept up to date by select_score_for_roll so that reading them never rescores anything
+    _upper_section_score_sum: int = field(default=0, init=False, repr=False)
+    _lower_section_score_sum: int = field(default=0, init=False, repr=False)
+    _completed_turn_count: int = field(default=0, init=False, repr=False)
+    # The points of each score in scorecard order, NOT_SELECTED for scores that haven't been selected yet
+    _points: array = field(default=None, init=False, repr=False)
+    # Bumped whenever a score is selected, so that anything worked out from the selections knows when it's stale
+    _revision: int = field(default=0, init=False, repr=False)
+
+    NOT_SELECTED = -1
+
+    def __post_init__(self):
+        self._upper_section_score_sum = self._get_section_total(SectionType.UPPER)
+        self._lower_section_score_sum = self._get_section_total(SectionType.LOWER)
+        self._completed_turn_count = len([score for score in self.scores if score._selected_roll is not None])
+        self._points = array("h", [Scorecard.NOT_SELECTED if score._selected_roll is None else score.calculate_points()
+                                   for score in self.scores])
+
     def get_completed_turn_count(self):
-        return len([score for score in self.scores if score.selected_roll is not None])
+        return self._completed_turn_count
 
     def get_valid_scores_for_roll(self, roll: Roll) -> List[Score]:
-        return [score for score in self.scores if score.is_valid_for_roll(roll)]
+        roll_scores = ROLL_SCORE_TABLE.lookup(roll)
+        return [score for score in self.scores if score._is_valid_for_roll_scores(roll_scores)]
+
+    def get_points_for_roll(self, roll: Roll) -> Dict[str, int]:
+        """
+        How many points the roll would score in each score, keyed by score type (the "valid_scores" sent to players)
+        """
+        YAHTZEE_SCORE_INDEX = 11
+
+        #if the roll is yahtzee and there is already a score selected, deal with yahtzee bonus
+        if(self.scores[YAHTZEE_SCORE_INDEX].is_valid_for_roll(roll) and self.scores[YAHTZEE_SCORE_INDEX].selected_roll != None):
+            return {score.score_type().value: score.calculate_yahtzee_bonus_points(roll) for score in self.scores}
+        #otherwise proceed normally
+        else:
+            return {score.score_type().value: score.calculate_potential_points(roll) for score in self.scores}
 
     def get_upper_section_score_sum(self):
-        return self._get_section_total(SectionType.UPPER)
+        return self._upper_section_score_sum
 
     def get_upper_section_bonus(self):
         return UPPER_SECTION_BONUS_POINTS if self.get_upper_section_score_sum() \
@@ -400,14 +515,24 @@ class Scorecard():
     # TODO: Yahtzee bonus logic
 
     def get_lower_section_total(self):
-        return self._get_section_total(SectionType.LOWER)
+        return self._lower_section_score_sum + self.yahtzeebonus
 
     def get_grand_total(self):
         return self.get_upper_section_total() + self.get_lower_section_total()
 
+    def get_score(self, score_type: ScoreType) -> Score:
+        return self.scores[ROLL_SCORE_TABLE.get_column(score_type)]
+
+    def get_points(self, score_type: ScoreType) -> int:
+        points = self._points[ROLL_SCORE_TABLE.get_column(score_type)]
+        return None if points == Scorecard.NOT_SELECTED else points
+
     def select_score_for_roll(self, score_type: ScoreType, roll: Roll):
 
-        score_for_roll = [score for score in self.scores if score.score_type() is score_type][0]
+        column = ROLL_SCORE_TABLE.get_column(score_type)
+        score_for_roll = self.scores[column]
+        was_selected = self._points[column] != Scorecard.NOT_SELECTED
+        points_before = self._points[column] if was_selected else 0
 
         YAHTZEE_SCORE_INDEX = 11
         if(self.scores[YAHTZEE_SCORE_INDEX].is_valid_for_roll(roll) and self.scores[YAHTZEE_SCORE_INDEX].selected_roll != None):
@@ -415,7 +540,19 @@ class Scorecard():
             if(score_type.name == "FULL_HOUSE" or score_type.name == "SMALL_STRAIGHT" or score_type.name == "LARGE_STRAIGHT"):
                 score_for_roll.is_yahtzee_bonus = True
 
-        score_for_roll.selected_roll = deepcopy(roll)
+        score_for_roll.selected_roll = roll
+
+        # Only this one score can have changed, so that's the only one that needs scoring
+        points = score_for_roll.calculate_points()
+        self._points[column] = points
+        points_added = points - points_before
+        if score_for_roll.section_type() == SectionType.UPPER:
+            self._upper_section_score_sum += points_added
+        else:
+            self._lower_section_score_sum += points_added
+        if not was_selected:
+            self._completed_turn_count += 1
+        self._revision += 1
 
     @staticmethod
     def _is_not_null_score(x):
@@ -425,10 +562,7 @@ class Scorecard():
         # TODO: Not sure if we're using @property fields correctly, shouldn't we be able to access score.section_type?
         section_scores = [score.calculate_points() for score in self.scores if score.section_type() == section_type]
         non_null_scores = list(filter(self._is_not_null_score, section_scores))
-        ret = sum(non_null_scores)
-        if(section_type.name == "LOWER"):
-            ret += self.yahtzeebonus
-        return ret
+        return sum(non_null_scores)
 
     def __eq__(self, other):
         if not isinstance(other, Scorecard):
@@ -438,7 +572,42 @@ class Scorecard():
 
     def to_dict(self):
         return {
-            "scores": {score.score_type().value: score.calculate_points() for score in self.scores},
+            "scores": {score_type.value: None if points == Scorecard.NOT_SELECTED else points
+                       for score_type, points in zip(ScoreType, self._points)},
+            "UPPER_BONUS": self.get_upper_section_bonus(),
+            "UPPER_TOTAL": self.get_upper_section_total(),
+            "LOWER_TOTAL": self.get_lower_section_total(),
+            "GRAND_TOTAL": self.get_grand_total(),
+            "yahtzee_bonus": self.yahtzeebonus,
+        }
+
+    def to_snapshot(self):
+        """
+        Everything needed to rebuild the scorecard with from_snapshot: the selected rolls and the yahtzee bonuses
+        """
+        return {
+            "selected_rolls": [None if score._selected_roll is None else list(score._selected_roll) for score in self.scores],
+            "joker_scores": [column for column, score in enumerate(self.scores) if getattr(score, "is_yahtzee_bonus", False)],
+            "yahtzee_bonus": self.yahtzeebonus
+        }
+
+    @staticmethod
+    def from_snapshot(player: Player, snapshot) -> "Scorecard":
+        scores = Scorecard._get_initial_scorecard()
+        for score, selected_roll in zip(scores, snapshot["selected_rolls"]):
+            if selected_roll is not None:
+                score._selected_roll = bytes(selected_roll)
+        for column in snapshot["joker_scores"]:
+            scores[column].is_yahtzee_bonus = True
+        # The running totals are recomputed from the scores in __post_init__
+        return Scorecard(player=player, scores=scores, yahtzeebonus=snapshot["yahtzee_bonus"])
+
+    def to_partial_dict(self, score_types: List[ScoreType]):
+        """
+        Same shape as to_dict, but only includes the given scores. The totals are always included.
+        """
+        return {
+            "scores": {score_type.value: self.get_points(score_type) for score_type in score_types},
             "UPPER_BONUS": self.get_upper_section_bonus(),
             "UPPER_TOTAL": self.get_upper_section_total(),
             "LOWER_TOTAL": self.get_lower_section_total(),
@@ -467,16 +636,40 @@ class Turn:
     MAX_ROLL_COUNT = 3
 
     player: Player
-    last_roll: Roll = Roll()
+    last_roll: Roll = field(default_factory=Roll)
     roll_count: int = 0
     selected_score_type: ScoreType = None
 
-    def roll_selected_dice(self, dice_to_roll: List[Die]):
+    # The last valid_scores worked out, and the (roll, scorecard, scorecard revision) they were worked out for
+    _valid_scores: Dict[str, int] = field(default=None, init=False, repr=False, compare=False)
+    _valid_scores_key: Tuple = field(default=None, init=False, repr=False, compare=False)
+
+    def roll_selected_dice(self, dice_to_roll: List[Die], face_values=None):
+        """
+        Rolls the given dice. When a roll is replayed from the event log, face_values is what the dice came up
+        as the first time, and the dice aren't rolled again.
+        """
         if self.roll_count == Turn.MAX_ROLL_COUNT:
             raise Exception(f"Dice have already been rolled {Turn.MAX_ROLL_COUNT} times this turn.")
 
-        self.last_roll.roll_selected_dice(dice_to_roll)
+        if face_values is None:
+            self.last_roll.roll_selected_dice(dice_to_roll)
+        else:
+            self.last_roll = Roll.from_face_values(face_values)
         self.roll_count += 1
+        self._valid_scores = None
+
+    def get_valid_scores(self, scorecard: Scorecard) -> Dict[str, int]:
+        """
+        scorecard.get_points_for_roll for the last roll, only scored again once the dice are rolled or a score is
+        selected on the scorecard. Every update sends these, and most updates (chat, joins) change neither.
+        The dict is shared between calls, so don't modify it.
+        """
+        key = (self.last_roll.get_face_values(), id(scorecard), scorecard._revision)
+        if self._valid_scores is None or self._valid_scores_key != key:
+            self._valid_scores = scorecard.get_points_for_roll(self.last_roll)
+            self._valid_scores_key = key
+        return self._valid_scores
 
     def is_turn_complete(self) -> bool:
         return self.selected_score_type is not None
@@ -488,3 +681,20 @@ class Turn:
             "selected_score_type": self.selected_score_type.value if self.selected_score_type else None,
             "player": self.player.name
         }
+
+    def to_snapshot(self):
+        return {
+            "last_roll": list(self.last_roll.get_face_values()),
+            "roll_count": self.roll_count,
+            "selected_score_type": self.selected_score_type.value if self.selected_score_type else None
+        }
+
+    @staticmethod
+    def from_snapshot(player: Player, snapshot) -> "Turn":
+        selected_score_type = snapshot["selected_score_type"]
+        return Turn(player=player, last_roll=Roll.from_face_values(snapshot["last_roll"]), roll_count=snapshot["roll_count"],
+                    selected_score_type=ScoreType(selected_score_type) if selected_score_type else None)
+
+
+# How every distinct roll scores in every category, built once from the rules in the Score classes above
+ROLL_SCORE_TABLE = RollScoreTable(Scorecard._get_initial_scorecard())
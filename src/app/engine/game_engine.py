@@ -16,29 +16,67 @@ class GameEngine:
         self.current_scorecard = None
         self.current_turn = None
         self.game_winner = None
+        self.completed_scorecard_count = 0
 
     def start_game(self, players: List[Player]):
         self.game_started = True
         self.scorecards = [Scorecard(player=player) for player in players]
         self.scorecards_cycle = cycle(self.scorecards)
+        self.completed_scorecard_count = 0
         self._update_current_turn()
         self.game_winner = {"player_name": None, "grand_total": None}
         self.log.info(f"New game started with {len(players)} players.")
         return self
 
-    def roll_selected_dice(self, dice_to_roll):
+    def roll_selected_dice(self, dice_to_roll, face_values=None):
         dice = [self.current_turn.last_roll.get_die_by_id(int(die_id)) for die_id in dice_to_roll]
-        self.current_turn.roll_selected_dice(dice)
+        self.current_turn.roll_selected_dice(dice, face_values)
 
     def select_score_for_roll(self, score_type_selected):
         # each score_type_selected from the front should match the name of the score in the enum
         score_type_selected = ScoreType(score_type_selected.upper())
+        was_scorecard_complete = self._is_scorecard_complete(self.current_scorecard)
         self.current_scorecard.select_score_for_roll(score_type_selected, self.current_turn.last_roll)
+        if not was_scorecard_complete and self._is_scorecard_complete(self.current_scorecard):
+            self.completed_scorecard_count += 1
         self.current_turn.selected_score_type = score_type_selected
 
         # Now that the current player has selected a score for their turn, update the current turn.
         self._update_current_turn()
 
+    def to_snapshot(self, player_indices):
+        """
+        The state of a started game. Players are referred to by their index in player_indices (keyed by id(player)),
+        so that the StateManager can keep the same Player objects in its player list and in the scorecards.
+        """
+        return {
+            "scorecards": [{"player": player_indices[id(scorecard.player)], **scorecard.to_snapshot()}
+                           for scorecard in self.scorecards],
+            # By identity: players with the same name and connection have scorecards that compare equal
+            "current_scorecard": next(index for index, scorecard in enumerate(self.scorecards)
+                                      if scorecard is self.current_scorecard),
+            "current_turn": self.current_turn.to_snapshot(),
+            "game_winner": self.game_winner
+        }
+
+    @staticmethod
+    def from_snapshot(snapshot, players: List[Player]) -> "GameEngine":
+        game_engine = GameEngine()
+        if snapshot is None:
+            return game_engine
+        game_engine.game_started = True
+        game_engine.scorecards = [Scorecard.from_snapshot(players[scorecard["player"]], scorecard)
+                                  for scorecard in snapshot["scorecards"]]
+        # Pick the cycle of turns up right after the current scorecard
+        game_engine.scorecards_cycle = cycle(game_engine.scorecards)
+        for i in range(snapshot["current_scorecard"] + 1):
+            game_engine.current_scorecard = next(game_engine.scorecards_cycle)
+        game_engine.current_turn = Turn.from_snapshot(game_engine.current_scorecard.player, snapshot["current_turn"])
+        game_engine.completed_scorecard_count = len([scorecard for scorecard in game_engine.scorecards
+                                                     if GameEngine._is_scorecard_complete(scorecard)])
+        game_engine.game_winner = snapshot["game_winner"]
+        return game_engine
+
     def _update_current_turn(self):
         if self._is_first_turn_of_game() or self.current_turn.is_turn_complete():
             if self._is_game_complete():
@@ -51,11 +89,12 @@ class GameEngine:
     def _is_first_turn_of_game(self) -> bool:
         return self.current_turn is None
 
+    @staticmethod
+    def _is_scorecard_complete(scorecard: Scorecard) -> bool:
+        return scorecard.get_completed_turn_count() >= COMPLETED_GAME_TURN_COUNT
+
     def _is_game_complete(self) -> bool:
-        for scorecard in self.scorecards:
-            if scorecard.get_completed_turn_count() < COMPLETED_GAME_TURN_COUNT:
-                return False
-        return True
+        return self.completed_scorecard_count == len(self.scorecards)
 
     def _calculate_winner(self):
         top_scorecard = max(self.scorecards, key=lambda scorecard: scorecard.get_grand_total())
@@ -0,0 +1,66 @@
+from dataclasses import dataclass
+from itertools import combinations_with_replacement
+from typing import Dict, Iterable, Tuple
+
+DICE_PER_ROLL = 5
+FACE_VALUES = range(1, 7)
+BITS_PER_FACE_COUNT = 3    # A face can show up on at most 5 dice, which fits in 3 bits
+
+
+def get_roll_key(face_values: Iterable[int]) -> int:
+    """
+    A compact key for a roll that doesn't depend on the order of the dice: the number of dice showing
+    each face, packed 3 bits per face. There are only 252 distinct keys for 5 dice.
+    """
+    key = 0
+    for face_value in face_values:
+        key += 1 << (BITS_PER_FACE_COUNT * (face_value - 1))
+    return key
+
+
+@dataclass(frozen=True)
+class RollScores:
+    """
+    Everything there is to know about how one roll scores, one entry per ScoreType in scorecard order:
+        * is_valid: whether the roll satisfies the category
+        * points: the points the category is worth for the roll, ignoring validity. This is what a
+          yahtzee bonus (joker) roll scores.
+        * potential_points: the points the roll scores in the category, 0 if it isn't valid for it
+    """
+    face_values: Tuple[int, ...]
+    is_valid: Tuple[bool, ...]
+    points: Tuple[int, ...]
+    potential_points: Tuple[int, ...]
+    is_yahtzee: bool
+
+
+class RollScoreTable:
+    def __init__(self, scores):
+        """
+        Precomputes how every distinct roll scores in every category, so that scoring a roll is a single lookup.
+        The rules themselves live in the Score classes; scores is one instance of each of them in scorecard order.
+        """
+        self.columns = {score.score_type(): column for column, score in enumerate(scores)}
+        self.rows: Dict[int, RollScores] = {}
+        for face_values in combinations_with_replacement(FACE_VALUES, DICE_PER_ROLL):
+            is_valid = tuple(score._is_valid_for_face_values(face_values) for score in scores)
+            points = tuple(score._calculate_points_for_face_values(face_values) for score in scores)
+            self.rows[get_roll_key(face_values)] = RollScores(
+                face_values=face_values,
+                is_valid=is_valid,
+                points=points,
+                potential_points=tuple(p if valid else 0 for p, valid in zip(points, is_valid)),
+                is_yahtzee=len(set(face_values)) == 1
+            )
+
+    def lookup(self, roll) -> RollScores:
+        return self.rows[roll.get_key()]
+
+    def lookup_face_values(self, face_values: Iterable[int]) -> RollScores:
+        return self.rows[get_roll_key(face_values)]
+
+    def get_column(self, score_type) -> int:
+        return self.columns[score_type]
+
+    def __len__(self):
+        return len(self.rows)
@@ -0,0 +1,139 @@
+import logging
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+from engine.entities import DICE_PER_ROLL, MINIMUM_UPPER_SECTION_SCORE_FOR_BONUS, NO_BONUS_AMOUNT, \
+    ROLL_SCORE_TABLE, Roll, ScoreType, UPPER_SECTION_BONUS_POINTS
+from engine.game_engine import COMPLETED_GAME_TURN_COUNT, GameEngine
+from engine.score_table import BITS_PER_FACE_COUNT, FACE_VALUES
+from state.yahtzee.player import Player
+
+SCORE_TYPES = list(ScoreType)
+UPPER_SECTION_SCORE_COUNT = 6
+YAHTZEE_SCORE_INDEX = 11
+YAHTZEE_BONUS_POINTS = 100
+ROLLS_PER_TURN = 3
+
+# ROLL_SCORE_TABLE as arrays, so that a whole batch of rolls can be scored with one fancy-indexing operation
+_ROW_BY_KEY = np.full(1 << (BITS_PER_FACE_COUNT * len(FACE_VALUES)), -1, dtype=np.int16)
+for _row, (_key, _roll_scores) in enumerate(ROLL_SCORE_TABLE.rows.items()):
+    _ROW_BY_KEY[_key] = _row
+_POTENTIAL_POINTS = np.array([roll_scores.potential_points for roll_scores in ROLL_SCORE_TABLE.rows.values()], dtype=np.int16)
+_YAHTZEE_BONUS_POINTS = np.array([roll_scores.points for roll_scores in ROLL_SCORE_TABLE.rows.values()], dtype=np.int16)
+_IS_YAHTZEE = np.array([roll_scores.is_yahtzee for roll_scores in ROLL_SCORE_TABLE.rows.values()])
+_FACE_COUNT_WEIGHTS = 1 << (BITS_PER_FACE_COUNT * np.arange(len(FACE_VALUES)))
+
+
+@dataclass
+class SimulationResult:
+    """
+    Per-game results of a batch simulation. The first axis of every array is the game.
+        * scores: the points of each score, in scorecard order
+        * upper_bonus / yahtzee_bonus / grand_total: the same totals a Scorecard reports
+        * face_values: the final roll of every turn, indexed [game, turn, die]
+        * selected_scores: the index of the score selected on every turn, indexed [game, turn]
+    """
+    seed: int
+    scores: np.ndarray
+    upper_bonus: np.ndarray
+    yahtzee_bonus: np.ndarray
+    grand_total: np.ndarray
+    face_values: np.ndarray
+    selected_scores: np.ndarray
+
+    @property
+    def game_count(self) -> int:
+        return len(self.grand_total)
+
+
+class BatchSimulator:
+    def __init__(self, seed: int = None):
+        """
+        Plays many single-player games at once with NumPy, using the scoring rules of engine/entities.py.
+
+        Every turn each game rolls all five dice, then twice keeps the dice showing its most common face
+        (the higher face on a tie) and rerolls the rest. It then selects whichever open score is worth the
+        most points for the final roll. Yahtzee bonuses and jokers work the same way as in Scorecard.
+        """
+        self.log = logging.getLogger(__name__)
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+    def simulate(self, game_count: int) -> SimulationResult:
+        scores = np.zeros((game_count, len(SCORE_TYPES)), dtype=np.int16)
+        is_selected = np.zeros((game_count, len(SCORE_TYPES)), dtype=bool)
+        yahtzee_bonus = np.zeros(game_count, dtype=np.int32)
+        face_values = np.zeros((game_count, COMPLETED_GAME_TURN_COUNT, DICE_PER_ROLL), dtype=np.int8)
+        selected_scores = np.zeros((game_count, COMPLETED_GAME_TURN_COUNT), dtype=np.int8)
+        games = np.arange(game_count)
+
+        for turn in range(COMPLETED_GAME_TURN_COUNT):
+            dice = self._roll_turn(game_count)
+            rows = self._get_table_rows(dice)
+
+            # A yahtzee after the yahtzee score has been selected earns the bonus and scores as a joker
+            is_joker = _IS_YAHTZEE[rows] & is_selected[:, YAHTZEE_SCORE_INDEX]
+            points = np.where(is_joker[:, None], _YAHTZEE_BONUS_POINTS[rows], _POTENTIAL_POINTS[rows])
+            selected = np.argmax(np.where(is_selected, -1, points), axis=1)
+
+            scores[games, selected] = points[games, selected]
+            is_selected[games, selected] = True
+            yahtzee_bonus += is_joker * YAHTZEE_BONUS_POINTS
+            face_values[:, turn] = dice
+            selected_scores[:, turn] = selected
+
+        upper_sum = scores[:, :UPPER_SECTION_SCORE_COUNT].sum(axis=1, dtype=np.int32)
+        upper_bonus = np.where(upper_sum >= MINIMUM_UPPER_SECTION_SCORE_FOR_BONUS,
+                               UPPER_SECTION_BONUS_POINTS, NO_BONUS_AMOUNT).astype(np.int32)
+        lower_sum = scores[:, UPPER_SECTION_SCORE_COUNT:].sum(axis=1, dtype=np.int32)
+        return SimulationResult(
+            seed=self.seed,
+            scores=scores,
+            upper_bonus=upper_bonus,
+            yahtzee_bonus=yahtzee_bonus,
+            grand_total=upper_sum + upper_bonus + lower_sum + yahtzee_bonus,
+            face_values=face_values,
+            selected_scores=selected_scores
+        )
+
+    def _roll_turn(self, game_count: int) -> np.ndarray:
+        dice = self.rng.integers(1, 7, size=(game_count, DICE_PER_ROLL), dtype=np.int8)
+        for reroll in range(ROLLS_PER_TURN - 1):
+            face_counts = self._get_face_counts(dice)
+            # Most common face first, ties go to the higher face
+            kept_face = np.argmax(face_counts * len(FACE_VALUES) + np.arange(len(FACE_VALUES)), axis=1) + 1
+            rerolled_dice = self.rng.integers(1, 7, size=dice.shape, dtype=np.int8)
+            dice = np.where(dice == kept_face[:, None], dice, rerolled_dice)
+        return dice
+
+    @staticmethod
+    def _get_face_counts(dice: np.ndarray) -> np.ndarray:
+        return (dice[:, :, None] == np.arange(1, 7)).sum(axis=1)
+
+    @staticmethod
+    def _get_table_rows(dice: np.ndarray) -> np.ndarray:
+        return _ROW_BY_KEY[BatchSimulator._get_face_counts(dice) @ _FACE_COUNT_WEIGHTS]
+
+
+def cross_check_with_game_engine(result: SimulationResult, game_indices: List[int]) -> List[int]:
+    """
+    Replays the given simulated games through GameEngine, turn by turn with the same final rolls and the same
+    selected scores, and returns the indices of the games where GameEngine ended up with a different scorecard.
+    """
+    mismatched_games = []
+    for game_index in game_indices:
+        game_engine = GameEngine().start_game([Player(name="simulated", websocket=None, joined_at=None)])
+        for turn in range(COMPLETED_GAME_TURN_COUNT):
+            game_engine.current_turn.last_roll = Roll.from_face_values(result.face_values[game_index, turn].tobytes())
+            game_engine.select_score_for_roll(SCORE_TYPES[result.selected_scores[game_index, turn]].value)
+
+        scorecard = game_engine.scorecards[0].to_dict()
+        if [scorecard["scores"][score_type.value] for score_type in SCORE_TYPES] != result.scores[game_index].tolist() \
+                or scorecard["UPPER_BONUS"] != result.upper_bonus[game_index] \
+                or scorecard["yahtzee_bonus"] != result.yahtzee_bonus[game_index] \
+                or scorecard["GRAND_TOTAL"] != result.grand_total[game_index] \
+                or game_engine.game_winner["grand_total"] != result.grand_total[game_index]:
+            mismatched_games.append(game_index)
+    return mismatched_games
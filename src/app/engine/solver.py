@@ -0,0 +1,279 @@
+import json
+import logging
+import os
+from dataclasses import dataclass
+from itertools import combinations_with_replacement
+from math import factorial
+from multiprocessing import Pool
+from typing import List
+
+import numpy as np
+
+from engine.entities import DICE_PER_ROLL, MINIMUM_UPPER_SECTION_SCORE_FOR_BONUS, NO_BONUS_AMOUNT, \
+    ROLL_SCORE_TABLE, Roll, Scorecard, ScoreType, Turn, UPPER_SECTION_BONUS_POINTS
+from engine.score_table import FACE_VALUES, get_roll_key
+
+SCORE_TYPES = list(ScoreType)
+UPPER_SECTION_SCORE_COUNT = 6
+YAHTZEE_SCORE_INDEX = 11
+YAHTZEE_BONUS_POINTS = 100
+ALL_SCORES_SELECTED = (1 << len(SCORE_TYPES)) - 1
+# Upper section sums past the bonus threshold are all the same as far as the rest of the game is concerned
+UPPER_SECTION_SUMS = MINIMUM_UPPER_SECTION_SCORE_FOR_BONUS + 1
+
+log = logging.getLogger(__name__)
+
+# The 252 rolls, in ROLL_SCORE_TABLE order
+_ROLLS = list(ROLL_SCORE_TABLE.rows.values())
+_POTENTIAL_POINTS = np.array([roll_scores.potential_points for roll_scores in _ROLLS], dtype=np.float64)
+_YAHTZEE_BONUS_POINTS = np.array([roll_scores.points for roll_scores in _ROLLS], dtype=np.float64)
+_IS_YAHTZEE = np.array([roll_scores.is_yahtzee for roll_scores in _ROLLS])
+_ROW_BY_KEY = {get_roll_key(roll_scores.face_values): row for row, roll_scores in enumerate(_ROLLS)}
+
+# The 462 ways to keep between 0 and 5 dice, and the probability of each roll after rerolling the rest
+_KEEPS = [keep for kept_dice_count in range(DICE_PER_ROLL + 1)
+          for keep in combinations_with_replacement(FACE_VALUES, kept_dice_count)]
+_KEEP_BY_KEY = {get_roll_key(keep): index for index, keep in enumerate(_KEEPS)}
+_EMPTY_KEEP = _KEEP_BY_KEY[0]
+
+
+def _get_face_counts(face_values) -> np.ndarray:
+    return np.array([list(face_values).count(face_value) for face_value in FACE_VALUES])
+
+
+def _get_keep_to_roll_probabilities() -> np.ndarray:
+    probabilities = np.zeros((len(_KEEPS), len(_ROLLS)))
+    roll_face_counts = [_get_face_counts(roll_scores.face_values) for roll_scores in _ROLLS]
+    for keep_index, keep in enumerate(_KEEPS):
+        keep_face_counts = _get_face_counts(keep)
+        rerolled_dice_count = DICE_PER_ROLL - len(keep)
+        for row, face_counts in enumerate(roll_face_counts):
+            rerolled_face_counts = face_counts - keep_face_counts
+            if (rerolled_face_counts >= 0).all():
+                ways = factorial(rerolled_dice_count)
+                for count in rerolled_face_counts:
+                    ways //= factorial(count)
+                probabilities[keep_index, row] = ways / len(FACE_VALUES) ** rerolled_dice_count
+    return probabilities
+
+
+def _get_keeps_for_rolls() -> np.ndarray:
+    """
+    For each roll, the index of every distinct way of keeping some of its dice,
+    padded with an index past the last keep (which the solver treats as impossible).
+    """
+    max_keep_count = 1 << DICE_PER_ROLL
+    keeps_for_rolls = np.full((len(_ROLLS), max_keep_count), len(_KEEPS))
+    for row, roll_scores in enumerate(_ROLLS):
+        keeps = {_KEEP_BY_KEY[get_roll_key([face_value for die, face_value in enumerate(roll_scores.face_values)
+                                            if kept_dice & (1 << die)])]
+                 for kept_dice in range(max_keep_count)}
+        keeps_for_rolls[row, :len(keeps)] = sorted(keeps)
+    return keeps_for_rolls
+
+
+_KEEP_TO_ROLL = _get_keep_to_roll_probabilities()
+_KEEPS_FOR_ROLLS = _get_keeps_for_rolls()
+
+
+def _get_score_values(selected_scores: int, upper_section_sums: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    The expected rest-of-game value of selecting each score for each final roll, indexed
+    [upper section sum, roll, score]. Scores that are already selected are -inf.
+    """
+    score_values = np.full((len(upper_section_sums), len(_ROLLS), len(SCORE_TYPES)), -np.inf)
+    # Like Scorecard, any yahtzee after the yahtzee score has been selected is a joker and earns the bonus
+    is_joker = _IS_YAHTZEE & bool(selected_scores & (1 << YAHTZEE_SCORE_INDEX))
+    points = np.where(is_joker[:, None], _YAHTZEE_BONUS_POINTS, _POTENTIAL_POINTS)
+    bonus = is_joker * YAHTZEE_BONUS_POINTS
+    for score_index in range(len(SCORE_TYPES)):
+        if selected_scores & (1 << score_index):
+            continue
+        next_values = values[selected_scores | (1 << score_index)]
+        if score_index < UPPER_SECTION_SCORE_COUNT:
+            next_upper_section_sums = np.minimum(upper_section_sums[:, None] + points[:, score_index].astype(int),
+                                                 MINIMUM_UPPER_SECTION_SCORE_FOR_BONUS)
+            future_values = next_values[next_upper_section_sums]
+        else:
+            future_values = next_values[upper_section_sums][:, None]
+        score_values[:, :, score_index] = points[:, score_index] + bonus + future_values
+    return score_values
+
+
+def _get_keep_values(roll_values: np.ndarray) -> np.ndarray:
+    """
+    From the value of each roll, the expected value of each keep once the other dice are rerolled
+    """
+    return roll_values @ _KEEP_TO_ROLL.T
+
+
+def _get_roll_values(keep_values: np.ndarray) -> np.ndarray:
+    """
+    From the value of each keep, the value of each roll when the best of its keeps is chosen
+    """
+    impossible_keep = np.full((len(keep_values), 1), -np.inf)
+    return np.concatenate([keep_values, impossible_keep], axis=1)[:, _KEEPS_FOR_ROLLS].max(axis=2)
+
+
+def _get_turn_keep_values(selected_scores: int, upper_section_sums: np.ndarray, values: np.ndarray):
+    """
+    Works backwards through a turn: the value of each keep with one reroll left, then with two rerolls left
+    """
+    final_roll_values = _get_score_values(selected_scores, upper_section_sums, values).max(axis=2)
+    last_reroll_keep_values = _get_keep_values(final_roll_values)
+    first_reroll_keep_values = _get_keep_values(_get_roll_values(last_reroll_keep_values))
+    return last_reroll_keep_values, first_reroll_keep_values
+
+
+def _solve_selected_scores(selected_scores: int, values: np.ndarray) -> np.ndarray:
+    """
+    The expected rest-of-game value at the start of a turn, for every upper section sum
+    """
+    upper_section_sums = np.arange(UPPER_SECTION_SUMS)
+    if selected_scores == ALL_SCORES_SELECTED:
+        return np.where(upper_section_sums >= MINIMUM_UPPER_SECTION_SCORE_FOR_BONUS,
+                        UPPER_SECTION_BONUS_POINTS, NO_BONUS_AMOUNT).astype(np.float64)
+    last_reroll_keep_values, first_reroll_keep_values = _get_turn_keep_values(selected_scores, upper_section_sums, values)
+    return _get_keep_values(_get_roll_values(first_reroll_keep_values))[:, _EMPTY_KEEP]
+
+
+# Each process in the pool opens the table being built read-only
+_worker_values = None
+
+
+def _open_values_for_worker(path: str):
+    global _worker_values
+    _worker_values = np.load(path, mmap_mode="r")
+
+
+def _solve_selected_scores_in_worker(selected_scores_chunk: List[int]):
+    return selected_scores_chunk, np.array([_solve_selected_scores(selected_scores, _worker_values)
+                                            for selected_scores in selected_scores_chunk])
+
+
+@dataclass
+class Keep:
+    """
+    What to do with a roll: the ids of the dice to reroll (none means select a score now),
+    and the expected final grand total when playing optimally from here.
+    """
+    dice_to_roll: List[int]
+    expected_score: float
+
+
+class StrategyTable:
+    def __init__(self, values: np.ndarray):
+        """
+        The optimal single-player strategy, as the expected rest-of-game value at the start of a turn for every
+        state of a scorecard. A state is the set of selected scores plus the upper section sum (capped at 63).
+
+        Under the rules in Scorecard, any yahtzee after the yahtzee score has been selected earns the yahtzee
+        bonus, whether the yahtzee score was 50 or 0. So whether the bonus is in play is already part of the set
+        of selected scores and doesn't need its own dimension.
+        """
+        self.values = values
+
+    @staticmethod
+    def load(path: str) -> "StrategyTable":
+        """
+        Memory-maps a table built by build_strategy_table, so loading it is instant and it's shared between processes
+        """
+        return StrategyTable(np.load(path, mmap_mode="r"))
+
+    @staticmethod
+    def _get_state(scorecard: Scorecard):
+        selected_scores = sum(1 << score_index for score_index, score in enumerate(scorecard.scores)
+                              if score.selected_roll is not None)
+        return selected_scores, min(scorecard.get_upper_section_score_sum(), MINIMUM_UPPER_SECTION_SCORE_FOR_BONUS)
+
+    @staticmethod
+    def _get_current_score(scorecard: Scorecard) -> int:
+        # The upper section bonus is part of the table's values, it's awarded at the end of the game
+        return scorecard.get_upper_section_score_sum() + scorecard.get_lower_section_total()
+
+    def get_expected_score(self, scorecard: Scorecard) -> float:
+        """
+        The expected final grand total of a scorecard at the start of a turn, when playing optimally
+        """
+        selected_scores, upper_section_sum = self._get_state(scorecard)
+        return self._get_current_score(scorecard) + float(self.values[selected_scores, upper_section_sum])
+
+    def get_best_score_type(self, scorecard: Scorecard, roll: Roll) -> ScoreType:
+        selected_scores, upper_section_sum = self._get_state(scorecard)
+        score_values = _get_score_values(selected_scores, np.array([upper_section_sum]), self.values)
+        return SCORE_TYPES[int(np.argmax(score_values[0, _ROW_BY_KEY[roll.get_key()]]))]
+
+    def get_best_keep(self, scorecard: Scorecard, turn: Turn) -> Keep:
+        """
+        Which dice to reroll for the turn's last roll. At the start of a turn, that's all of them.
+        """
+        selected_scores, upper_section_sum = self._get_state(scorecard)
+        current_score = self._get_current_score(scorecard)
+        all_dice = [die.die_id for die in turn.last_roll.dice]
+        if turn.roll_count == 0:
+            return Keep(dice_to_roll=all_dice,
+                        expected_score=current_score + float(self.values[selected_scores, upper_section_sum]))
+
+        row = _ROW_BY_KEY[turn.last_roll.get_key()]
+        upper_section_sums = np.array([upper_section_sum])
+        if turn.roll_count >= Turn.MAX_ROLL_COUNT:
+            score_values = _get_score_values(selected_scores, upper_section_sums, self.values)
+            return Keep(dice_to_roll=[], expected_score=current_score + float(score_values[0, row].max()))
+
+        last_reroll_keep_values, first_reroll_keep_values = _get_turn_keep_values(selected_scores, upper_section_sums, self.values)
+        keep_values = last_reroll_keep_values if turn.roll_count == Turn.MAX_ROLL_COUNT - 1 else first_reroll_keep_values
+        keeps = [keep for keep in _KEEPS_FOR_ROLLS[row] if keep < len(_KEEPS)]
+        best_keep = max(keeps, key=lambda keep: keep_values[0, keep])
+
+        # Keep the dice that make up the best keep, and reroll the rest (unless the best keep is the whole roll)
+        kept_face_values = list(_KEEPS[best_keep])
+        dice_to_roll = []
+        for die in turn.last_roll.dice:
+            if die.face_value in kept_face_values:
+                kept_face_values.remove(die.face_value)
+            else:
+                dice_to_roll.append(die.die_id)
+        return Keep(dice_to_roll=dice_to_roll, expected_score=current_score + float(keep_values[0, best_keep]))
+
+
+def build_strategy_table(path: str, processes: int = None, min_selected_score_count: int = 0) -> StrategyTable:
+    """
+    Solves every state, from the end of the game backwards, and saves the table to path.
+
+    The states are solved one level (number of selected scores) at a time, since a level only depends on the
+    level after it. Each level is split across a pool of processes, then flushed to disk and recorded in a
+    progress file next to the table, so an interrupted build picks up from the last finished level.
+    Set min_selected_score_count to only solve the end of the game.
+    """
+    progress_path = f"{path}.progress"
+    if os.path.exists(path) and os.path.exists(progress_path):
+        values = np.lib.format.open_memmap(path, mode="r+")
+        with open(progress_path) as progress_file:
+            solved_level = json.load(progress_file)["solved_level"]
+        log.info(f"Resuming strategy table build, levels down to {solved_level} are already solved")
+    else:
+        values = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64,
+                                           shape=(ALL_SCORES_SELECTED + 1, UPPER_SECTION_SUMS))
+        values[:] = np.nan
+        solved_level = len(SCORE_TYPES) + 1
+
+    for level in range(min(solved_level - 1, len(SCORE_TYPES)), min_selected_score_count - 1, -1):
+        level_selected_scores = [selected_scores for selected_scores in range(ALL_SCORES_SELECTED + 1)
+                                 if bin(selected_scores).count("1") == level]
+        log.info(f"Solving {len(level_selected_scores)} states with {level} scores selected")
+        if processes == 1:
+            for selected_scores in level_selected_scores:
+                values[selected_scores] = _solve_selected_scores(selected_scores, values)
+        else:
+            values.flush()
+            chunk_size = max(1, len(level_selected_scores) // ((processes or os.cpu_count()) * 4))
+            chunks = [level_selected_scores[start:start + chunk_size]
+                      for start in range(0, len(level_selected_scores), chunk_size)]
+            with Pool(processes, initializer=_open_values_for_worker, initargs=(path,)) as pool:
+                for selected_scores_chunk, chunk_values in pool.imap_unordered(_solve_selected_scores_in_worker, chunks):
+                    values[selected_scores_chunk] = chunk_values
+        values.flush()
+        with open(progress_path, "w") as progress_file:
+            json.dump({"solved_level": level}, progress_file)
+
+    return StrategyTable(values)
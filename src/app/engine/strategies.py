@@ -0,0 +1,61 @@
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import List
+
+from engine.entities import Scorecard, ScoreType, Turn
+
+
+class Strategy(ABC):
+    """
+    How a bot plays its turn. A strategy is asked what to do after every roll, and only ever reads the
+    scorecard and turn it is given, so it is safe to run off the event loop.
+    """
+    @abstractmethod
+    def choose_dice_to_roll(self, scorecard: Scorecard, turn: Turn) -> List[int]:
+        """
+        The ids of the dice to roll next. An empty list means the bot is done rolling and will select a score.
+        """
+        pass
+
+    @abstractmethod
+    def choose_score_type(self, scorecard: Scorecard, turn: Turn) -> ScoreType:
+        pass
+
+    @staticmethod
+    def _get_open_score_types(scorecard: Scorecard) -> List[ScoreType]:
+        return [score.score_type() for score in scorecard.scores if score.selected_roll is None]
+
+
+class GreedyStrategy(Strategy):
+    """
+    Keeps the dice showing its most common face and rerolls the rest, then selects whichever
+    open score is worth the most points (the same valid_scores players see).
+    """
+    def choose_dice_to_roll(self, scorecard: Scorecard, turn: Turn) -> List[int]:
+        dice = turn.last_roll.dice
+        if turn.roll_count == 0:
+            return [die.die_id for die in dice]
+        if turn.roll_count >= Turn.MAX_ROLL_COUNT:
+            return []
+
+        face_counts = Counter(die.face_value for die in dice)
+        kept_face_value = max(face_counts, key=lambda face_value: (face_counts[face_value], face_value))
+        return [die.die_id for die in dice if die.face_value != kept_face_value]
+
+    def choose_score_type(self, scorecard: Scorecard, turn: Turn) -> ScoreType:
+        valid_scores = turn.get_valid_scores(scorecard)
+        return max(self._get_open_score_types(scorecard), key=lambda score_type: valid_scores[score_type.value])
+
+
+class LookupTableStrategy(Strategy):
+    """
+    Plays optimally for its own score, using a StrategyTable built by engine/solver.py
+    """
+    def __init__(self, strategy_table):
+        self.strategy_table = strategy_table
+
+    def choose_dice_to_roll(self, scorecard: Scorecard, turn: Turn) -> List[int]:
+        return self.strategy_table.get_best_keep(scorecard, turn).dice_to_roll
+
+    def choose_score_type(self, scorecard: Scorecard, turn: Turn) -> ScoreType:
+        return self.strategy_table.get_best_score_type(scorecard, turn.last_roll)
@@ -0,0 +1,452 @@
+import asyncio
+import json
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from state.yahtzee.player import RemoteConnection
+from util.metrics import METRICS
+
+MAX_COALESCED_UPDATES = 16  # More updates than this for one room in one flush are sent as a single snapshot instead
+RECONNECT_INTERVAL = 1.0    # Seconds between attempts to reach the hub
+MAX_NODE_BUFFER = 8 * 2**20 # Bytes the hub will buffer for a node before it gives up on it
+
+BACKPLANE_BYTES = METRICS.counter("yahtzee_backplane_bytes_total", "Bytes of room updates sent to the backplane hub")
+BACKPLANE_SNAPSHOTS = METRICS.counter("yahtzee_backplane_snapshots_total",
+                                      "Times a room's pending updates were replaced with a snapshot before sending")
+
+
+class RoomUpdate:
+    def __init__(self, payload: str, recipient_payloads: dict = None, get_latest_state=None):
+        """
+        One serialized game state update for a room, plus the payloads of the players that get their own version
+        of it (keyed by player name). get_latest_state is only there on the node that owns the room, see
+        Broadcaster.broadcast.
+        """
+        self.payload = payload
+        self.recipient_payloads = recipient_payloads or {}
+        self.get_latest_state = get_latest_state
+
+
+class Backplane(ABC):
+    """
+    Where rooms' game state updates are published, and where every node with players in a room picks them up.
+    The node that owns a room (the one with its StateManager) publishes its updates, and every node that has
+    subscribed to the room delivers them to its own connections.
+
+    Only the owner keeps the room's state. Other nodes forward their players' events to it, and ask it for their
+    players' snapshots (see claim). A backplane with a single node owns every room.
+    """
+    @abstractmethod
+    def subscribe(self, room_id: str, deliver):
+        """
+        deliver(room_id, updates) is called with a list of RoomUpdates, in order, whenever the room has some
+        """
+        pass
+
+    @abstractmethod
+    def unsubscribe(self, room_id: str, deliver):
+        pass
+
+    @abstractmethod
+    def publish(self, room_id: str, update: RoomUpdate):
+        pass
+
+    async def claim(self, room_id: str) -> bool:
+        """
+        Whether this node owns the room, and so has to keep its state. Nobody owning it yet makes this node its owner.
+        """
+        return True
+
+    def release(self, room_id: str):
+        """
+        Called once this node has nothing left to do with a room: it has evicted the room it owned, or its last
+        player in a room owned by another node has left
+        """
+        return self
+
+    def forward_event(self, room_id: str, connection_id: str, message: str):
+        """
+        Sends a message from one of this node's players to the owner of their room
+        """
+        raise NotImplementedError("Every room is owned by this node")
+
+    def request_snapshot(self, room_id: str, connection_id: str):
+        """
+        Asks the owner of the room for the snapshot of one of this node's players
+        """
+        raise NotImplementedError("Every room is owned by this node")
+
+    def send_snapshot(self, room_id: str, connection: RemoteConnection, payload: str):
+        """
+        Answers request_snapshot, on the node that owns the room
+        """
+        raise NotImplementedError("Every room is owned by this node")
+
+    async def start(self, node=None):
+        """
+        node is the EventBroker, which is told about the events, snapshot requests and snapshots that other nodes
+        send this one, and about rooms that have moved to another node (see SocketBackplane)
+        """
+        return self
+
+    async def close(self):
+        return self
+
+
+class InProcessBackplane(Backplane):
+    """
+    The backplane of a single node: updates are handed straight to the subscribers, as soon as they are published
+    """
+    def __init__(self):
+        self.log = logging.getLogger(__name__)
+        self.subscribers = {}   # room id -> deliver functions
+
+    def subscribe(self, room_id: str, deliver):
+        self.subscribers.setdefault(room_id, []).append(deliver)
+        return self
+
+    def unsubscribe(self, room_id: str, deliver):
+        subscribers = self.subscribers.get(room_id, [])
+        if deliver in subscribers:
+            subscribers.remove(deliver)
+        if not subscribers:
+            self.subscribers.pop(room_id, None)
+        return self
+
+    def publish(self, room_id: str, update: RoomUpdate):
+        self.deliver(room_id, [update])
+        return self
+
+    def deliver(self, room_id: str, updates):
+        for deliver in list(self.subscribers.get(room_id, [])):
+            deliver(room_id, updates)
+        return self
+
+
+def encode_frame(operation: str, room_id: str, body: bytes = b"") -> bytes:
+    """
+    Frames sent to and from the hub are a header line, "<operation> <room id> <body length>", then the body.
+    Room ids can't contain spaces (see ROOM_ID_PATTERN). The hub routes frames by their room, and only parses the
+    body of a snapshot, to find the node it is for.
+    """
+    return f"{operation} {room_id} {len(body)}\n".encode() + body
+
+
+async def read_frame(reader: asyncio.StreamReader):
+    """
+    The next (operation, room id, body) from reader. Raises asyncio.IncompleteReadError at the end of the stream.
+    """
+    header = await reader.readuntil(b"\n")
+    operation, room_id, body_length = header.decode().split()
+    return operation, room_id, await reader.readexactly(int(body_length))
+
+
+class SocketBackplane(InProcessBackplane):
+    def __init__(self, host: str, port: int, max_coalesced_updates: int = MAX_COALESCED_UPDATES):
+        """
+        A backplane shared by several nodes through a BackplaneHub. Updates are delivered to this node's own
+        subscribers straight away, like the InProcessBackplane, and sent on to the hub for everybody else.
+
+        The hub decides which node owns each room: the first one to claim it, until that node releases it or
+        disconnects. The other nodes' players in the room then have their events forwarded to the owner and their
+        snapshots sent back by it. A node that can't reach the hub owns every room it is asked about, and claims
+        them again once it reconnects. A room that is released, or that turns out to be owned by another node after
+        reconnecting, has moved: the node is told with node.handle_room_moved(room_id), and its players have to
+        reconnect.
+
+        Nothing is sent per update. Everything published during one pass of the event loop is written to the hub
+        at once, with one frame per room. A room with more than max_coalesced_updates updates waiting is sent as
+        a single snapshot instead, which is smaller and lets the other nodes' players catch up in one go.
+        """
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.max_coalesced_updates = max_coalesced_updates
+        self.node_id = uuid.uuid4().hex[:8]
+        self.node = None
+        self.pending = {}   # room id -> RoomUpdates published since the last flush
+        self.flush_handle = None
+        self.owned_rooms = set()
+        self.remote_rooms = set()   # ids of the rooms owned by other nodes
+        self.claims = {}    # room id -> Future of whether the hub made this node its owner
+        self.writer = None
+        self.connection_task = None
+
+    def subscribe(self, room_id: str, deliver):
+        if room_id not in self.subscribers:
+            self._send(encode_frame("subscribe", room_id))
+        return super().subscribe(room_id, deliver)
+
+    def unsubscribe(self, room_id: str, deliver):
+        super().unsubscribe(room_id, deliver)
+        if room_id not in self.subscribers:
+            self._send(encode_frame("unsubscribe", room_id))
+        return self
+
+    def publish(self, room_id: str, update: RoomUpdate):
+        super().publish(room_id, update)
+        if self.writer is None:
+            return self
+        self.pending.setdefault(room_id, []).append(update)
+        if self.flush_handle is None:
+            self.flush_handle = asyncio.get_event_loop().call_soon(self.flush)
+        return self
+
+    async def claim(self, room_id: str) -> bool:
+        if room_id in self.owned_rooms:
+            return True
+        if room_id in self.remote_rooms:
+            return False
+        if self.writer is None:
+            self.owned_rooms.add(room_id)
+            return True
+        if room_id not in self.claims:
+            self.claims[room_id] = asyncio.get_event_loop().create_future()
+            self._send(encode_frame("claim", room_id))
+        return await asyncio.shield(self.claims[room_id])
+
+    def release(self, room_id: str):
+        self.remote_rooms.discard(room_id)
+        if room_id in self.owned_rooms:
+            self.owned_rooms.discard(room_id)
+            self._send(encode_frame("release", room_id))
+        return self
+
+    def forward_event(self, room_id: str, connection_id: str, message: str):
+        body = {"node": self.node_id, "connection": connection_id, "message": message}
+        self._send(encode_frame("forward", room_id, json.dumps(body).encode()))
+        return self
+
+    def request_snapshot(self, room_id: str, connection_id: str):
+        body = {"node": self.node_id, "connection": connection_id}
+        self._send(encode_frame("snapshot_request", room_id, json.dumps(body).encode()))
+        return self
+
+    def send_snapshot(self, room_id: str, connection: RemoteConnection, payload: str):
+        # Updates published before the snapshot was taken have to reach the player first, it accounts for them
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush()
+        body = {"node": connection.node_id, "connection": connection.connection_id, "payload": payload}
+        self._send(encode_frame("snapshot", room_id, json.dumps(body).encode()))
+        return self
+
+    def flush(self):
+        """
+        Writes every room's pending updates to the hub in one go
+        """
+        self.flush_handle = None
+        frames = []
+        for room_id, updates in self.pending.items():
+            if len(updates) > self.max_coalesced_updates and updates[-1].get_latest_state is not None:
+                BACKPLANE_SNAPSHOTS.inc()
+                updates = [RoomUpdate(updates[-1].get_latest_state())]
+            body = json.dumps([[update.payload, update.recipient_payloads] for update in updates]).encode()
+            frames.append(encode_frame("publish", room_id, body))
+        self.pending.clear()
+        self._send(b"".join(frames))
+        return self
+
+    def _send(self, data: bytes):
+        # Anything sent while disconnected is lost, the subscriptions are sent again on reconnecting
+        if self.writer is not None and data:
+            self.writer.write(data)
+            BACKPLANE_BYTES.inc(amount=len(data))
+
+    async def start(self, node=None):
+        self.node = node
+        self.connection_task = asyncio.ensure_future(self._stay_connected())
+        return self
+
+    def _set_owner(self, room_id: str, owned: bool):
+        claim = self.claims.pop(room_id, None)
+        if owned:
+            self.owned_rooms.add(room_id)
+            self.remote_rooms.discard(room_id)
+        elif room_id in self.owned_rooms:
+            # Somebody claimed the room while this node couldn't reach the hub
+            self.owned_rooms.discard(room_id)
+            self._room_moved(room_id)
+        else:
+            self.remote_rooms.add(room_id)
+        if claim is not None and not claim.done():
+            claim.set_result(owned)
+
+    def _room_moved(self, room_id: str):
+        self.remote_rooms.discard(room_id)
+        if self.node is not None:
+            self.node.handle_room_moved(room_id)
+
+    def _receive(self, operation: str, room_id: str, body: bytes):
+        if operation == "publish":
+            self.deliver(room_id, [RoomUpdate(payload, recipient_payloads)
+                                   for payload, recipient_payloads in json.loads(body)])
+        elif operation in ("owned", "remote"):
+            self._set_owner(room_id, operation == "owned")
+        elif operation == "released":
+            self._room_moved(room_id)
+        elif self.node is None:
+            return
+        elif operation == "node_left":
+            # The node's id is sent in place of a room id
+            self.node.handle_node_left(room_id)
+        elif operation == "forward":
+            body = json.loads(body)
+            self.node.handle_forwarded_event(room_id, RemoteConnection(body["node"], body["connection"]), body["message"])
+        elif operation == "snapshot_request":
+            body = json.loads(body)
+            self.node.handle_snapshot_request(room_id, RemoteConnection(body["node"], body["connection"]))
+        elif operation == "snapshot":
+            body = json.loads(body)
+            self.node.handle_snapshot(room_id, body["connection"], body["payload"])
+
+    def _disconnected(self):
+        # Claims still waiting for the hub are granted, the players of rooms owned elsewhere can't be served, and
+        # the other nodes' players in this node's rooms are gone
+        for room_id, claim in list(self.claims.items()):
+            self._set_owner(room_id, True)
+        for room_id in list(self.remote_rooms):
+            self._room_moved(room_id)
+        if self.node is not None:
+            self.node.handle_node_left()
+
+    async def _stay_connected(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as e:
+                self.log.warning(f"Can't reach the backplane hub at {self.host}:{self.port}: {e}")
+                await asyncio.sleep(RECONNECT_INTERVAL)
+                continue
+            self.log.info(f"Connected to the backplane hub at {self.host}:{self.port}")
+            self.writer = writer
+            self._send(encode_frame("hello", self.node_id)
+                       + b"".join(encode_frame("subscribe", room_id) for room_id in self.subscribers)
+                       + b"".join(encode_frame("claim", room_id) for room_id in self.owned_rooms))
+            try:
+                while True:
+                    self._receive(*await read_frame(reader))
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                self.log.warning(f"Lost the connection to the backplane hub: {e!r}")
+            finally:
+                self.writer = None
+                self.pending.clear()
+                writer.close()
+                self._disconnected()
+            await asyncio.sleep(RECONNECT_INTERVAL)
+
+    async def close(self):
+        if self.connection_task is not None:
+            self.connection_task.cancel()
+            try:
+                await self.connection_task
+            except asyncio.CancelledError:
+                pass
+        return self
+
+
+class BackplaneHub:
+    def __init__(self, host: str, port: int):
+        """
+        Passes rooms' updates between the nodes of a SocketBackplane. Every node tells the hub which rooms it has
+        players in, and the hub forwards each frame a room's owner publishes, untouched, to the other nodes
+        subscribed to the room. The hub also keeps track of which node owns each room, and passes the other nodes'
+        events and snapshot requests to it, and its snapshots back. One node runs the hub alongside its broker.
+        """
+        self.log = logging.getLogger(__name__)
+        self.host = host
+        self.port = port
+        self.subscriptions = {}     # node writer -> room ids it is subscribed to
+        self.node_tasks = {}        # node writer -> the task handling its frames
+        self.nodes = {}             # node id -> node writer
+        self.owners = {}            # room id -> writer of the node that owns it
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_node, self.host, self.port)
+        self.log.info(f"Backplane hub listening on {self.host}:{self.port}")
+        return self
+
+    async def handle_node(self, reader, writer):
+        self.node_tasks[writer] = asyncio.current_task()
+        room_ids = self.subscriptions[writer] = set()
+        try:
+            while True:
+                operation, room_id, body = await read_frame(reader)
+                if operation == "hello":
+                    # The node's id is sent in place of a room id
+                    self.nodes[room_id] = writer
+                elif operation == "subscribe":
+                    room_ids.add(room_id)
+                elif operation == "unsubscribe":
+                    room_ids.discard(room_id)
+                elif operation == "claim":
+                    owner = self.owners.setdefault(room_id, writer)
+                    self.send(writer, encode_frame("owned" if owner is writer else "remote", room_id))
+                elif operation == "release":
+                    if self.owners.get(room_id) is writer:
+                        self.release(room_id)
+                elif operation == "publish":
+                    if self.owners.get(room_id) is writer:
+                        self.forward(writer, room_id, encode_frame(operation, room_id, body))
+                elif operation in ("forward", "snapshot_request"):
+                    owner = self.owners.get(room_id)
+                    if owner is not None and owner is not writer:
+                        self.send(owner, encode_frame(operation, room_id, body))
+                elif operation == "snapshot":
+                    node = self.nodes.get(json.loads(body)["node"])
+                    if node is not None:
+                        self.send(node, encode_frame(operation, room_id, body))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            self.log.info(f"Node disconnected from the backplane hub: {e!r}")
+        finally:
+            self.disconnect(writer)
+            self.node_tasks.pop(writer, None)
+
+    def release(self, room_id: str):
+        """
+        The room's owner is done with it. Any other node with players in it has to send them elsewhere.
+        """
+        owner = self.owners.pop(room_id)
+        self.forward(owner, room_id, encode_frame("released", room_id))
+        return self
+
+    def forward(self, publisher, room_id: str, frame: bytes):
+        for node, room_ids in list(self.subscriptions.items()):
+            if node is not publisher and room_id in room_ids:
+                self.send(node, frame)
+        return self
+
+    def send(self, node, frame: bytes):
+        if node.transport.get_write_buffer_size() > MAX_NODE_BUFFER:
+            # Buffering more would only hold on to updates that are long out of date, the node reconnects
+            self.log.warning("A node isn't keeping up with the backplane hub, disconnecting it")
+            self.disconnect(node)
+            return self
+        node.write(frame)
+        return self
+
+    def disconnect(self, node):
+        if self.subscriptions.pop(node, None) is None:
+            return self
+        for node_id in [node_id for node_id, writer in self.nodes.items() if writer is node]:
+            del self.nodes[node_id]
+            for other_node in list(self.subscriptions):
+                self.send(other_node, encode_frame("node_left", node_id))
+        for room_id in [room_id for room_id, owner in self.owners.items() if owner is node]:
+            self.release(room_id)
+        node.close()
+        return self
+
+    async def close(self):
+        """
+        Stops accepting nodes, then disconnects the ones that are connected and waits for their handlers to finish
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        tasks = list(self.node_tasks.values())
+        for writer in list(self.node_tasks):
+            writer.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return self
@@ -0,0 +1,159 @@
+import asyncio
+import copy
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict
+
+from engine.entities import Roll, Turn
+from engine.strategies import GreedyStrategy, LookupTableStrategy, Strategy
+from events.event import Event
+from state.yahtzee.player import BotPlayer
+
+DEFAULT_STRATEGY_NAME = "greedy"
+
+
+def load_strategies(strategy_table_path: str) -> Dict[str, Strategy]:
+    """
+    The strategies bots can play with, by name. The "optimal" strategy needs NumPy and a table built with
+    yahtzee_solve, so it's only available when both are there.
+    """
+    log = logging.getLogger(__name__)
+    strategies = {DEFAULT_STRATEGY_NAME: GreedyStrategy()}
+    if not os.path.exists(strategy_table_path):
+        log.info(f"No strategy table at {strategy_table_path}, optimal bots will play greedy")
+        return strategies
+    try:
+        from engine.solver import StrategyTable
+    except ImportError:
+        log.warning("NumPy is not installed (pip install .[simulation]), optimal bots will play greedy")
+        return strategies
+    strategies["optimal"] = LookupTableStrategy(StrategyTable.load(strategy_table_path))
+    return strategies
+
+
+class BotBudget:
+    def __init__(self, cpu_seconds_per_minute: float):
+        """
+        A token bucket of CPU time for the bots of one room. It holds up to a minute's worth of CPU seconds
+        and refills continuously, so a burst of moves is fine but a room can't keep a worker busy.
+        """
+        self.capacity = cpu_seconds_per_minute
+        self.refill_rate = cpu_seconds_per_minute / 60
+        self.available = cpu_seconds_per_minute
+        self.last_refill = time.monotonic()
+
+    def _refill(self, now: float):
+        self.available = min(self.capacity, self.available + (now - self.last_refill) * self.refill_rate)
+        self.last_refill = now
+
+    def get_wait_time(self, now: float = None) -> float:
+        """
+        How long to wait before the budget allows another move
+        """
+        self._refill(time.monotonic() if now is None else now)
+        if self.available > 0:
+            return 0
+        return -self.available / self.refill_rate
+
+    def charge(self, cpu_seconds: float, now: float = None):
+        self._refill(time.monotonic() if now is None else now)
+        self.available -= cpu_seconds
+        return self
+
+
+class BotController:
+    def __init__(self, strategies: Dict[str, Strategy], executor, send_game_state_update,
+                 move_delay: float, cpu_seconds_per_minute: float):
+        """
+        Plays the turns of the bots in each room. Whenever it is a bot's turn, a task for the room asks the bot's
+        strategy for its next move in the executor, so that thinking never blocks the event loop, and then plays
+        that move through the room's StateManager like any other event. send_game_state_update(room) is awaited
+        after each move.
+        """
+        self.log = logging.getLogger(__name__)
+        self.strategies = strategies
+        self.executor = executor
+        self.send_game_state_update = send_game_state_update
+        self.move_delay = move_delay
+        self.cpu_seconds_per_minute = cpu_seconds_per_minute
+
+    def schedule(self, room):
+        """
+        Starts playing bot turns in the room, unless that is already happening or it isn't a bot's turn
+        """
+        if self._get_bot_turn(room) is None or (room.bot_task is not None and not room.bot_task.done()):
+            return self
+        if room.bot_budget is None:
+            room.bot_budget = BotBudget(self.cpu_seconds_per_minute)
+        room.bot_task = asyncio.get_event_loop().create_task(self.play_bot_turns(room))
+        return self
+
+    async def play_bot_turns(self, room):
+        """
+        Plays bot moves for as long as it is a bot's turn and someone is there to watch, here or on another node
+        """
+        try:
+            while room.connections or room.remote_connections:
+                turn = self._get_bot_turn(room)
+                if turn is None:
+                    break
+                await asyncio.sleep(max(self.move_delay, room.bot_budget.get_wait_time()))
+
+                scorecard = room.state_manager.game_engine.current_scorecard
+                roll_count = turn.roll_count
+                strategy = self.strategies.get(turn.player.strategy_name, self.strategies[DEFAULT_STRATEGY_NAME])
+                event_type, data, cpu_seconds = await asyncio.get_event_loop().run_in_executor(
+                    self.executor, self._choose_move, strategy, *self._copy_turn_state(scorecard, turn))
+                room.bot_budget.charge(cpu_seconds)
+
+                # A human could have played the move for the bot while it was thinking
+                if room.state_manager.game_engine.current_turn is not turn or turn.roll_count != roll_count:
+                    continue
+                room.process_event(self._create_event(event_type, turn.player, data))
+                await self.send_game_state_update(room)
+        except Exception as e:
+            # Stop playing rather than retrying a move that failed; the next event in the room starts a new task
+            self.log.error(e, exc_info=True)
+
+    @staticmethod
+    def _get_bot_turn(room):
+        game_engine = room.state_manager.game_engine
+        turn = game_engine.current_turn
+        if not game_engine.game_started or turn is None or turn.is_turn_complete() or not isinstance(turn.player, BotPlayer):
+            return None
+        return turn
+
+    @staticmethod
+    def _copy_turn_state(scorecard, turn: Turn):
+        """
+        The strategy runs on another thread, so it gets its own copy of the scorecard and turn to look at
+        """
+        scorecard = copy.deepcopy(scorecard, {id(scorecard.player): scorecard.player})
+        turn = Turn(player=turn.player, last_roll=Roll.from_face_values(turn.last_roll.get_face_values()),
+                    roll_count=turn.roll_count)
+        return scorecard, turn
+
+    @staticmethod
+    def _choose_move(strategy: Strategy, scorecard, turn: Turn):
+        """
+        Runs in the executor. Returns the event to play and how much CPU time choosing it took.
+        """
+        start = time.thread_time()
+        dice_to_roll = strategy.choose_dice_to_roll(scorecard, turn) if turn.roll_count < Turn.MAX_ROLL_COUNT else []
+        if dice_to_roll:
+            event_type, data = "rolled_dice", {"dice_to_roll": dice_to_roll}
+        else:
+            event_type, data = "score_selected", {"selected_score_type": strategy.choose_score_type(scorecard, turn).value}
+        return event_type, data, time.thread_time() - start
+
+    @staticmethod
+    def _create_event(event_type: str, bot: BotPlayer, data: dict) -> Event:
+        message = {
+            "timestamp": datetime.utcnow().timestamp() * 1000,
+            "type": event_type,
+            "data": {"player_name": bot.name, **data}
+        }
+        return Event(json.dumps(message), websocket=None)
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import websockets
+from functools import partial
+from util.codec import STDLIB_JSON, Codec
+from util.log import SAMPLED
+from util.metrics import METRICS
+
+BROADCAST_BYTES = METRICS.counter("yahtzee_broadcast_bytes_total", "Bytes of game state put on outbound queues")
+COALESCED_UPDATES = METRICS.counter("yahtzee_coalesced_updates_total",
+                                    "Times a full outbound queue was replaced with the latest state")
+SLOW_CONSUMER_DISCONNECTS = METRICS.counter("yahtzee_slow_consumer_disconnects_total",
+                                            "Connections closed because sending to them took longer than the send timeout")
+
+
+class ClientConnection:
+    def __init__(self, websocket, queue_size: int, send_timeout: float = None, codec: Codec = STDLIB_JSON):
+        """
+        Wraps a websocket with a bounded outbound queue that is drained by its own writer task,
+        so that sending to one slow client never holds up anybody else. A client that takes longer than
+        send_timeout seconds to take a single message is disconnected, rather than being coalesced forever.
+        Payloads are rendered as JSON, and put on the queue encoded with the codec the client asked for.
+        """
+        self.log = logging.getLogger(__name__)
+        self.websocket = websocket
+        self.send_timeout = send_timeout
+        self.codec = codec
+        self.outbound = asyncio.Queue(maxsize=queue_size)
+        self.writer = None
+        self.coalesced_count = 0
+        self.enqueued_bytes = 0     # Everything put on the queue so far, encoded
+
+    def start(self):
+        self.writer = asyncio.ensure_future(self._drain())
+        return self
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.cancel()
+            try:
+                await self.writer
+            except asyncio.CancelledError:
+                pass
+        return self
+
+    def enqueue(self, payload, get_latest_state=None) -> bool:
+        """
+        Queues a payload to be sent to the client without waiting for it to be sent.
+
+        If the queue is full the client has fallen too far behind to catch up one update at a time, so
+        everything that is queued is thrown away and replaced with the latest full state (if a way to get
+        it was given). Returns False if the queue was full.
+        """
+        try:
+            self._put(payload)
+            return True
+        except asyncio.QueueFull:
+            self.coalesced_count += 1
+            COALESCED_UPDATES.inc()
+            self.log.warning("Outbound queue is full, coalescing to the latest state (%d times)", self.coalesced_count,
+                             extra=SAMPLED)
+            while not self.outbound.empty():
+                self.outbound.get_nowait()
+            if get_latest_state is not None:
+                self._put(get_latest_state())
+            return False
+
+    def try_enqueue(self, payload) -> bool:
+        """
+        Queues a payload only if there is room for it. Unlike enqueue, a full queue is left as it is, so that a
+        message the client can do without never pushes out its game state updates.
+        """
+        try:
+            self._put(payload)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def _put(self, payload):
+        encoded = self.codec.encode_update(payload)
+        self.outbound.put_nowait(encoded)
+        self.enqueued_bytes += self.codec.get_encoded_size(encoded)
+
+    def get_queue_depth(self) -> int:
+        return self.outbound.qsize()
+
+    async def _drain(self):
+        try:
+            while True:
+                payload = await self.outbound.get()
+                await asyncio.wait_for(self.websocket.send(payload), self.send_timeout)
+        except asyncio.TimeoutError:
+            SLOW_CONSUMER_DISCONNECTS.inc()
+            self.log.warning("Sending took longer than %ss, disconnecting the client", self.send_timeout, extra=SAMPLED)
+            # The broker cleans up once the connection is closed
+            await self.websocket.close(code=1008, reason="Too slow")
+        except websockets.ConnectionClosed:
+            # The broker notices the closed connection on its end and cleans up after it
+            self.log.info("Connection closed while sending, stopping writer")
+
+
+class Broadcaster:
+    def __init__(self):
+        """
+        Fans a single serialized payload out to many ClientConnections.
+        """
+        self.log = logging.getLogger(__name__)
+
+    def broadcast(self, connections, payload, get_latest_state=None, get_recipient=None, recipient_payloads=None):
+        """
+        Puts the same already-serialized payload on every connection's outbound queue.
+        The latest full state is only serialized if a connection needs it, and then only once.
+
+        Some updates are different for some recipients. If get_recipient is given, it is called with each
+        connection to find out who it belongs to, recipients in recipient_payloads get their own payload
+        instead, and get_latest_state is called with the recipient (once per recipient).
+        """
+        latest_states = {}
+
+        def get_latest_state_once(recipient):
+            if recipient not in latest_states:
+                latest_states[recipient] = get_latest_state(recipient) if get_recipient is not None else get_latest_state()
+            return latest_states[recipient]
+
+        sent_bytes = 0
+        for connection in connections:
+            recipient = get_recipient(connection) if get_recipient is not None else None
+            recipient_payload = (recipient_payloads or {}).get(recipient, payload)
+            # Counted as encoded for the connection, including a snapshot that replaced a full queue
+            enqueued_bytes = connection.enqueued_bytes
+            connection.enqueue(recipient_payload, partial(get_latest_state_once, recipient) if get_latest_state is not None else None)
+            sent_bytes += connection.enqueued_bytes - enqueued_bytes
+        BROADCAST_BYTES.inc(amount=sent_bytes)
+        return self
@@ -1,75 +1,135 @@
-import json
 import logging
 from datetime import datetime
+from enum import Enum
 from pytz import timezone
+from util.codec import STDLIB_JSON, Codec
 
 
-VALID_EVENTS = [  # TODO: could make this an enum
-    "chat_message",
-    "game_started",
-    "player_joined",
-    "player_left",
-    "rolled_dice",
-    "score_selected",
-    "update_turn"
-]
+class EventType(Enum):
+    BOT_ADDED = "bot_added"
+    CHAT_MESSAGE = "chat_message"
+    GAME_STARTED = "game_started"
+    PLAYER_JOINED = "player_joined"
+    PLAYER_LEFT = "player_left"
+    RESYNC_REQUESTED = "resync_requested"
+    ROLLED_DICE = "rolled_dice"
+    SCORE_SELECTED = "score_selected"
+    UPDATE_TURN = "update_turn"
+
+
+# The fields each type of event needs in its "data", and their types
+EVENT_SCHEMAS = {
+    EventType.BOT_ADDED: {"player_name": str, "bot_name": str},
+    EventType.CHAT_MESSAGE: {"player_name": str, "content": str, "destination": str},
+    EventType.GAME_STARTED: {"player_name": str},
+    EventType.PLAYER_JOINED: {"player_name": str},
+    EventType.PLAYER_LEFT: {},
+    EventType.RESYNC_REQUESTED: {},
+    EventType.ROLLED_DICE: {"player_name": str, "dice_to_roll": list},
+    EventType.SCORE_SELECTED: {"player_name": str, "selected_score_type": str},
+    EventType.UPDATE_TURN: {},
+}
+
+EASTERN = timezone("US/Eastern")
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 
 class Event:
-    def __init__(self, message: str, websocket):
+    def __init__(self, message: str, websocket, max_field_length: int = None, codec: Codec = STDLIB_JSON):
+        """
+        Decodes a message from the front end. Each step only runs if the previous one passed, cheapest first:
+        parse the JSON, look the type up in EventType, check the timestamp is a number, then check "data"
+        against the type's schema. Nothing else is done with a message that fails, so junk costs very little.
+        If max_field_length is given, string fields in "data" can't be longer than that, so that one
+        player can't put a huge chat message in everybody's transcript. The message is decoded with codec, so it
+        can also be bytes from a client that talks the binary subprotocol (see util/codec.py).
+
+        The formatted timestamps are only worked out when something reads them (usually a transcript Message).
+        """
         self.log = logging.getLogger(__name__)
         self.message = message
         self.websocket = websocket
-        self.event_dict = self.parse_message_to_dict()
-        self.timestamp = self.get_timestamp()
-        self.timestamp_est = self.get_timestamp(tz=timezone("US/Eastern"))
-        self.type = self.get_type()
-        self.data = self.get_data()
+        self.max_field_length = max_field_length
+        self.codec = codec
+        self.event_dict = {}
+        self.event_type = None
+        self.type = None
+        self.data = None
+        self.timestamp_ms = None
+        self._timestamps = {}
+        # The dice a rolled_dice event came up with, when it is replayed from the event log
+        self.recorded_roll = None
 
-        self.is_valid = self.validate_event()
+        rejection = self.decode()
+        self.is_valid = rejection is None
+        if not self.is_valid:
+            self.log.debug("Rejecting message (%s): %s", rejection, message)
 
-    def parse_message_to_dict(self) -> dict:
-        self.log.debug("Parsing message to dict")
+    def decode(self):
+        """
+        Fills in the event from the message. Returns why the message is not a valid event, or None if it is.
+        """
         try:
-            event_dict = json.loads(self.message)
-            return event_dict
-        except json.decoder.JSONDecodeError as e:
-            self.log.error("Error when deserializing JSON, formatting is likely incorrect.")
-            return {}
+            event_dict = self.codec.decode(self.message)
+        except (TypeError, ValueError):
+            return "not decodable"
+        if not isinstance(event_dict, dict):
+            return "not a JSON object"
+        self.event_dict = event_dict
+
+        # The type, timestamp and data are kept even if the event turns out to be invalid, the broker's
+        # player_left message is processed without being valid
+        self.type = event_dict.get("type")
+        self.data = event_dict.get("data")
+        self.event_type = EventType._value2member_map_.get(self.type) if isinstance(self.type, str) else None
+        if self.event_type is None:
+            return "unknown type"
 
-    def get_timestamp(self, tz=None):
-        self.log.debug("Parsing timestamp from message")
         try:
-            return datetime.fromtimestamp(float(self.event_dict["timestamp"])/1000, tz=tz).strftime("%Y-%m-%d %H:%M:%S")
-        except KeyError as e:
-            self.log.error(f"Error parsing message, there was no 'timestamp' included in the message: {self.message}")
+            self.timestamp_ms = float(event_dict["timestamp"])
+        except (KeyError, TypeError, ValueError):
+            return "no timestamp"
+        if not self.timestamp_ms:
+            return "no timestamp"
+
+        if not isinstance(self.data, dict) or not self.data:
+            return "no data"
+        for field, field_type in EVENT_SCHEMAS[self.event_type].items():
+            if not isinstance(self.data.get(field), field_type):
+                return f"data.{field} is missing or not a {field_type.__name__}"
+            if self.max_field_length is not None and field_type is str and len(self.data[field]) > self.max_field_length:
+                return f"data.{field} is longer than {self.max_field_length} characters"
+        if self.event_type is EventType.ROLLED_DICE:
+            # bool is an int too, but true isn't a die
+            if not all(type(die_id) is int and 1 <= die_id <= 5 for die_id in self.data["dice_to_roll"]):
+                return "data.dice_to_roll has to be die ids from 1 to 5"
+
+        return None
+
+    def get_datetime(self, tz=None):
+        if self.timestamp_ms is None:
             return None
+        return datetime.fromtimestamp(self.timestamp_ms / 1000, tz=tz)
+
+    def get_timestamp(self, tz=None):
+        if tz not in self._timestamps:
+            timestamp = self.get_datetime(tz)
+            self._timestamps[tz] = timestamp.strftime(TIMESTAMP_FORMAT) if timestamp is not None else None
+        return self._timestamps[tz]
+
+    @property
+    def timestamp(self):
+        return self.get_timestamp()
+
+    @property
+    def timestamp_est(self):
+        return self.get_timestamp(tz=EASTERN)
 
     def get_type(self):
-        self.log.debug("Parsing type from message")
-        try:
-            return self.event_dict["type"]
-        except KeyError as e:
-            self.log.error(f"Error parsing message, there was no 'type' included in the message: {self.message}")
-            return None
+        return self.type
 
     def get_data(self):
-        self.log.debug("Parsing data from message")
-        try:
-            return self.event_dict["data"]
-        except KeyError:
-            self.log.error(f"Error parsing message, there was no 'data' included in the message: {self.message}")
-            return None
+        return self.data
 
     def validate_event(self):
-        """
-        It is considered a valid event if the JSON was parsed and each of the expected fields is filled out
-        """
-        self.log.debug("Assessing event validity")
-        if len(self.event_dict) > 0 \
-                and self.timestamp \
-                and self.type \
-                and self.data\
-                and self.type in VALID_EVENTS:
-            return True
-        return False
+        return self.is_valid
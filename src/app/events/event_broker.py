@@ -1,50 +1,262 @@
 import asyncio
 import json
 import logging
+import socket
+import time
 import websockets
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
+from multiprocessing.reduction import recvfds
+from events.backplane import BackplaneHub, InProcessBackplane, RoomUpdate, SocketBackplane
+from events.bots import BotController, load_strategies
+from events.broadcast import Broadcaster, ClientConnection
 from events.event import Event
-from state.state_manager import StateManager
+from events.rate_limit import TokenBucket
+from events.room import RemoteRoom, Room, RoomRegistry
+from events.update_scheduler import UpdateScheduler
+from state.event_log import EventLog
+from state.yahtzee.player import RemoteConnection, get_connection_id
+from util.codec import BinaryCodec, get_json_codec
 from util.config import Config
+from util.log import SAMPLED
+from util.metrics import METRICS
+from util.metrics_server import MetricsServer
 
 
-PLAYER_CONNECTIONS = set()    # TODO: Could make some kind of a connections class
+PLAYER_CONNECTIONS = set()    # Every connected websocket, across all rooms
+
+EVENTS_RECEIVED = METRICS.counter("yahtzee_events_received_total", "Messages received from clients, by event type",
+                                  label_names=["event_type"])
+MESSAGES_DROPPED = METRICS.counter("yahtzee_messages_dropped_total",
+                                   "Messages dropped because a rate limit was exceeded, by limit (connection, room or gameplay)",
+                                   label_names=["limit"])
+EVENT_LOOP_LAG = METRICS.histogram("yahtzee_event_loop_lag_seconds",
+                                   "How late the event loop woke up a periodic timer")
 
 
 class EventBroker:
-    def __init__(self):
+    def __init__(self, config: Config = None):
         self.log = logging.getLogger(__name__)
-        self.config = Config()
-        self.state_manager = StateManager()
+        self.config = config or Config()
+        self.event_log = EventLog(self.config.EVENT_LOG_DIRECTORY) if self.config.EVENT_LOG_DIRECTORY else None
+        # Every client gets JSON unless it asks for another codec with its websocket subprotocol
+        self.json_codec = get_json_codec(self.config.JSON_CODEC)
+        self.codecs = {codec.subprotocol: codec for codec in (self.json_codec, BinaryCodec(self.json_codec))}
+        self.rooms = RoomRegistry(idle_timeout=self.config.ROOM_IDLE_TIMEOUT, event_log=self.event_log,
+                                  transcript_max_messages=self.config.TRANSCRIPT_MAX_MESSAGES, codec=self.json_codec)
+        self.remote_rooms = {}  # room id -> RemoteRoom, for the rooms owned by other nodes (see Backplane.claim)
+        self.broadcaster = Broadcaster()
+        self.updates = UpdateScheduler(self.send_game_state_update, interval=self.config.UPDATE_INTERVAL,
+                                       batched_event_types=self.config.BATCHED_EVENT_TYPES)
+        if self.config.BACKPLANE == "socket":
+            self.backplane = SocketBackplane(self.config.BACKPLANE_HOST, self.config.BACKPLANE_PORT)
+        else:
+            self.backplane = InProcessBackplane()
+        self.bots = BotController(
+            strategies=load_strategies(self.config.STRATEGY_TABLE_PATH),
+            executor=ThreadPoolExecutor(max_workers=self.config.BOT_WORKERS, thread_name_prefix="bot"),
+            send_game_state_update=self.updates.flush,
+            move_delay=self.config.BOT_MOVE_DELAY,
+            cpu_seconds_per_minute=self.config.BOT_CPU_SECONDS_PER_MINUTE
+        )
+        self.register_metrics()
+
+    def register_metrics(self):
+        """
+        Gauges that are worked out from the state of the server whenever the metrics are scraped
+        """
+        METRICS.gauge("yahtzee_connected_sockets", "Connected websockets, across all rooms",
+                      function=lambda: len(PLAYER_CONNECTIONS))
+        METRICS.gauge("yahtzee_rooms", "Rooms that haven't been evicted", function=lambda: len(self.rooms))
+        METRICS.gauge("yahtzee_active_games", "Rooms with a game that has started and isn't over",
+                      function=lambda: len([room for room in self.rooms.rooms.values() if self._is_game_active(room)]))
+        METRICS.gauge("yahtzee_send_queue_depth", "Messages waiting in all outbound queues",
+                      function=lambda: sum(connection.get_queue_depth() for room in self.rooms.rooms.values()
+                                           for connection in room.connections))
+        METRICS.gauge("yahtzee_send_queue_depth_max", "Messages waiting in the longest outbound queue",
+                      function=lambda: max([connection.get_queue_depth() for room in self.rooms.rooms.values()
+                                            for connection in room.connections], default=0))
+        return self
+
+    @staticmethod
+    def _is_game_active(room: Room) -> bool:
+        game_engine = room.state_manager.game_engine
+        return game_engine.game_started and game_engine.game_winner["player_name"] is None
+
+    async def send_game_state_update(self, room: Room):
+        """
+        Sends everything that changed in a room since the last update to every player in that room, through the
+        backplane (see deliver_updates). Players get a full snapshot when they join (see send_game_state_snapshot),
+        so from then on they only need the deltas. See StateManager.publish_state_delta for the protocol.
+
+        The delta is serialized once and put on each player's outbound queue, so this never waits on a slow
+        player. A player whose queue is full gets the latest full snapshot instead of the backlog. Only the
+        two players of a private conversation get its new messages, in a delta of their own.
+        """
+        if self.rooms.rooms.get(room.room_id) is not room:
+            # The room has moved to another node (see handle_room_moved), which publishes its updates now
+            return self
+        self.log.debug("Sending a game state update to all players in room %s", room.room_id, extra=SAMPLED)
+        event, player_events = room.state_manager.publish_state_deltas()
+        self.backplane.publish(room.room_id, RoomUpdate(event, player_events, room.state_manager.publish_current_state))
+        return self
+
+    def deliver_updates(self, room_id: str, updates):
+        """
+        Called by the backplane with the updates of a room that has players connected to this server, whether
+        the room's state is here or on another node
+        """
+        room = self.rooms.rooms.get(room_id) or self.remote_rooms.get(room_id)
+        if room is None:
+            return self
+        connections = room.connections
+        if isinstance(room, RemoteRoom) and room.awaiting_snapshot:
+            connections = connections - room.awaiting_snapshot
+        for update in updates:
+            self.broadcaster.broadcast(connections, update.payload, update.get_latest_state,
+                                       get_recipient=lambda connection: room.get_player_name(connection.websocket),
+                                       recipient_payloads=update.recipient_payloads)
+        return self
+
+    async def send_game_state_snapshot(self, connection: ClientConnection, room: Room):
+        """
+        Sends the full game state of a room to a single player, either because they just joined or because
+        they fell behind and asked for a resync. Any update waiting for the next tick goes out first, so that the
+        snapshot's version accounts for it.
+        """
+        self.log.info(f"Sending a game state snapshot to a player in room {room.room_id}")
+        if isinstance(room, RemoteRoom):
+            # The owner of the room sends it back, see handle_snapshot
+            room.awaiting_snapshot.add(connection)
+            self.backplane.request_snapshot(room.room_id, get_connection_id(connection.websocket))
+            return self
+        await self.updates.flush_pending(room)
+        connection.enqueue(room.state_manager.publish_current_state(room.state_manager.get_player_name(connection.websocket)))
+        return self
+
+    def handle_snapshot_request(self, room_id: str, connection: RemoteConnection):
+        """
+        Called by the backplane when a player connected to another node needs a snapshot of a room this node owns
+        """
+        asyncio.ensure_future(self.send_remote_snapshot(room_id, connection))
+        return self
+
+    async def send_remote_snapshot(self, room_id: str, connection: RemoteConnection):
+        room = self.rooms.rooms.get(room_id)
+        if room is None:
+            # Evicted, and released, after the request was sent
+            return self
+        room.remote_connections.add(connection)
+        room.touch()
+        await self.updates.flush_pending(room)
+        self.backplane.send_snapshot(room_id, connection, room.state_manager.publish_current_state(room.get_player_name(connection)))
+        return self
+
+    def handle_snapshot(self, room_id: str, connection_id: str, payload: str):
+        """
+        Called by the backplane with the snapshot the owner of a room sent for one of this node's players
+        """
+        room = self.remote_rooms.get(room_id)
+        if room is None:
+            return self
+        for connection in room.connections:
+            if get_connection_id(connection.websocket) == connection_id:
+                room.awaiting_snapshot.discard(connection)
+                connection.enqueue(payload)
+        return self
+
+    def handle_forwarded_event(self, room_id: str, connection: RemoteConnection, message: str):
+        """
+        Called by the backplane with a message from a player connected to another node, in a room this node owns
+        """
+        asyncio.ensure_future(self.process_forwarded_event(room_id, connection, message))
+        return self
+
+    async def process_forwarded_event(self, room_id: str, connection: RemoteConnection, message: str):
+        room = self.rooms.rooms.get(room_id)
+        if room is None:
+            return self
+        room.touch()
+        event = Event(message, connection, max_field_length=self.config.MAX_FIELD_LENGTH)
+        if event.type == "player_left":
+            # The message the other node made up when the player's websocket closed (see unregister_websocket)
+            room.remote_connections.discard(connection)
+            room.process_event(event)
+            await self.updates.flush(room)
+        elif not event.is_valid:
+            self.log.warning("A forwarded event is NOT a valid event", extra=SAMPLED)
+        else:
+            room.remote_connections.add(connection)
+            await self.process_client_event(room, event)
+        return self
 
-    async def send_game_state_update(self):
+    def handle_node_left(self, node_id: str = None):
         """
-        This sends the whole game state whenever it is called. This seems to work well since we can
-        pass the whole game state along to each component in React and always use the updated
-        version of each variable.
+        Called by the backplane when the players connected through another node (or through any other node, if
+        node_id is None) can't be reached anymore. They leave the rooms this node owns.
         """
-        self.log.info("Sending a game state update to all players")
-        if PLAYER_CONNECTIONS:  # asyncio.wait doesn't accept an empty list
-            event = self.state_manager.publish_current_state()
-            await asyncio.wait([socket_client.send(event) for socket_client in PLAYER_CONNECTIONS])
+        for room in list(self.rooms.rooms.values()):
+            for connection in list(room.remote_connections):
+                if node_id is None or connection.node_id == node_id:
+                    asyncio.ensure_future(self.process_forwarded_event(room.room_id, connection,
+                                                                       self.create_player_left_message()))
         return self
 
-    async def register_websocket(self, websocket):
+    def handle_room_moved(self, room_id: str):
+        """
+        Called by the backplane when a room is no longer where this node thought: its owner let go of it, or
+        another node took it over while this one couldn't reach the hub. Its players here are disconnected, and
+        reconnect to wherever the room is now.
+        """
+        room = self.rooms.rooms.pop(room_id, None) or self.remote_rooms.pop(room_id, None)
+        if room is None:
+            return self
+        self.log.warning(f"Room {room_id} has moved to another node, disconnecting its players")
+        for connection in list(room.connections):
+            asyncio.ensure_future(connection.websocket.close(code=1012, reason="Room moved"))
+        return self
+
+    async def register_websocket(self, websocket, room: Room) -> ClientConnection:
         """
         Called whenever a new websocket connection is sent from the front end.
-        Adds the new websocket to the set of PLAYER_CONNECTIONS.
+        Adds the new connection to the room's connections and the websocket to the set of PLAYER_CONNECTIONS.
         """
-        self.log.info("Client joined, registering websocket")
+        self.log.info(f"Client joined room {room.room_id}, registering websocket")
+        # Changes waiting for the next tick go to the players already here, the new player gets them in the snapshot
+        await self.updates.flush_pending(room)
+        codec = self.codecs.get(getattr(websocket, "subprotocol", None), self.json_codec)
+        connection = ClientConnection(websocket, queue_size=self.config.SEND_QUEUE_SIZE,
+                                      send_timeout=self.config.SEND_TIMEOUT, codec=codec).start()
+        if not room.connections:
+            self.backplane.subscribe(room.room_id, self.deliver_updates)
+        room.connections.add(connection)
+        room.touch()
         PLAYER_CONNECTIONS.add(websocket)
-        return self
+        return connection
 
-    async def unregister_websocket(self, websocket):
+    async def unregister_websocket(self, connection: ClientConnection, room: Room):
         """
         Called whenever a websocket connection is terminated on the front end.
         Minimal information is sent with the websocket termination, so we manufacture one here.
         """
-        self.log.info("Client disconnected, unregistering websocket")
-        PLAYER_CONNECTIONS.remove(websocket)
+        self.log.info(f"Client disconnected from room {room.room_id}, unregistering websocket")
+        room.connections.discard(connection)
+        if not room.connections:
+            self.backplane.unsubscribe(room.room_id, self.deliver_updates)
+        if isinstance(room, RemoteRoom):
+            room.player_names.pop(connection.websocket, None)
+            room.awaiting_snapshot.discard(connection)
+            if not room.connections and self.remote_rooms.get(room.room_id) is room:
+                del self.remote_rooms[room.room_id]
+                self.backplane.release(room.room_id)
+        room.touch()
+        PLAYER_CONNECTIONS.discard(connection.websocket)
+        await connection.close()
+        return self.create_player_left_message()
+
+    @staticmethod
+    def create_player_left_message():
         player_left_message = {
             "timestamp": datetime.utcnow().timestamp() * 1000,
             "type": "player_left",
@@ -56,47 +268,243 @@ class EventBroker:
         """
         The function that the server calls whenever a message from a websocket on the front end is received.
 
-        1) When a new websocket establishes a connection, register a new player
-        2) Send game state update to all players that the new player has joined
-        3) Listen for new messages from the websocket
-        4) When a new message is received
+        1) Look up (or create) the room named by the websocket path. If another node owns it, this node only
+           forwards the player's events to the owner, and passes its snapshots and updates on (see Backplane.claim).
+        2) When a new websocket establishes a connection, register it with the room. The connection talks JSON,
+           or the binary encoding if it asked for the "yahtzee.binary" subprotocol (see util/codec.py).
+        3) Send the full game state to the player who just joined
+        4) Listen for new messages from the websocket. Messages over MAX_MESSAGE_SIZE close the connection
+           before they are even read (see websockets' max_size).
+        5) When a new message is received
             * Create an event
-            * If it is a valid event, send it to the state manager
-            * Send out a game state update after the event is processed
-        5) When a websocket connection is closed, create and process a player left event
+            * Drop it if it is over a rate limit (see take_rate_limit), and tell the client it was dropped
+            * If the player asked for a resync, send them the full game state
+            * Otherwise, if it is a valid event, send it to the room's state manager
+            * Send out a game state update to the room after the event is processed, or for chat, on the next
+              tick of the UpdateScheduler
+            * If it is now a bot's turn, have the BotController play it
+        6) When a websocket connection is closed, create and process a player left event
         """
         self.log.info("Brokering messages")
+        room_id = RoomRegistry.parse_room_id(path)
+        if room_id is None:
+            self.log.warning(f"Rejecting connection with invalid room path: {path}")
+            await websocket.close(code=1008, reason="Invalid room id")
+            return
+        if await self.backplane.claim(room_id):
+            room = self.rooms.get_room(room_id)
+        else:
+            room = self.remote_rooms.setdefault(room_id, RemoteRoom(room_id))
+        if room.rate_limit is None:
+            room.rate_limit = TokenBucket(self.config.ROOM_RATE, self.config.ROOM_BURST)
+        rate_limit = TokenBucket(self.config.CONNECTION_RATE, self.config.CONNECTION_BURST)
+        gameplay_rate_limit = TokenBucket(self.config.GAMEPLAY_RATE, self.config.GAMEPLAY_BURST)
         # When a new websocket connection is established, register the websocket (create a new player)
-        await self.register_websocket(websocket)
+        connection = await self.register_websocket(websocket, room)
         try:
             # Send initial state to the player who just joined
-            await self.send_game_state_update()
+            await self.send_game_state_snapshot(connection, room)
             # Now, the server sits here waiting for new messages from the websocket
             async for message in websocket:
                 # Every time a message is received, do the following
-                self.log.info(f"Message received from client: {message}")
+                self.log.debug("Message received from client in room %s: %s", room.room_id, message, extra=SAMPLED)
+                room.touch()
                 # Create an event
-                event = Event(message, websocket)
-                if event.is_valid:
-                    self.log.info("This is a valid event")
-                    # Process the events in the state manager
-                    self.state_manager.process_event(event)
-                    await self.send_game_state_update()
+                event = Event(message, websocket, max_field_length=self.config.MAX_FIELD_LENGTH, codec=connection.codec)
+                EVENTS_RECEIVED.inc(event.type if event.is_valid else "invalid")
+                # One client flooding the room can't make everybody else wait, whatever it sends
+                exceeded_limit = self.take_rate_limit(event, room, rate_limit, gameplay_rate_limit)
+                if exceeded_limit is not None:
+                    MESSAGES_DROPPED.inc(exceeded_limit)
+                    self.log.warning("Client in room %s is over the %s rate limit, dropping message", room.room_id,
+                                     exceeded_limit, extra=SAMPLED)
+                    connection.try_enqueue(self.create_message_dropped_message(event, exceeded_limit))
+                elif event.is_valid and event.type == "resync_requested":
+                    self.log.info("Client asked for a resync")
+                    await self.send_game_state_snapshot(connection, room)
+                elif event.is_valid and isinstance(room, RemoteRoom):
+                    if event.type == "player_joined":
+                        room.player_names[websocket] = event.data["player_name"]
+                    self.backplane.forward_event(room_id, get_connection_id(websocket), json.dumps(event.event_dict))
+                elif event.is_valid:
+                    self.log.debug("This is a valid event")
+                    await self.process_client_event(room, event)
                 else:
-                    self.log.warning("This is NOT a valid event")
+                    self.log.warning("This is NOT a valid event", extra=SAMPLED)
+        except websockets.ConnectionClosed as e:
+            # Closed without a normal close code, by the client or by handle_room_moved
+            self.log.info(f"Connection closed: {e}")
         except Exception as e:
             # Broad catchall to keep the server alive in the case of an error.
             # Prints the error message and traceback to the logs without raising the Exception and killing the program
             self.log.error(e, exc_info=True)
         finally:
             # When we lose connection to a websocket, we need to pretend we received a real event from the front end
-            mock_message = await self.unregister_websocket(websocket)
-            event = Event(mock_message, websocket)
-            self.state_manager.process_event(event)
-            await self.send_game_state_update()
+            mock_message = await self.unregister_websocket(connection, room)
+            if isinstance(room, RemoteRoom):
+                self.backplane.forward_event(room_id, get_connection_id(websocket), mock_message)
+            else:
+                event = Event(mock_message, websocket)
+                room.process_event(event)
+                await self.updates.flush(room)
+
+    @staticmethod
+    def take_rate_limit(event: Event, room, rate_limit: TokenBucket, gameplay_rate_limit: TokenBucket):
+        """
+        Counts the event against the rate limits it falls under. Returns the name of the limit it went over, or
+        None if it can go ahead. Chat, and anything that isn't a valid event, is limited per connection and per room.
+        Gameplay (and resyncs) only has the connection's gameplay limit, which is larger, so that however much the
+        room chats a player can always take their turn.
+        """
+        if event.is_valid and event.type != "chat_message":
+            return None if gameplay_rate_limit.try_take() else "gameplay"
+        if not rate_limit.try_take():
+            return "connection"
+        if not room.rate_limit.try_take():
+            return "room"
+        return None
+
+    def create_message_dropped_message(self, event: Event, exceeded_limit: str) -> str:
+        """
+        Tells the client that a message it sent was dropped, so that it can slow down or send it again
+        """
+        return self.json_codec.encode({
+            "timestamp": datetime.utcnow().timestamp() * 1000,
+            "type": "message_dropped",
+            "data": {"event_type": event.type if event.is_valid else None, "limit": exceeded_limit}
+        })
+
+    async def process_client_event(self, room: Room, event: Event):
+        """
+        Processes a valid event from a player, connected here or to another node, in a room this node owns
+        """
+        if event.type == "bot_added" and len(room.state_manager.get_bot_players()) >= self.config.MAX_BOTS_PER_ROOM:
+            self.log.warning(f"Room {room.room_id} already has {self.config.MAX_BOTS_PER_ROOM} bots, not adding another")
+            return self
+        # Process the events in the room's state manager
+        room.process_event(event)
+        await self.updates.event_processed(room, event)
+        # If that made it a bot's turn, the bot plays it in the background
+        self.bots.schedule(room)
+        return self
+
+    async def evict_idle_rooms(self):
+        """
+        Runs for the lifetime of the server, periodically dropping rooms that nobody is using anymore
+        """
+        while True:
+            await asyncio.sleep(self.config.ROOM_EVICTION_INTERVAL)
+            for room_id in self.rooms.evict_idle_rooms():
+                self.backplane.release(room_id)
 
-    def start_server(self):
+    async def flush_event_log(self):
+        """
+        Runs for the lifetime of the server, writing the events logged since the last flush to disk in one batch
+        """
+        while True:
+            await asyncio.sleep(self.config.EVENT_LOG_FSYNC_INTERVAL)
+            await self.event_log.flush()
+
+    async def snapshot_rooms(self):
+        """
+        Runs for the lifetime of the server, periodically saving every room so that recovery only has to replay
+        the events logged since
+        """
+        while True:
+            await asyncio.sleep(self.config.SNAPSHOT_INTERVAL)
+            await self.event_log.write_snapshot(self.rooms)
+
+    async def expire_recovered_players(self):
+        """
+        Runs once after recovering from the event log. Recovered players keep their seat for
+        RECOVERED_PLAYER_TIMEOUT seconds so they can reconnect and carry on (see StateManager.add_connected_player),
+        and the ones that haven't by then leave, as if their websocket had closed.
+        """
+        await asyncio.sleep(self.config.RECOVERED_PLAYER_TIMEOUT)
+        for room in list(self.rooms.rooms.values()):
+            recovered_players = room.state_manager.get_recovered_players()
+            for player in recovered_players:
+                self.log.info(f"{player.name} didn't reconnect to room {room.room_id} after the restart, removing them")
+                room.process_event(Event(self.create_player_left_message(), player.websocket))
+            if recovered_players:
+                await self.updates.flush(room)
+
+    async def claim_recovered_rooms(self):
+        """
+        Runs once after recovering from the event log. A recovered room is dropped if another node took it over
+        while this one was down.
+        """
+        for room_id in list(self.rooms.rooms):
+            if not await self.backplane.claim(room_id):
+                self.log.warning(f"Room {room_id} is owned by another node now, dropping its recovered state")
+                del self.rooms.rooms[room_id]
+        return self
+
+    async def monitor_event_loop_lag(self):
+        """
+        Runs for the lifetime of the server. Anything that blocks the event loop delays every player, and shows up
+        here as a timer firing late.
+        """
+        while True:
+            expected = time.perf_counter() + self.config.EVENT_LOOP_LAG_INTERVAL
+            await asyncio.sleep(self.config.EVENT_LOOP_LAG_INTERVAL)
+            EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - expected))
+
+    async def accept_handed_off_connections(self, channel: socket.socket):
+        """
+        In a worker process (see Supervisor), the supervisor accepts the connections and sends their sockets over
+        channel. Each one is then served exactly like a connection accepted by websockets.serve.
+
+        The worker's websockets server listens on an ephemeral loopback port that nobody is told about. It is only
+        there so that connections handed over can be registered with a real WebSocketServer.
+        """
+        loop = asyncio.get_event_loop()
+        ws_server = await websockets.serve(self.broker, "127.0.0.1", 0, max_size=self.config.MAX_MESSAGE_SIZE,
+                                           subprotocols=list(self.codecs))
+        create_protocol = partial(websockets.WebSocketServerProtocol, self.broker, ws_server,
+                                  max_size=self.config.MAX_MESSAGE_SIZE, subprotocols=list(self.codecs))
+
+        def receive_connection():
+            try:
+                file_descriptors = recvfds(channel, 1)
+            except (EOFError, OSError):
+                # The supervisor is gone, and nobody else can send this worker connections
+                self.log.warning("Lost the connection to the supervisor, stopping")
+                loop.remove_reader(channel.fileno())
+                loop.stop()
+                return
+            for file_descriptor in file_descriptors:
+                connection = socket.socket(fileno=file_descriptor)
+                connection.setblocking(False)
+                loop.create_task(loop.connect_accepted_socket(create_protocol, connection))
+
+        loop.add_reader(channel.fileno(), receive_connection)
+        return ws_server
+
+    def start_server(self, channel: socket.socket = None):
+        """
+        Serves until the process is stopped. Connections are accepted on the configured host and port, or if a
+        channel is given, received from the supervisor on it (see accept_handed_off_connections).
+        """
         self.log.info("Starting the server")
-        start_server = websockets.serve(self.broker, self.config.HOST, self.config.PORT)
+        if self.config.METRICS_PORT is not None:
+            metrics_server = MetricsServer(METRICS, self.config.METRICS_HOST, self.config.METRICS_PORT)
+            asyncio.get_event_loop().run_until_complete(metrics_server.start())
+            asyncio.get_event_loop().create_task(self.monitor_event_loop_lag())
+        if self.config.BACKPLANE_HUB:
+            asyncio.get_event_loop().run_until_complete(BackplaneHub(self.config.BACKPLANE_HOST, self.config.BACKPLANE_PORT).start())
+        asyncio.get_event_loop().run_until_complete(self.backplane.start(self))
+        if self.event_log is not None:
+            self.event_log.recover(self.rooms)
+            asyncio.get_event_loop().run_until_complete(self.claim_recovered_rooms())
+            asyncio.get_event_loop().create_task(self.expire_recovered_players())
+            asyncio.get_event_loop().create_task(self.flush_event_log())
+            asyncio.get_event_loop().create_task(self.snapshot_rooms())
+        if channel is None:
+            start_server = websockets.serve(self.broker, self.config.HOST, self.config.PORT,
+                                            max_size=self.config.MAX_MESSAGE_SIZE, subprotocols=list(self.codecs))
+        else:
+            start_server = self.accept_handed_off_connections(channel)
         asyncio.get_event_loop().run_until_complete(start_server)
+        asyncio.get_event_loop().create_task(self.evict_idle_rooms())
         asyncio.get_event_loop().run_forever()
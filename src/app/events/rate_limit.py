@@ -0,0 +1,29 @@
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        """
+        Allows rate messages a second on average, and bursts of up to burst messages. A rate of 0 (or None)
+        allows everything.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.available = burst
+        self.last_refill = time.monotonic()
+
+    def _refill(self, now: float):
+        self.available = min(self.burst, self.available + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def try_take(self, now: float = None) -> bool:
+        """
+        Takes a token if there is one. Returns False if the message should be dropped.
+        """
+        if not self.rate:
+            return True
+        self._refill(time.monotonic() if now is None else now)
+        if self.available < 1:
+            return False
+        self.available -= 1
+        return True
@@ -0,0 +1,126 @@
+import logging
+import re
+import time
+from state.state_manager import StateManager
+from state.transcripts.transcript import DEFAULT_MAX_MESSAGES
+from util.codec import STDLIB_JSON
+
+
+DEFAULT_ROOM_ID = "lobby"
+ROOM_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class Room:
+    def __init__(self, room_id: str, event_log=None, transcript_max_messages: int = DEFAULT_MAX_MESSAGES,
+                 codec=STDLIB_JSON):
+        """
+        A single game table. Each room has its own StateManager (and therefore its own GameEngine)
+        and its own set of connected websockets, so updates are only broadcast within the room.
+        """
+        self.room_id = room_id
+        self.event_log = event_log
+        self.state_manager = StateManager(transcript_max_messages, codec)
+        self.connections = set()
+        # Players connected to other nodes (see SocketBackplane), as RemoteConnections
+        self.remote_connections = set()
+        self.last_active = time.monotonic()
+        # Set up by the BotController once a bot plays in the room
+        self.bot_task = None
+        self.bot_budget = None
+        # Set up by the EventBroker when the first message arrives
+        self.rate_limit = None
+
+    def process_event(self, event):
+        """
+        Processes an event in the room's StateManager, and records it in the event log if there is one
+        """
+        self.state_manager.process_event(event)
+        if self.event_log is not None:
+            self.event_log.append(self.room_id, event, self.state_manager)
+        return self
+
+    def get_player_name(self, websocket):
+        return self.state_manager.get_player_name(websocket)
+
+    def touch(self):
+        self.last_active = time.monotonic()
+        return self
+
+    def is_idle(self, now: float, idle_timeout: float) -> bool:
+        """
+        A room is idle once nobody is connected to it and nothing has happened in it for idle_timeout seconds
+        """
+        return not self.connections and not self.remote_connections and now - self.last_active >= idle_timeout
+
+
+class RemoteRoom:
+    def __init__(self, room_id: str):
+        """
+        A room owned by another node (see Backplane.claim), with the connections of this node's players in it.
+        Nothing about the game is kept here: their events are forwarded to the owner, which sends back their
+        snapshots and publishes the updates that are delivered to them.
+        """
+        self.room_id = room_id
+        self.connections = set()
+        self.player_names = {}  # websocket -> the name its player joined with, to find their private updates
+        self.awaiting_snapshot = set()  # connections that get no updates until their snapshot arrives
+        self.last_active = time.monotonic()
+        # Set up by the EventBroker when the first message arrives
+        self.rate_limit = None
+
+    def get_player_name(self, websocket):
+        return self.player_names.get(websocket)
+
+    def touch(self):
+        self.last_active = time.monotonic()
+        return self
+
+
+class RoomRegistry:
+    def __init__(self, idle_timeout: float, event_log=None, transcript_max_messages: int = DEFAULT_MAX_MESSAGES,
+                 codec=STDLIB_JSON):
+        self.log = logging.getLogger(__name__)
+        self.idle_timeout = idle_timeout
+        self.event_log = event_log
+        self.transcript_max_messages = transcript_max_messages
+        self.codec = codec
+        self.rooms = {}
+
+    @staticmethod
+    def parse_room_id(path: str):
+        """
+        The room id is the websocket path, e.g. ws://host:8081/my-table joins the room "my-table".
+        Connecting without a path joins the default room. Returns None if the path is not a valid room id.
+        """
+        room_id = (path or "").split("?", 1)[0].strip("/")
+        if not room_id:
+            return DEFAULT_ROOM_ID
+        if ROOM_ID_PATTERN.match(room_id):
+            return room_id
+        return None
+
+    def get_room(self, room_id: str) -> Room:
+        room = self.rooms.get(room_id)
+        if room is None:
+            self.log.info(f"Creating room: {room_id}")
+            room = Room(room_id, event_log=self.event_log, transcript_max_messages=self.transcript_max_messages,
+                        codec=self.codec)
+            self.rooms[room_id] = room
+        return room
+
+    def evict_idle_rooms(self, now: float = None):
+        """
+        Drops every room that has had no connections and no activity for the idle timeout.
+        Returns the ids of the evicted rooms.
+        """
+        now = time.monotonic() if now is None else now
+        evicted = [room_id for room_id, room in self.rooms.items() if room.is_idle(now, self.idle_timeout)]
+        for room_id in evicted:
+            self.log.info(f"Evicting idle room: {room_id}")
+            del self.rooms[room_id]
+            if self.event_log is not None:
+                self.event_log.append_eviction(room_id)
+        return evicted
+
+    def __len__(self):
+        return len(self.rooms)
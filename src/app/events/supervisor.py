@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import multiprocessing
+import selectors
+import socket
+import time
+from multiprocessing.reduction import sendfds
+from events.room import RoomRegistry
+from util.config import Config
+
+MAX_REQUEST_LINE = 8192         # Bytes of the HTTP request line read to find the room, like most HTTP servers
+REQUEST_LINE_TIMEOUT = 5.0      # Seconds a new connection has to send its request line before it is dropped
+INCOMPLETE_POLL_INTERVAL = 0.01 # Seconds between checks of connections that have only sent part of their request line
+
+
+def get_worker_index(room_id: str, worker_count: int) -> int:
+    """
+    The worker that runs a room, by rendezvous hashing: every worker gets a score for the room and the highest
+    score wins. The same room always goes to the same worker, across restarts, and changing the number of workers
+    only moves the rooms of the workers that were added or removed.
+    """
+    def score(worker_index):
+        return hashlib.blake2b(f"{worker_index}:{room_id}".encode(), digest_size=8).digest()
+    return max(range(worker_count), key=score)
+
+
+def parse_request_path(data: bytes):
+    """
+    The path of an HTTP request (e.g. b"GET /my-table HTTP/1.1\\r\\n..." -> "/my-table"), or None if data doesn't
+    hold a complete request line yet
+    """
+    request_line, separator, _ = data.partition(b"\r\n")
+    if not separator:
+        return None
+    parts = request_line.decode("latin-1").split()
+    return parts[1] if len(parts) >= 2 else ""
+
+
+class Worker:
+    def __init__(self, worker_index: int, process, channel: socket.socket):
+        """
+        A worker process and the Unix socket that the supervisor hands it connections on
+        """
+        self.worker_index = worker_index
+        self.process = process
+        self.channel = channel
+
+
+class Supervisor:
+    def __init__(self, config: Config, run_worker):
+        """
+        Runs the server as several processes, so that it can use every core of the machine.
+
+        The supervisor accepts every connection itself and reads (without consuming) the HTTP request line to find
+        the room, then hands the socket to the worker that runs that room (see get_worker_index). The worker takes
+        it from there exactly as if it had accepted it, and nothing but the socket is ever passed between processes,
+        so every room lives in a single worker with no shared state.
+
+        run_worker(config, channel) is called in each forked worker process and should serve the connections
+        received on channel until it is closed. Workers that die are restarted with the same index, so they get
+        the same rooms (and recover them from their own event log).
+        """
+        self.log = logging.getLogger(__name__)
+        self.config = config
+        self.run_worker = run_worker
+        self.workers = []
+        self.listener = None
+        self.selector = selectors.DefaultSelector()
+        self.pending = {}       # Accepted connection -> when it will be dropped if it hasn't sent its request line
+        self.incomplete = set() # Pending connections that have sent part of their request line
+
+    def start_worker(self, worker_index: int) -> Worker:
+        supervisor_channel, worker_channel = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        process = multiprocessing.get_context("fork").Process(
+            target=self._run_worker_process, args=(self.config.for_worker(worker_index), worker_channel, supervisor_channel),
+            name=f"worker-{worker_index}", daemon=True
+        )
+        process.start()
+        worker_channel.close()
+        self.log.info(f"Started worker {worker_index} (pid {process.pid})")
+        return Worker(worker_index, process, supervisor_channel)
+
+    def _run_worker_process(self, worker_config: Config, worker_channel: socket.socket, supervisor_channel: socket.socket):
+        """
+        The forked worker inherits every socket the supervisor had open. Holding on to a client's socket would keep
+        the connection open after the worker that owns it closes it, so they are all closed before anything else.
+        """
+        inherited_sockets = [supervisor_channel, *self.pending, *(worker.channel for worker in self.workers)]
+        if self.listener is not None:
+            inherited_sockets.append(self.listener)
+        for inherited_socket in inherited_sockets:
+            inherited_socket.close()
+        self.selector.close()
+        self.run_worker(worker_config, worker_channel)
+
+    def restart_dead_workers(self):
+        for worker in self.workers:
+            if not worker.process.is_alive():
+                self.log.warning(f"Worker {worker.worker_index} exited with code {worker.process.exitcode}, restarting it")
+                worker.channel.close()
+                self.workers[worker.worker_index] = self.start_worker(worker.worker_index)
+        return self
+
+    def accept(self, listener: socket.socket):
+        try:
+            connection, _ = listener.accept()
+        except BlockingIOError:
+            return
+        connection.setblocking(False)
+        self.pending[connection] = time.monotonic() + REQUEST_LINE_TIMEOUT
+        self.selector.register(connection, selectors.EVENT_READ, self.route)
+
+    def route(self, connection: socket.socket):
+        """
+        Hands a connection to the worker for its room once its request line has arrived
+        """
+        try:
+            data = connection.recv(MAX_REQUEST_LINE, socket.MSG_PEEK)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        path = parse_request_path(data)
+        if path is None:
+            if not data or len(data) >= MAX_REQUEST_LINE:
+                self.drop(connection)
+            elif connection not in self.incomplete:
+                # Peeking leaves the data in the socket, so it would stay readable and be selected again straight
+                # away. Check it on a timer instead until the rest arrives.
+                self.selector.unregister(connection)
+                self.incomplete.add(connection)
+            return
+
+        # An invalid room id is still sent to a worker, which turns it away with a proper websocket close
+        worker_index = get_worker_index(RoomRegistry.parse_room_id(path) or path, len(self.workers))
+        self.hand_off(connection, worker_index)
+
+    def hand_off(self, connection: socket.socket, worker_index: int):
+        self.forget(connection)
+        worker = self.workers[worker_index]
+        try:
+            sendfds(worker.channel, [connection.fileno()])
+        except OSError as e:
+            self.log.error(f"Couldn't hand a connection to worker {worker_index}: {e}")
+        # The worker has its own copy of the socket now
+        connection.close()
+
+    def drop(self, connection: socket.socket):
+        self.forget(connection)
+        connection.close()
+
+    def forget(self, connection: socket.socket):
+        self.pending.pop(connection, None)
+        if connection in self.incomplete:
+            self.incomplete.discard(connection)
+        else:
+            self.selector.unregister(connection)
+
+    def serve_forever(self):
+        self.log.info(f"Starting {self.config.WORKERS} workers")
+        for worker_index in range(self.config.WORKERS):
+            # One at a time, so that each worker knows to close the channels of the ones before it
+            self.workers.append(self.start_worker(worker_index))
+        self.listener = socket.create_server((self.config.HOST, self.config.PORT), backlog=1024)
+        self.listener.setblocking(False)
+        self.selector.register(self.listener, selectors.EVENT_READ, self.accept)
+        self.log.info(f"Accepting connections on {self.config.HOST}:{self.config.PORT}")
+        try:
+            while True:
+                timeout = INCOMPLETE_POLL_INTERVAL if self.incomplete else 1.0
+                for key, _ in self.selector.select(timeout):
+                    key.data(key.fileobj)
+                for connection in list(self.incomplete):
+                    self.route(connection)
+                now = time.monotonic()
+                for connection in [connection for connection, deadline in self.pending.items() if deadline < now]:
+                    self.drop(connection)
+                self.restart_dead_workers()
+        finally:
+            self.listener.close()
+            for worker in self.workers:
+                worker.channel.close()
+                worker.process.join(timeout=5)
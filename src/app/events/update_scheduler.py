@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from typing import Iterable
+
+from util.metrics import METRICS
+
+
+UPDATES_COALESCED = METRICS.counter("yahtzee_updates_coalesced_total",
+                                    "Events whose game state update went out together with a later event's")
+
+
+class UpdateScheduler:
+    def __init__(self, send_game_state_update, interval: float, batched_event_types: Iterable[str]):
+        """
+        Decides when each room's game state update goes out. Gameplay events are sent straight away, but events
+        of batched_event_types (chat) only mark the room as dirty, and one update goes out interval seconds later
+        with every change made since. A burst of 50 chat messages then costs one delta instead of 50, however
+        fast the clients send. send_game_state_update(room) is awaited to send an update. An interval of 0 sends
+        every update straight away.
+        """
+        self.log = logging.getLogger(__name__)
+        self.send_game_state_update = send_game_state_update
+        self.interval = interval
+        self.batched_event_types = set(batched_event_types)
+        self.pending = {}   # room id -> TimerHandle of the room's next update
+
+    async def event_processed(self, room, event):
+        """
+        Called after the room has processed event, to send the update that carries it or schedule it
+        """
+        if self.interval > 0 and event.type in self.batched_event_types:
+            self.schedule(room)
+        else:
+            await self.flush(room)
+        return self
+
+    def schedule(self, room):
+        """
+        Marks the room as dirty, so that an update goes out at most interval seconds from now
+        """
+        if room.room_id in self.pending:
+            UPDATES_COALESCED.inc()
+            return self
+        loop = asyncio.get_event_loop()
+        self.pending[room.room_id] = loop.call_later(self.interval, lambda: loop.create_task(self._flush_scheduled(room)))
+        return self
+
+    def is_pending(self, room) -> bool:
+        return room.room_id in self.pending
+
+    async def flush(self, room):
+        """
+        Sends the room's update now, including anything that was waiting for the next tick
+        """
+        handle = self.pending.pop(room.room_id, None)
+        if handle is not None:
+            handle.cancel()
+        await self.send_game_state_update(room)
+        return self
+
+    async def flush_pending(self, room):
+        """
+        Sends the room's update now if one is waiting. A snapshot has to be taken after this, otherwise the
+        player would get the changes that are waiting twice: in the snapshot, and again in the next delta.
+        """
+        if room.room_id in self.pending:
+            await self.flush(room)
+        return self
+
+    async def _flush_scheduled(self, room):
+        try:
+            if self.pending.pop(room.room_id, None) is not None:
+                await self.send_game_state_update(room)
+        except Exception as e:
+            self.log.error(e, exc_info=True)
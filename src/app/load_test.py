@@ -0,0 +1,390 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import random
+import re
+import resource
+import sys
+import time
+from datetime import datetime
+from functools import partial
+
+import websockets
+
+from engine.entities import ScoreType
+from events.event_broker import EventBroker
+from main import logger_setup
+from util.config import Config
+
+CHAT_TOKEN_PATTERN = re.compile(r"#(\d+)#")     # Chat messages carry a token, so their latency can be measured
+
+
+def percentile(sorted_values, fraction: float):
+    """
+    The value at fraction (0 to 1) of the way through sorted_values, by the nearest-rank method
+    """
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))]
+
+
+class LatencyRecorder:
+    def __init__(self):
+        """
+        Event-to-broadcast latencies in seconds, by event type: from a client sending an event to each player in
+        the room receiving the update it caused. They include the load generator's own delays in handling messages,
+        so a load generator that is itself short of CPU makes the server look slower than it is.
+        """
+        self.samples = {}
+
+    def record(self, event_type: str, seconds: float):
+        self.samples.setdefault(event_type, []).append(seconds)
+        return self
+
+    def summarize(self):
+        summary = {}
+        for event_type, samples in sorted(self.samples.items()) + [("all", sum(self.samples.values(), []))]:
+            samples = sorted(samples)
+            summary[event_type] = {
+                "count": len(samples),
+                "p50_ms": _to_ms(percentile(samples, 0.5)),
+                "p99_ms": _to_ms(percentile(samples, 0.99)),
+                "max_ms": _to_ms(samples[-1] if samples else None)
+            }
+        return summary
+
+
+def _to_ms(seconds):
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+
+def read_rss_mb(pid: int):
+    """
+    The current and peak resident set size of a process in MB, from /proc (so Linux only). (None, None) elsewhere.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            fields = dict(line.split(":", 1) for line in status if ":" in line)
+        return round(int(fields["VmRSS"].split()[0]) / 1024, 1), round(int(fields["VmHWM"].split()[0]) / 1024, 1)
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+class RoomLoad:
+    def __init__(self, room_id: str, player_names):
+        """
+        What the simulated clients of one room share, to measure latencies: the last game action sent in the
+        room (only one player acts at a time, so the next current_turn update is its result) and the chat
+        messages sent, by token
+        """
+        self.room_id = room_id
+        self.player_names = player_names
+        self.action_number = 0
+        self.action_type = None
+        self.action_sent_at = None
+        self.chat_sent_at = {}
+        self.games_finished = 0
+
+
+class SimulatedClient:
+    def __init__(self, load_test, room: RoomLoad, player_name: str, rng: random.Random):
+        """
+        One player: joins their room, plays their turns (after a think time) and chats in bursts.
+        The first player of a room starts the game once everybody has joined, and starts another when it ends.
+        """
+        self.load_test = load_test
+        self.room = room
+        self.player_name = player_name
+        self.rng = rng
+        self.is_host = player_name == room.player_names[0]
+        self.websocket = None
+        self.open_score_types = []
+        self.seen_action_number = 0
+        self.game_running = False
+        self.start_requested = False
+        self.turn_task = None
+
+    async def run(self):
+        self.websocket = await websockets.connect(f"{self.load_test.url}/{self.room.room_id}", max_size=None)
+        self.load_test.connected_count += 1
+        await self.send("player_joined")
+        chat_task = asyncio.ensure_future(self.chat())
+        try:
+            async for message in self.websocket:
+                self.receive(message)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            chat_task.cancel()
+            if self.turn_task is not None:
+                self.turn_task.cancel()
+
+    async def send(self, event_type: str, **data):
+        message = json.dumps({"timestamp": time.time() * 1000, "type": event_type,
+                              "data": {"player_name": self.player_name, **data}})
+        self.load_test.events_sent[event_type] = self.load_test.events_sent.get(event_type, 0) + 1
+        await self.websocket.send(message)
+
+    async def send_action(self, event_type: str, **data):
+        self.room.action_number += 1
+        self.room.action_type = event_type
+        self.room.action_sent_at = time.perf_counter()
+        await self.send(event_type, **data)
+
+    def receive(self, message: str):
+        now = time.perf_counter()
+        self.load_test.messages_received += 1
+        self.load_test.bytes_received += len(message)
+        update = json.loads(message)
+        data = update.get("data", {})
+
+        if update.get("type") == "message_dropped":
+            # Over one of the server's rate limits, see EventBroker.take_rate_limit
+            event_type = data.get("event_type") or "invalid"
+            self.load_test.events_dropped[event_type] = self.load_test.events_dropped.get(event_type, 0) + 1
+            return
+
+        if update.get("type") == "game_state_delta":
+            for line in data.get("chat_transcript", []):
+                for token in CHAT_TOKEN_PATTERN.findall(line):
+                    sent_at = self.room.chat_sent_at.get(token)
+                    if sent_at is not None:
+                        self.load_test.latencies.record("chat_message", now - sent_at)
+
+        if "current_turn" in data and self.room.action_number > self.seen_action_number:
+            self.seen_action_number = self.room.action_number
+            self.load_test.latencies.record(self.room.action_type, now - self.room.action_sent_at)
+
+        if "game_started" in data:
+            self.game_running = bool(data["game_started"])
+            self.open_score_types = [score_type.value for score_type in ScoreType]
+        if self.game_running and (data.get("game_winner") or {}).get("player_name") is not None:
+            self.game_running = False
+            if self.is_host:
+                self.room.games_finished += 1
+                self.load_test.games_finished += 1
+                self.schedule(partial(self.send_action, "game_started"))
+        if self.is_host and not self.start_requested and len(data.get("players", [])) == len(self.room.player_names):
+            self.start_requested = True
+            self.schedule(partial(self.send_action, "game_started"))
+
+        turn = data.get("current_turn")
+        if self.game_running and turn and turn.get("player") == self.player_name and turn.get("selected_score_type") is None:
+            self.schedule(partial(self.play, turn["roll_count"]))
+
+    def schedule(self, action):
+        """
+        Runs action() (a game action) after a think time, without holding up the messages that keep coming in
+        """
+        async def think_then_act():
+            await asyncio.sleep(self.rng.expovariate(1 / self.load_test.think_time) if self.load_test.think_time else 0)
+            await action()
+        if self.turn_task is not None and not self.turn_task.done():
+            self.turn_task.cancel()
+        self.turn_task = asyncio.ensure_future(think_then_act())
+
+    async def play(self, roll_count: int):
+        if roll_count == 0:
+            await self.send_action("rolled_dice", dice_to_roll=[1, 2, 3, 4, 5])
+        elif roll_count < 3 and self.rng.random() < 0.7:
+            await self.send_action("rolled_dice", dice_to_roll=self.rng.sample([1, 2, 3, 4, 5], self.rng.randint(1, 5)))
+        elif self.open_score_types:
+            score_type = self.open_score_types.pop(self.rng.randrange(len(self.open_score_types)))
+            await self.send_action("score_selected", selected_score_type=score_type.lower())
+
+    async def chat(self):
+        """
+        Quiet for a while, then a burst of messages in quick succession, like people reacting to a roll
+        """
+        while True:
+            await asyncio.sleep(self.rng.expovariate(1 / self.load_test.chat_interval))
+            for _ in range(self.rng.randint(1, self.load_test.chat_burst)):
+                token = str(self.load_test.next_chat_token())
+                self.room.chat_sent_at[token] = time.perf_counter()
+                await self.send("chat_message", content=f"#{token}# nice roll!", destination="all")
+                await asyncio.sleep(self.rng.uniform(0.02, 0.2))
+
+
+class LoadTest:
+    def __init__(self, url: str, rooms: int, players_per_room: int, duration: float, ramp: float = 5.0,
+                 think_time: float = 0.3, chat_interval: float = 10.0, chat_burst: int = 5, seed: int = None,
+                 server_pid: int = None):
+        """
+        Plays rooms * players_per_room simulated clients against a running server for duration seconds (after
+        connecting them over ramp seconds), then reports what happened as a dict, see report
+        """
+        self.log = logging.getLogger(__name__)
+        self.url = url.rstrip("/")
+        self.rooms = [RoomLoad(f"load-{room_index}", [f"player-{player_index}" for player_index in range(players_per_room)])
+                      for room_index in range(rooms)]
+        self.duration = duration
+        self.ramp = ramp
+        self.think_time = think_time
+        self.chat_interval = chat_interval
+        self.chat_burst = chat_burst
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.server_pid = server_pid
+        self.reset_counters()
+        self.connected_count = 0
+        self.failed_count = 0
+        self.peak_rss_mb = None
+        self._chat_token = 0
+
+    def reset_counters(self):
+        self.latencies = LatencyRecorder()
+        self.events_sent = {}
+        self.events_dropped = {}
+        self.messages_received = 0
+        self.bytes_received = 0
+        self.games_finished = 0
+        return self
+
+    def next_chat_token(self) -> int:
+        self._chat_token += 1
+        return self._chat_token
+
+    async def run(self):
+        clients = [SimulatedClient(self, room, player_name, random.Random(self.rng.random()))
+                   for room in self.rooms for player_name in room.player_names]
+        start = time.perf_counter()
+        tasks = []
+        for client_index, client in enumerate(clients):
+            # Players connect in room order, so each room's host is the first to join it
+            await asyncio.sleep(max(0.0, start + self.ramp * client_index / len(clients) - time.perf_counter()))
+            tasks.append(asyncio.ensure_future(self._run_client(client)))
+        rss_task = asyncio.ensure_future(self._sample_rss())
+        # Only what happens once everybody is connected counts
+        self.reset_counters()
+        measured_from = time.perf_counter()
+        await asyncio.sleep(self.duration)
+        elapsed = time.perf_counter() - measured_from
+
+        rss_task.cancel()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, rss_task, return_exceptions=True)
+        return self.report(elapsed)
+
+    async def _run_client(self, client: SimulatedClient):
+        try:
+            await client.run()
+        except (OSError, websockets.InvalidHandshake, asyncio.TimeoutError) as e:
+            self.failed_count += 1
+            self.log.warning(f"Client {client.player_name} of {client.room.room_id} failed: {e!r}")
+        finally:
+            if client.websocket is not None:
+                await client.websocket.close()
+
+    async def _sample_rss(self):
+        while self.server_pid is not None:
+            rss_mb, self.peak_rss_mb = read_rss_mb(self.server_pid)
+            await asyncio.sleep(1)
+
+    def report(self, elapsed: float):
+        """
+        Everything measured since every client connected, as a JSON-serializable dict
+        """
+        rss_mb, peak_rss_mb = read_rss_mb(self.server_pid) if self.server_pid is not None else (None, None)
+        events_sent = sum(self.events_sent.values())
+        events_dropped = sum(self.events_dropped.values())
+        return {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "parameters": {
+                "url": self.url, "rooms": len(self.rooms), "players_per_room": len(self.rooms[0].player_names),
+                "duration": self.duration, "ramp": self.ramp, "think_time": self.think_time,
+                "chat_interval": self.chat_interval, "chat_burst": self.chat_burst, "seed": self.seed
+            },
+            "clients": {"connected": self.connected_count, "failed": self.failed_count},
+            "throughput": {
+                "elapsed_seconds": round(elapsed, 3),
+                "events_sent": events_sent,
+                "events_sent_by_type": dict(sorted(self.events_sent.items())),
+                "events_per_second": round(events_sent / elapsed, 1),
+                # Sent, but dropped by the server's rate limits
+                "events_dropped": events_dropped,
+                "events_dropped_by_type": dict(sorted(self.events_dropped.items())),
+                "events_handled_per_second": round((events_sent - events_dropped) / elapsed, 1),
+                "messages_received": self.messages_received,
+                "messages_per_second": round(self.messages_received / elapsed, 1),
+                "bytes_received_per_second": round(self.bytes_received / elapsed, 1),
+                "games_finished": self.games_finished
+            },
+            "latency": self.latencies.summarize(),
+            "server": {"pid": self.server_pid, "rss_mb": rss_mb, "peak_rss_mb": peak_rss_mb or self.peak_rss_mb}
+        }
+
+
+def serve(config: Config):
+    logger_setup(logging.WARNING)
+    EventBroker(config).start_server()
+
+
+def raise_open_file_limit():
+    """
+    Every client is a socket, so thousands of them need more than the usual limit of 1024 open files
+    """
+    soft_limit, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft_limit < hard_limit:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard_limit, hard_limit))
+
+
+def start_load_test():
+    """
+    Plays simulated games against the server and prints a JSON report of throughput, latency and memory, e.g.:
+        python3 src/app/load_test.py --rooms 500 --players-per-room 4 --duration 60 --output load_tests.jsonl
+    Without --url, a server is started just for the test (no event log, metrics server or rate limits) on --port.
+    Events a server drops for going over its rate limits are reported as events_dropped.
+    """
+    parser = argparse.ArgumentParser(description="Load test the server with simulated players")
+    parser.add_argument("--url", default=None, help="websocket URL of a running server, e.g. ws://127.0.0.1:8081")
+    parser.add_argument("--server-pid", type=int, default=None, help="process id of the server at --url, to report its memory")
+    parser.add_argument("--port", type=int, default=8765, help="port of the server started for the test, without --url")
+    parser.add_argument("--rooms", type=int, default=250, help="number of rooms")
+    parser.add_argument("--players-per-room", type=int, default=4, help="number of players in each room")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to measure for, once every client has connected")
+    parser.add_argument("--ramp", type=float, default=5, help="seconds over which to connect the clients")
+    parser.add_argument("--think-time", type=float, default=0.3, help="mean seconds a player takes before each move")
+    parser.add_argument("--chat-interval", type=float, default=10, help="mean seconds between a player's bursts of chat")
+    parser.add_argument("--chat-burst", type=int, default=5, help="most chat messages in one burst")
+    parser.add_argument("--seed", type=int, default=None, help="random seed, for reproducible runs")
+    parser.add_argument("--output", default=None, help="file to append the report to, as one line of JSON")
+    args = parser.parse_args()
+
+    # The report goes to stdout, so logs go to stderr (the default) and only warnings are worth showing
+    logger_setup(logging.WARNING)
+    raise_open_file_limit()
+
+    server, url, server_pid = None, args.url, args.server_pid
+    if url is None:
+        config = Config()
+        config.HOST, config.PORT = "127.0.0.1", args.port
+        config.EVENT_LOG_DIRECTORY, config.METRICS_PORT, config.WORKERS = None, None, 1
+        # The simulated players would go over the limits, and the test would measure how fast they are dropped
+        config.CONNECTION_RATE, config.ROOM_RATE, config.GAMEPLAY_RATE = 0, 0, 0
+        server = multiprocessing.get_context("fork").Process(target=serve, args=(config,), name="server", daemon=True)
+        server.start()
+        url, server_pid = f"ws://127.0.0.1:{args.port}", server.pid
+        time.sleep(1)
+
+    try:
+        load_test = LoadTest(url, args.rooms, args.players_per_room, args.duration, ramp=args.ramp,
+                             think_time=args.think_time, chat_interval=args.chat_interval, chat_burst=args.chat_burst,
+                             seed=args.seed, server_pid=server_pid)
+        report = asyncio.get_event_loop().run_until_complete(load_test.run())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    if args.output:
+        with open(args.output, "a") as output:
+            output.write(json.dumps(report) + "\n")
+
+
+if __name__ == "__main__":
+    start_load_test()
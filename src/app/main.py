@@ -1,15 +1,38 @@
-import logging
 from events.event_broker import EventBroker
+from events.supervisor import Supervisor
 from util.config import Config
+from util.log import configure_logging
 
 
 def start_backend():
     config = Config()
-    logger_setup(config.LOG_LEVEL)
-    broker = EventBroker()
-    broker.start_server()
+    listener = logger_setup(config.LOG_LEVEL, config.LOG_FORMAT, config.LOG_QUEUE, config.LOG_SAMPLE_EVERY)
+    try:
+        if config.WORKERS > 1:
+            # Several processes, each running the rooms the supervisor sends its way
+            Supervisor(config, start_worker).serve_forever()
+        else:
+            broker = EventBroker()
+            broker.start_server()
+    finally:
+        if listener is not None:
+            # Writes out whatever is still queued
+            listener.stop()
 
-def logger_setup(log_level):
+def start_worker(config, channel):
+    """
+    The entry point of a worker process forked by the Supervisor. The logging threads don't survive the fork,
+    so logging is set up again first.
+    """
+    listener = logger_setup(config.LOG_LEVEL, config.LOG_FORMAT, config.LOG_QUEUE, config.LOG_SAMPLE_EVERY)
+    try:
+        broker = EventBroker(config)
+        broker.start_server(channel)
+    finally:
+        if listener is not None:
+            listener.stop()
+
+def logger_setup(log_level, log_format="text", use_queue=False, sample_every=1):
     """
     This class sets the formatting and the logging level of the logger for any file in the application
     To use the logger in any file, import logging and then instantiate the logger like so:
@@ -17,10 +40,14 @@ def logger_setup(log_level):
 
     Then to write a log to the stdout, use the logger like so:
         log.info("My log message")
+
+    Pass values as arguments rather than formatting them into the message, they are then only formatted if the
+    line is written. Lines that are logged for every message or update should also pass extra=SAMPLED:
+        log.debug("Message received: %s", message, extra=SAMPLED)
+
+    See util.log.configure_logging for log_format, use_queue and sample_every.
     """
-    logging.basicConfig(level=log_level,
-                        format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-                        datefmt="%Y-%m-%d %H:%M:%S")
+    return configure_logging(log_level, log_format, use_queue, sample_every)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,54 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from engine.simulator import BatchSimulator, SCORE_TYPES, cross_check_with_game_engine
+from main import logger_setup
+
+
+def start_simulation():
+    """
+    Simulates a batch of games offline and prints a summary, e.g.:
+        python3 src/app/simulate.py --games 1000000 --seed 42 --cross-check 100
+    """
+    parser = argparse.ArgumentParser(description="Simulate Yahtzee games in bulk to benchmark the engine and check scoring rules")
+    parser.add_argument("--games", type=int, default=100000, help="number of games to simulate")
+    parser.add_argument("--batch-size", type=int, default=100000, help="number of games to simulate at once")
+    parser.add_argument("--seed", type=int, default=None, help="random seed, for reproducible runs")
+    parser.add_argument("--cross-check", type=int, default=10,
+                        help="number of games per batch to replay through GameEngine to make sure the rules agree")
+    args = parser.parse_args()
+
+    logger_setup(logging.INFO)
+    log = logging.getLogger(__name__)
+    # Replaying games for the cross-check would otherwise log every game start and end
+    logging.getLogger("engine.game_engine").setLevel(logging.WARNING)
+
+    simulator = BatchSimulator(seed=args.seed)
+    grand_totals, category_totals, mismatched_game_count = [], np.zeros(len(SCORE_TYPES)), 0
+    start = time.perf_counter()
+    for batch_start in range(0, args.games, args.batch_size):
+        result = simulator.simulate(min(args.batch_size, args.games - batch_start))
+        grand_totals.append(result.grand_total)
+        category_totals += result.scores.sum(axis=0)
+        sampled_games = simulator.rng.choice(result.game_count, size=min(args.cross_check, result.game_count), replace=False)
+        mismatched_game_count += len(cross_check_with_game_engine(result, sampled_games.tolist()))
+    elapsed = time.perf_counter() - start
+
+    grand_totals = np.concatenate(grand_totals)
+    log.info(f"Simulated {len(grand_totals)} games in {elapsed:.2f}s ({len(grand_totals) / elapsed:.0f} games/s)")
+    log.info(f"Grand total: mean {grand_totals.mean():.1f}, std {grand_totals.std():.1f}, "
+             f"p5 {np.percentile(grand_totals, 5):.0f}, p50 {np.percentile(grand_totals, 50):.0f}, "
+             f"p95 {np.percentile(grand_totals, 95):.0f}, max {grand_totals.max()}")
+    for score_type, category_total in zip(SCORE_TYPES, category_totals):
+        log.info(f"\t{score_type.value}: mean {category_total / len(grand_totals):.2f}")
+    if mismatched_game_count:
+        log.error(f"{mismatched_game_count} cross-checked games scored differently in GameEngine")
+        raise SystemExit(1)
+    log.info("Every cross-checked game scored the same in GameEngine")
+
+
+if __name__ == "__main__":
+    start_simulation()
@@ -0,0 +1,30 @@
+import argparse
+import logging
+
+from engine.solver import build_strategy_table
+from main import logger_setup
+from util.config import Config
+
+
+def start_solver():
+    """
+    Builds the optimal strategy table used for hints and bots, e.g.:
+        python3 src/app/solve.py --processes 8
+    If the build is interrupted, running it again picks up where it left off.
+    """
+    config = Config()
+    parser = argparse.ArgumentParser(description="Build the optimal strategy table")
+    parser.add_argument("--path", default=config.STRATEGY_TABLE_PATH, help="where to save the table")
+    parser.add_argument("--processes", type=int, default=None, help="number of processes to use, defaults to one per CPU")
+    args = parser.parse_args()
+
+    logger_setup(config.LOG_LEVEL)
+    log = logging.getLogger(__name__)
+
+    strategy_table = build_strategy_table(args.path, processes=args.processes)
+    log.info(f"Strategy table saved to {args.path}, expected score of a new game: "
+             f"{strategy_table.values[0, 0]:.2f}")
+
+
+if __name__ == "__main__":
+    start_solver()
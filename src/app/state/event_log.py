@@ -0,0 +1,174 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from engine.entities import Roll
+from events.event import Event
+from state.state_manager import StateManager
+from state.yahtzee.player import RecoveredConnection, get_connection_id
+
+SNAPSHOT_FILE_NAME = "snapshot.json"
+SEGMENT_FILE_PATTERN = "events-*.log"
+
+
+class EventLog:
+    def __init__(self, directory: str):
+        """
+        A write-ahead log of every event processed in every room, so that the rooms can be rebuilt after a crash.
+
+        Appending only serializes the event into memory; flush() writes everything appended since the last flush
+        and fsyncs it once, on a dedicated thread, so no message ever waits on the disk. write_snapshot() saves the
+        state of every room and starts a new log segment, after which the old segments are deleted. Recovering
+        means loading the snapshot and replaying whatever was logged after it, so it takes time proportional to the
+        snapshot interval rather than to the length of the games.
+
+        Each line of a segment is a JSON record:
+            * "sequence": increasing across segments, so records older than the snapshot can be skipped
+            * "room": the room id
+            * "message": the message the event was created from, and "connection": who sent it
+            * "roll": the face values of the current turn's roll after the event, since rolling is random
+            * or "evicted": true, when the room was evicted
+        """
+        self.log = logging.getLogger(__name__)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.sequence = 0
+        self._pending = []
+        self._segment = None
+        # A single thread, so writes, snapshots and segment deletions happen in the order they were requested
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-log")
+
+    def append(self, room_id: str, event: Event, state_manager: StateManager):
+        """
+        Records an event that was just processed in the room
+        """
+        current_turn = state_manager.game_engine.current_turn
+        return self._append({
+            "room": room_id,
+            # Binary messages are recorded as JSON, so that the log reads (and replays) the same either way
+            "message": event.message if isinstance(event.message, str) else json.dumps(event.event_dict),
+            "connection": get_connection_id(event.websocket),
+            "roll": list(current_turn.last_roll.get_face_values()) if current_turn is not None else None
+        })
+
+    def append_eviction(self, room_id: str):
+        return self._append({"room": room_id, "evicted": True})
+
+    def _append(self, record):
+        self.sequence += 1
+        self._pending.append((self.sequence, json.dumps({"sequence": self.sequence, **record}) + "\n"))
+        return self
+
+    async def flush(self):
+        pending, self._pending = self._pending, []
+        if pending:
+            await asyncio.get_event_loop().run_in_executor(self._executor, self._write, pending)
+        return self
+
+    async def write_snapshot(self, rooms):
+        """
+        Saves the state of every room in the registry. The state is copied right away, together with the records
+        appended so far, so the snapshot is consistent with the log even though it's written on another thread.
+        """
+        snapshot = json.dumps({
+            "sequence": self.sequence,
+            "rooms": {room_id: room.state_manager.to_snapshot() for room_id, room in rooms.rooms.items()}
+        })
+        pending, self._pending = self._pending, []
+        await asyncio.get_event_loop().run_in_executor(self._executor, self._write_snapshot, pending, snapshot)
+        self.log.info(f"Wrote a snapshot of {len(rooms)} rooms at sequence {self.sequence}")
+        return self
+
+    def _write(self, pending):
+        if self._segment is None:
+            first_sequence = pending[0][0]
+            self._segment = open(os.path.join(self.directory, f"events-{first_sequence:012d}.log"), "a")
+        self._segment.write("".join(line for sequence, line in pending))
+        self._segment.flush()
+        os.fsync(self._segment.fileno())
+
+    def _write_snapshot(self, pending, snapshot: str):
+        # Finish the current segment, in case the snapshot doesn't make it to disk
+        if pending:
+            self._write(pending)
+        old_segments = self._get_segment_paths()
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE_NAME)
+        with open(snapshot_path + ".tmp", "w") as snapshot_file:
+            snapshot_file.write(snapshot)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(snapshot_path + ".tmp", snapshot_path)
+
+        # Everything in the old segments is in the snapshot now
+        for segment_path in old_segments:
+            os.remove(segment_path)
+
+    def _get_segment_paths(self):
+        return sorted(glob.glob(os.path.join(self.directory, SEGMENT_FILE_PATTERN)))
+
+    def recover(self, rooms):
+        """
+        Rebuilds the rooms of the registry from the latest snapshot and the events logged after it.
+        Meant to be called once at startup, before the server accepts connections.
+        """
+        snapshot_sequence = 0
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE_NAME)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            snapshot_sequence = snapshot["sequence"]
+            for room_id, room_snapshot in snapshot["rooms"].items():
+                room = rooms.get_room(room_id)
+                room.state_manager = StateManager.from_snapshot(room_snapshot, room.state_manager.transcript_max_messages,
+                                                                room.state_manager.codec)
+        self.sequence = snapshot_sequence
+
+        replayed_count = 0
+        for segment_path in self._get_segment_paths():
+            with open(segment_path, "rb+") as segment:
+                offset = 0
+                for line in segment:
+                    if not line.endswith(b"\n"):
+                        # The process died halfway through writing this record, so it was never flushed.
+                        # Cut it off so that the segment can be appended to again.
+                        self.log.warning(f"Dropping a partially written record at the end of {segment_path}")
+                        segment.truncate(offset)
+                        break
+                    offset += len(line)
+                    record = json.loads(line)
+                    if record["sequence"] <= snapshot_sequence:
+                        continue
+                    self._replay(record, rooms)
+                    self.sequence = record["sequence"]
+                    replayed_count += 1
+        self.log.info(f"Recovered {len(rooms)} rooms, replayed {replayed_count} events since the snapshot")
+        return self
+
+    @staticmethod
+    def _replay(record, rooms):
+        if record.get("evicted"):
+            rooms.rooms.pop(record["room"], None)
+            return
+        connection = None if record["connection"] is None else RecoveredConnection(record["connection"])
+        state_manager = rooms.get_room(record["room"]).state_manager
+        event = Event(record["message"], connection)
+        # A roll has to come up the same as it did the first time, in the transcript as well as on the table
+        if event.type == "rolled_dice":
+            event.recorded_roll = record["roll"]
+        state_manager.process_event(event)
+        # Any other event that starts a turn gets random dice, which are put back as they were
+        if record["roll"] is not None and state_manager.game_engine.current_turn is not None:
+            state_manager.game_engine.current_turn.last_roll = Roll.from_face_values(record["roll"])
+
+    def close(self):
+        self._executor.shutdown()
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
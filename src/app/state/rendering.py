@@ -0,0 +1,44 @@
+from util.codec import STDLIB_JSON, Codec
+
+
+def encode_member(name: str, value, codec: Codec = STDLIB_JSON) -> str:
+    """
+    One pre-encoded member of a JSON object, e.g. '"scorecards": {...}', ready to be spliced into a document
+    """
+    return f"{codec.encode(name)}: {codec.encode(value)}"
+
+
+def render_update(update_type: str, timestamp: float, version: int, members, codec: Codec = STDLIB_JSON) -> str:
+    """
+    A game state update whose "data" is made of already encoded members (see encode_member). With the standard
+    library codec this produces the same JSON as json.dumps of the equivalent dict, but only the members passed
+    in are ever encoded.
+    """
+    return (f'{{"timestamp": {codec.encode(timestamp)}, "type": {codec.encode(update_type)}, "version": {version}, '
+            f'"data": {{{", ".join(members)}}}}}')
+
+
+class FragmentCache:
+    def __init__(self, codec: Codec = STDLIB_JSON):
+        """
+        Encoded members of the game state that every player sees the same, so that each is encoded once per change
+        rather than once per player per update. Each fragment is stored with the key it was encoded for (anything
+        that changes whenever the value does) and is encoded again when asked for with a different key.
+        """
+        self.codec = codec
+        self.fragments = {}     # name -> (key, encoded member)
+        self.encoded_count = 0
+
+    def clear(self):
+        """
+        Forgets every fragment, so that each one is encoded again the next time it is asked for
+        """
+        self.fragments.clear()
+        return self
+
+    def get(self, name: str, key, get_value) -> str:
+        cached = self.fragments.get(name)
+        if cached is None or cached[0] != key:
+            cached = self.fragments[name] = (key, encode_member(name, get_value(), self.codec))
+            self.encoded_count += 1
+        return cached[1]
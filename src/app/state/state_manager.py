@@ -1,102 +1,219 @@
-import json
 import logging
+import time
 from datetime import datetime
 from engine.game_engine import GameEngine
-from events.event import Event
-from pprint import pformat
+from events.event import Event, EventType
+from functools import wraps
+from state.rendering import FragmentCache, encode_member, render_update
 from state.transcripts.message import Message
-from state.transcripts.transcript import Transcript
-from state.yahtzee.player import Player
-import itertools
+from state.transcripts.transcript import DEFAULT_MAX_MESSAGES, Transcript
+from state.yahtzee.player import BotPlayer, Player, RecoveredConnection
+from itertools import permutations
+from util.codec import STDLIB_JSON, Codec
+from util.metrics import METRICS
+
+EVENT_HANDLERS = {}    # EventType value -> the StateManager method that processes it, see handles
+HANDLER_LATENCY = METRICS.histogram("yahtzee_event_handler_seconds", "Time spent processing each type of event",
+                                    label_names=["event_type"])
+STATE_SERIALIZATION_LATENCY = METRICS.histogram("yahtzee_state_serialization_seconds",
+                                                "Time spent serializing game state updates, by kind (snapshot or delta)",
+                                                label_names=["kind"])
+HANDLER_ERRORS = METRICS.counter("yahtzee_event_handler_errors_total", "Events whose handler raised an exception",
+                                 label_names=["event_type"])
+
+
+def handles(event_type: EventType, changes_game: bool = True):
+    """
+    Registers a StateManager method as the handler of a type of event, and times every call to it.
+    Handlers that only ever add chat messages say so with changes_game=False, so that the game's cached
+    fragments (see publish_current_state) are kept.
+    """
+    def register(handler):
+        @wraps(handler)
+        def timed_handler(self, event):
+            start = time.perf_counter()
+            if changes_game:
+                self._game_revision += 1
+            try:
+                return handler(self, event)
+            except Exception:
+                HANDLER_ERRORS.inc(event_type.value)
+                raise
+            finally:
+                HANDLER_LATENCY.observe(time.perf_counter() - start, event_type.value)
+        EVENT_HANDLERS[event_type.value] = timed_handler
+        return timed_handler
+    return register
 
 
 class StateManager:
-    def __init__(self):
+    def __init__(self, transcript_max_messages: int = DEFAULT_MAX_MESSAGES, codec: Codec = STDLIB_JSON):
         """
-        Instantiates the classes required classes to manage a game
+        Instantiates the classes required classes to manage a game. Updates are encoded with the JSON codec.
         """
         self.log = logging.getLogger(__name__)
         self.players = list()
         self.game_engine = GameEngine()
-        self.chat_transcript = Transcript()
-        self.game_transcript = Transcript()
+        self.transcript_max_messages = transcript_max_messages
+        self.chat_transcript = Transcript(transcript_max_messages)
+        self.game_transcript = Transcript(transcript_max_messages)
+        # One transcript per pair of players that has actually talked, see get_private_transcript_key
         self.private_transcripts = {}
+        self.private_transcript_participants = {}
+
+        # Bookkeeping for the delta protocol: every published update gets a new version, and we remember
+        # what has changed since the last one so that only that needs to be sent out.
+        self.version = 0
+        self._full_update_required = False
+        self._changed_sections = set()
+        self._changed_scores = list()
+        self._published_message_counts = {}
+        # Encoded parts of the state that every player gets, see publish_current_state. The game revision changes
+        # whenever anything but the transcripts might have.
+        self.codec = codec
+        self._fragments = FragmentCache(codec)
+        self._game_revision = 0
 
     def process_event(self, event):
         """
         The central method of this class which processes all valid events received by the EventBroker.
-        Forwards events to the correct method for processing
-        """
-        if event.type == "player_joined":
-            self.add_connected_player(event)
-        elif event.type == "player_left":
-            self.remove_connected_player(event)
-        elif event.type == "chat_message":
-            self.send_chat_message(event)
-        elif event.type == "game_started":
-            self.start_game(event)
-        elif event.type == "rolled_dice":
-            self.roll_selected_dice(event)
-        elif event.type == "score_selected":
-            self.score_selected(event)
-        else:
+        Forwards events to the method registered for their type with @handles
+        """
+        handler = EVENT_HANDLERS.get(event.event_type.value) if event.event_type is not None else None
+        if handler is None:
             self.log.warning(f"Event type: {event.type} not recognized.")
+            return
+        handler(self, event)
 
+    @handles(EventType.PLAYER_JOINED)
     def add_connected_player(self, event: Event):
         self.log.info("Adding player to the game")
+        recovered_player = next((player for player in self.get_recovered_players()
+                                 if player.name == event.data["player_name"]), None)
+        if recovered_player is not None:
+            # Back after a restart: the player takes their seat again, and the recovered game carries on
+            recovered_player.websocket = event.websocket
+            self.transcribe_event(event)
+            return self
+
         new_player = Player(name=event.data["player_name"], websocket=event.websocket, joined_at=event.timestamp)
         self.players.append(new_player)
         self.transcribe_event(event)
-        self.log.info("current player list: ")
-        self.log.info(self.get_connected_players())
+        self.log.info("current player list: %s", self.get_connected_players())
 
         # Temporary hack to reset game each time a new player joins (makes debugging much easier).
         self.game_engine = GameEngine()
+        self._full_update_required = True
 
         return self
 
+    @handles(EventType.BOT_ADDED)
+    def add_bot_player(self, event: Event):
+        self.log.info("Adding bot to the game")
+        if event.data["bot_name"] in [player.name for player in self.players]:
+            # Turns and scorecards are looked up by player name, so two players can't share one
+            self.log.warning(f"There is already a player called {event.data['bot_name']}, not adding the bot")
+            return self
+        bot = BotPlayer(name=event.data["bot_name"], websocket=None, joined_at=event.timestamp,
+                        strategy_name=event.data.get("strategy", "greedy"))
+        self.players.append(bot)
+        self.transcribe_event(event, bot.name)
+        self.log.info("current player list: %s", self.get_connected_players())
+
+        # Same as a player joining, the game is reset
+        self.game_engine = GameEngine()
+        self._full_update_required = True
+
+        return self
+
+    def get_bot_players(self):
+        return [player for player in self.players if isinstance(player, BotPlayer)]
+
+    @handles(EventType.PLAYER_LEFT)
     def remove_connected_player(self, event: Event):
         self.log.info("Removing player from the game")
         for player in self.players:
             if player.websocket == event.websocket:
                 event.data["player_name"] = player.name
                 self.players.remove(player)
+        self._changed_sections.add("players")
         self.transcribe_event(event)
-        self.log.info("current player list: ")
-        self.log.info(self.get_connected_players())
+        self.log.info("current player list: %s", self.get_connected_players())
         return self
 
+    def get_recovered_players(self):
+        """
+        Players restored from the event log who haven't reconnected since
+        """
+        return [player for player in self.players if isinstance(player.websocket, RecoveredConnection)]
+
     def get_connected_players(self):
         return [str(player) for player in self.players]
 
+    def get_player_name(self, websocket):
+        for player in self.players:
+            if player.websocket == websocket:
+                return player.name
+        return None
+
+    @staticmethod
+    def get_private_transcript_key(player_name, other_player_name):
+        """
+        Both players of a private conversation share one transcript, stored under the same key whoever sent the message
+        """
+        return "/".join(sorted([player_name, other_player_name]))
+
+    def get_private_transcripts_for_player(self, player_name):
+        """
+        The private transcripts the player is part of, keyed "player_name/other_player_name" like the front end expects
+        """
+        private_transcripts = {}
+        for key, participants in self.private_transcript_participants.items():
+            if player_name in participants:
+                other_player_name = participants[1] if participants[0] == player_name else participants[0]
+                private_transcripts[f"{player_name}/{other_player_name}"] = self.private_transcripts[key]
+        return private_transcripts
+
+    @handles(EventType.CHAT_MESSAGE, changes_game=False)
     def send_chat_message(self, event: Event):
         message = Message(event)
         if(event.data['destination'] == "all"):
             self.chat_transcript.add_message(message)
         else:
-            key = event.data['player_name'] + "/" + event.data['destination']
+            # Private conversations are only between the players in the room, anything else would let a client
+            # make up names to open as many transcripts as it likes
+            player_names = [player.name for player in self.players]
+            if event.data['player_name'] not in player_names or event.data['destination'] not in player_names:
+                self.log.warning("Ignoring a private message that isn't between two players in the room")
+                return self
+            key = self.get_private_transcript_key(event.data['player_name'], event.data['destination'])
+            if key not in self.private_transcripts:
+                self.private_transcripts[key] = Transcript(self.transcript_max_messages)
+                self.private_transcript_participants[key] = (event.data['player_name'], event.data['destination'])
             self.private_transcripts[key].add_message(message)
         return self
 
+    @handles(EventType.GAME_STARTED)
     def start_game(self, event: Event):
-        for pair in itertools.combinations(self.players, 2):
-            privateTranscript = Transcript()
-            key = pair[0].name + "/" + pair[1].name
-            key2 = pair[1].name + "/" + pair[0].name
-            self.private_transcripts[key] = privateTranscript
-            self.private_transcripts[key2] = privateTranscript
         self.game_engine.start_game(self.players)
+        self._full_update_required = True
         self.transcribe_event(event, len(self.players))
         return self
 
+    @handles(EventType.ROLLED_DICE)
     def roll_selected_dice(self, event: Event):
-        self.game_engine.roll_selected_dice(event.get_data()["dice_to_roll"])
-        valuelist = [dice.face_value for dice in self.game_engine.current_turn.last_roll.dice]
-        self.log.info(valuelist)
+        self.game_engine.roll_selected_dice(event.get_data()["dice_to_roll"], event.recorded_roll)
+        self._changed_sections.add("current_turn")
+        valuelist = list(self.game_engine.current_turn.last_roll.get_face_values())
+        self.log.debug("Rolled %s", valuelist)
         self.transcribe_event(event, valuelist)
 
+    @handles(EventType.SCORE_SELECTED)
     def score_selected(self, event: Event):
+        scorecard, turn = self.game_engine.current_scorecard, self.game_engine.current_turn
         self.game_engine.select_score_for_roll(event.get_data()["selected_score_type"])
+        self._changed_scores.append((scorecard, turn.selected_score_type))
+        self._changed_sections.update(["current_turn", "game_winner"])
         self.transcribe_event(event, event.get_data()["selected_score_type"].lower().replace("_", " "))
         event.type = "update_turn"
         self.transcribe_event(event, self.game_engine.current_turn.player.name)
@@ -106,54 +223,174 @@ class StateManager:
         self.game_transcript.add_message(message)
         return self
 
-    def publish_current_state(self):
+    def get_valid_scores(self):
+        return self.game_engine.current_turn.get_valid_scores(self.game_engine.current_scorecard)
+
+    def get_current_turn_state(self):
+        return {
+            **self.game_engine.current_turn.to_dict(),
+            "valid_scores": self.get_valid_scores()
+        }
+
+    def publish_current_state(self, player_name=None, timestamp=None):
+        """
+        Serializes a full snapshot of the game state. This is sent to players when they join, and to any player
+        that asks for a resync because they missed a delta. The snapshot carries the version of the last
+        published update, so the client knows which delta to expect next.
+
+        Only the private transcripts of the given player are included, nobody else gets to read them.
+        Everything else is the same for every player, and is spliced in from the encoded fragments in
+        _get_shared_state_members, so a snapshot for each player costs little more than one for everybody.
+        """
+        start = time.perf_counter()
+        members = self._get_shared_state_members()
+        private_transcripts = self.get_private_transcripts_for_player(player_name) if player_name is not None else {}
+        members.append(encode_member("private_transcripts", {key: transcript.get_transcript()
+                                                             for key, transcript in private_transcripts.items()}, self.codec))
+        serialized_state = render_update("game_state_update", timestamp or datetime.now().timestamp(), self.version,
+                                         members, self.codec)
+
+        self.log.debug("Publishing game state update: %s", serialized_state)
+        STATE_SERIALIZATION_LATENCY.observe(time.perf_counter() - start, "snapshot")
+        return serialized_state
+
+    def _get_shared_state_members(self):
+        """
+        The encoded members of a snapshot's "data" that every player gets. Each is only encoded again once it
+        has changed: the transcripts when they have new messages, everything else when an event changed the game.
+        """
+        game_revision = self._game_revision
+        members = [
+            self._fragments.get("game_started", game_revision, lambda: self.game_engine.game_started),
+            self._fragments.get("players", game_revision, self.get_connected_players),
+            self._fragments.get("chat_transcript", self.chat_transcript.get_message_count(), self.chat_transcript.get_transcript),
+            self._fragments.get("game_transcript", self.game_transcript.get_message_count(), self.game_transcript.get_transcript)
+        ]
         if not self.game_engine.game_started:
-            data = {
-                "game_started": self.game_engine.game_started,
-                "players": self.get_connected_players(),
-                "chat_transcript": self.chat_transcript.get_transcript(),
-                "game_transcript": self.game_transcript.get_transcript(),
-                "scorecards": [],
-                "current_turn": ""
-            }
-            game_state_event = {
-                "timestamp": datetime.now().timestamp(),
-                "type": "game_state_update",
-                "data": data
-            }
+            members += [encode_member("scorecards", [], self.codec), encode_member("current_turn", "", self.codec)]
         else:
-            YAHTZEE_SCORE_INDEX = 11
-
-            valid_scores = {}
-            #if the roll is yahtzee and there is already a score selected, deal with yahtzee bonus
-
-            if(self.game_engine.current_scorecard.scores[YAHTZEE_SCORE_INDEX].is_valid_for_roll(self.game_engine.current_turn.last_roll) and self.game_engine.current_scorecard.scores[YAHTZEE_SCORE_INDEX].selected_roll != None):
-                valid_scores = {score.score_type().value: score.calculate_yahtzee_bonus_points(self.game_engine.current_turn.last_roll) for score in self.game_engine.current_scorecard.scores}
-            #otherwise proceed normally
-            else:
-                valid_scores = {score.score_type().value: score.calculate_potential_points(self.game_engine.current_turn.last_roll) for score in self.game_engine.current_scorecard.scores}
-
-
-
-            data = {
-                "game_started": self.game_engine.game_started,
-                "players": self.get_connected_players(),
-                "chat_transcript": self.chat_transcript.get_transcript(),
-                "game_transcript": self.game_transcript.get_transcript(),
-                "private_transcripts": {key: self.private_transcripts[key].get_transcript() for key in self.private_transcripts},
-                "scorecards": {scorecard.player.name: scorecard.to_dict() for scorecard in self.game_engine.scorecards},
-                "current_turn": {
-                    **self.game_engine.current_turn.to_dict(),
-                    "valid_scores": valid_scores
-                },
-                "game_winner": self.game_engine.game_winner
-            }
-            game_state_event = {
-                "timestamp": datetime.now().timestamp(),
-                "type": "game_state_update",
-                "data": data
-            }
-
-        self.log.info("Publishing game state update:")
-        self.log.info(pformat(game_state_event))
-        return json.dumps(game_state_event)
+            members += [
+                self._fragments.get("scorecards", game_revision, lambda: {scorecard.player.name: scorecard.to_dict()
+                                                                          for scorecard in self.game_engine.scorecards}),
+                self._fragments.get("current_turn", game_revision, self.get_current_turn_state),
+                self._fragments.get("game_winner", game_revision, lambda: self.game_engine.game_winner)
+            ]
+        return members
+
+    def publish_state_delta(self):
+        """
+        Same as publish_state_deltas, for the players that aren't in a private conversation that changed
+        """
+        return self.publish_state_deltas()[0]
+
+    def publish_state_deltas(self):
+        """
+        Serializes only what has changed since the last published update, and bumps the version.
+        Returns the update for everybody, and a separate update for each player whose private transcripts changed
+        (keyed by player name), which also includes those.
+
+        A delta can contain any of these keys in "data":
+            * "players": the full player list, if someone left
+            * "chat_transcript" / "game_transcript": the new lines, oldest first
+            * "private_transcripts": the new lines of each of the player's private transcripts that changed, oldest first
+            * "scorecards": for each scorecard that changed, the newly selected score and the new totals
+            * "current_turn": the current turn, if the dice were rolled or the turn changed
+            * "game_winner": the winner, once the game is over
+        Structural changes (a player joining resets the game, the game starting) are rare, so a full
+        snapshot is published in their place. Clients should apply a delta only if its version is one more
+        than the version they have, and send a resync_requested event otherwise.
+        """
+        self.version += 1
+        timestamp = datetime.now().timestamp()
+        if self._full_update_required:
+            self._reset_change_tracking()
+            participants = {player_name for participants in self.private_transcript_participants.values()
+                            for player_name in participants}
+            return self.publish_current_state(timestamp=timestamp), {
+                player_name: self.publish_current_state(player_name, timestamp) for player_name in participants}
+
+        start = time.perf_counter()
+        members = []
+        if "players" in self._changed_sections:
+            members.append(self._fragments.get("players", self._game_revision, self.get_connected_players))
+        for name, transcript in (("chat_transcript", self.chat_transcript), ("game_transcript", self.game_transcript)):
+            new_messages = self._get_unpublished_messages(name, transcript)
+            if new_messages:
+                members.append(encode_member(name, new_messages, self.codec))
+        private_transcripts = {}
+        for key, transcript in self.private_transcripts.items():
+            new_messages = self._get_unpublished_messages(f"private/{key}", transcript)
+            if new_messages:
+                for player_name, other_player_name in permutations(self.private_transcript_participants[key]):
+                    private_transcripts.setdefault(player_name, {})[f"{player_name}/{other_player_name}"] = new_messages
+        if self._changed_scores:
+            members.append(encode_member("scorecards", {scorecard.player.name: scorecard.to_partial_dict([score_type])
+                                                        for scorecard, score_type in self._changed_scores}, self.codec))
+        if self.game_engine.game_started:
+            if "current_turn" in self._changed_sections:
+                members.append(self._fragments.get("current_turn", self._game_revision, self.get_current_turn_state))
+            if "game_winner" in self._changed_sections and self.game_engine.game_winner["player_name"] is not None:
+                members.append(self._fragments.get("game_winner", self._game_revision, lambda: self.game_engine.game_winner))
+        self._reset_change_tracking()
+
+        # Everybody shares the same members, the players with new private messages get theirs spliced on the end
+        serialized_delta = render_update("game_state_delta", timestamp, self.version, members, self.codec)
+        player_deltas = {player_name: render_update("game_state_delta", timestamp, self.version,
+                                                    members + [encode_member("private_transcripts", transcripts, self.codec)],
+                                                    self.codec)
+                         for player_name, transcripts in private_transcripts.items()}
+        self.log.debug("Publishing game state delta: %s", serialized_delta)
+        STATE_SERIALIZATION_LATENCY.observe(time.perf_counter() - start, "delta")
+        return serialized_delta, player_deltas
+
+    def to_snapshot(self):
+        """
+        A JSON-serializable copy of the whole state, for the event log (see state/event_log.py)
+        """
+        # Players who left during a game still have a scorecard
+        players = list({id(player): player for player in self.players + [
+            scorecard.player for scorecard in (self.game_engine.scorecards if self.game_engine.game_started else [])]}.values())
+        player_indices = {id(player): index for index, player in enumerate(players)}
+        return {
+            "version": self.version,
+            "players": [player.to_snapshot() for player in players],
+            "connected_players": [player_indices[id(player)] for player in self.players],
+            "game_engine": self.game_engine.to_snapshot(player_indices) if self.game_engine.game_started else None,
+            "chat_transcript": self.chat_transcript.to_snapshot(),
+            "game_transcript": self.game_transcript.to_snapshot(),
+            "private_transcripts": [{"participants": list(self.private_transcript_participants[key]), **transcript.to_snapshot()}
+                                    for key, transcript in self.private_transcripts.items()]
+        }
+
+    @staticmethod
+    def from_snapshot(snapshot, transcript_max_messages: int = DEFAULT_MAX_MESSAGES,
+                      codec: Codec = STDLIB_JSON) -> "StateManager":
+        state_manager = StateManager(transcript_max_messages, codec)
+        players = [Player.from_snapshot(player) for player in snapshot["players"]]
+        state_manager.players = [players[index] for index in snapshot["connected_players"]]
+        state_manager.game_engine = GameEngine.from_snapshot(snapshot["game_engine"], players)
+        state_manager.chat_transcript = Transcript.from_snapshot(snapshot["chat_transcript"], transcript_max_messages)
+        state_manager.game_transcript = Transcript.from_snapshot(snapshot["game_transcript"], transcript_max_messages)
+        for private_transcript in snapshot["private_transcripts"]:
+            key = StateManager.get_private_transcript_key(*private_transcript["participants"])
+            state_manager.private_transcripts[key] = Transcript.from_snapshot(private_transcript, transcript_max_messages)
+            state_manager.private_transcript_participants[key] = tuple(private_transcript["participants"])
+        state_manager.version = snapshot["version"]
+        # Whoever is connected after a restart needs everything anyway
+        state_manager._reset_change_tracking()
+        state_manager._full_update_required = True
+        return state_manager
+
+    def _get_unpublished_messages(self, key, transcript):
+        return transcript.get_messages_since(self._published_message_counts.get(key, 0))
+
+    def _reset_change_tracking(self):
+        self._full_update_required = False
+        self._changed_sections.clear()
+        self._changed_scores.clear()
+        self._published_message_counts = {
+            "chat_transcript": self.chat_transcript.get_message_count(),
+            "game_transcript": self.game_transcript.get_message_count(),
+            **{f"private/{key}": transcript.get_message_count() for key, transcript in self.private_transcripts.items()}
+        }
+        return self
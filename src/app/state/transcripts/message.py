@@ -1,6 +1,6 @@
 import logging
 
-from datetime import datetime
+from events.event import EASTERN
 
 
 class Message:
@@ -16,7 +16,7 @@ class Message:
         self.text = self.set_message()
 
     def format_timestamp(self):
-        return datetime.strptime(self.event.timestamp_est, "%Y-%m-%d %H:%M:%S").strftime("%I:%M%p").lstrip("0")
+        return self.event.get_datetime(tz=EASTERN).strftime("%I:%M%p").lstrip("0")
 
     def set_message(self):
         message = f"{self.timestamp}  {self.player}"
@@ -26,6 +26,8 @@ class Message:
             message += f": {txt}"
         elif self.event_type == "player_joined":
             message += " joined the game."
+        elif self.event_type == "bot_added":
+            message += " added " + self.info + " to the game."
         elif self.event_type == "player_left":
             message += " left the game."
         elif self.event_type == "game_started":
@@ -1,20 +1,75 @@
 import logging
+from collections import deque
+from itertools import islice
 from state.transcripts.message import Message
 
+DEFAULT_MAX_MESSAGES = 500
+
 
 class Transcript:
-    def __init__(self):
+    def __init__(self, max_messages: int = DEFAULT_MAX_MESSAGES):
+        """
+        The most recent max_messages messages, oldest first. Older messages are dropped as new ones are added,
+        so a long-running room doesn't grow without bound. max_messages=None keeps every message.
+
+        Messages are numbered from 0 in the order they were added, and keep their number after older ones are
+        dropped, so get_message_count and get_messages_since can be used to follow along.
+        """
         self.log = logging.getLogger(__name__)
-        self.transcript_list = list()
+        self.transcript_list = deque(maxlen=max_messages)
+        self._message_count = 0
+        self._rendered_transcript = None
 
     def add_message(self, message: Message):
         self.transcript_list.append(message.text)
+        self._message_count += 1
+        self._rendered_transcript = None
+
+    def get_message_count(self):
+        """
+        How many messages have ever been added, including the ones that have been dropped since
+        """
+        return self._message_count
+
+    def get_first_message_index(self):
+        """
+        The number of the oldest message that is still kept
+        """
+        return self._message_count - len(self.transcript_list)
+
+    def get_messages_since(self, index: int, limit: int = None):
+        """
+        Returns the text of every message added after the first `index` messages, oldest first, or only the first
+        `limit` of those. Messages that have already been dropped are skipped.
+        """
+        start = max(index, self.get_first_message_index()) - self.get_first_message_index()
+        stop = len(self.transcript_list) if limit is None else min(start + limit, len(self.transcript_list))
+        if start >= stop:
+            return []
+        if start >= len(self.transcript_list) // 2:
+            # The newest messages are the ones usually asked for, and a deque is quickest to walk from the closest end
+            return list(islice(reversed(self.transcript_list), len(self.transcript_list) - stop,
+                               len(self.transcript_list) - start))[::-1]
+        return list(islice(self.transcript_list, start, stop))
 
     def get_transcript(self):
-        transcript_str = ""
-        for i, txt in reversed(list(enumerate(self.transcript_list))):
-            if i == 0:
-                transcript_str += txt
-            else:
-                transcript_str += f"{txt}\n"
-        return transcript_str
+        """
+        Every kept message, newest first, one per line. Rendered once per change rather than once per call,
+        since every game state update includes it.
+        """
+        if self._rendered_transcript is None:
+            self._rendered_transcript = "\n".join(reversed(self.transcript_list))
+        return self._rendered_transcript
+
+    def to_snapshot(self):
+        return {
+            "messages": list(self.transcript_list),
+            "message_count": self._message_count
+        }
+
+    @staticmethod
+    def from_snapshot(snapshot, max_messages: int = DEFAULT_MAX_MESSAGES) -> "Transcript":
+        transcript = Transcript(max_messages)
+        transcript.transcript_list.extend(snapshot["messages"])
+        transcript._message_count = snapshot["message_count"]
+        return transcript
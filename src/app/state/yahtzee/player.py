@@ -1,5 +1,38 @@
+import uuid
 from dataclasses import dataclass
 
+# Distinguishes the connections of this process from those of earlier runs, in the event log
+_SESSION_ID = uuid.uuid4().hex[:8]
+
+
+@dataclass(frozen=True)
+class RecoveredConnection:
+    """
+    Stands in for the websocket of a player restored from the event log after a restart
+    """
+    connection_id: str
+
+
+@dataclass(frozen=True)
+class RemoteConnection:
+    """
+    Stands in for the websocket of a player who is connected to another node than the one that owns their room
+    (see SocketBackplane)
+    """
+    node_id: str
+    connection_id: str
+
+
+def get_connection_id(websocket):
+    """
+    A stable name for a websocket that can be written to the event log
+    """
+    if websocket is None:
+        return None
+    if isinstance(websocket, (RecoveredConnection, RemoteConnection)):
+        return websocket.connection_id
+    return f"{_SESSION_ID}-{id(websocket)}"
+
 
 @dataclass(init=True)
 class Player:
@@ -14,3 +47,38 @@ class Player:
         return {
             "name": self.name
         }
+
+    def to_snapshot(self):
+        return {
+            "name": self.name,
+            "joined_at": self.joined_at,
+            "connection": get_connection_id(self.websocket)
+        }
+
+    @staticmethod
+    def from_snapshot(snapshot) -> "Player":
+        websocket = None if snapshot["connection"] is None else RecoveredConnection(snapshot["connection"])
+        if "strategy_name" in snapshot:
+            return BotPlayer(name=snapshot["name"], websocket=websocket, joined_at=snapshot["joined_at"],
+                             strategy_name=snapshot["strategy_name"])
+        return Player(name=snapshot["name"], websocket=websocket, joined_at=snapshot["joined_at"])
+
+
+@dataclass(init=True)
+class BotPlayer(Player):
+    """
+    A player run by the server. It has no websocket; its turns are played by the named strategy (see events/bots.py)
+    """
+    strategy_name: str = "greedy"
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "bot": True
+        }
+
+    def to_snapshot(self):
+        return {
+            **super().to_snapshot(),
+            "strategy_name": self.strategy_name
+        }
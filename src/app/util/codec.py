@@ -0,0 +1,271 @@
+import json
+import logging
+import struct
+from abc import ABC, abstractmethod
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+JSON_SUBPROTOCOL = "yahtzee.json"
+BINARY_SUBPROTOCOL = "yahtzee.binary"
+
+
+class Codec(ABC):
+    """
+    How messages are written on the wire. Updates are rendered as JSON text by the StateManager (see
+    state/rendering.py), so encode_update turns that text into whatever the codec sends.
+    """
+    subprotocol = None
+
+    @abstractmethod
+    def encode(self, value):
+        pass
+
+    @abstractmethod
+    def decode(self, message):
+        """
+        Raises ValueError if the message can't be decoded
+        """
+        pass
+
+    def encode_update(self, payload: str):
+        return payload
+
+    def get_encoded_size(self, encoded) -> int:
+        """
+        Bytes that something encode_update returned takes on the wire. Text is sent as UTF-8.
+        """
+        return len(encoded) if isinstance(encoded, bytes) else len(encoded.encode())
+
+
+class StdlibJsonCodec(Codec):
+    subprotocol = JSON_SUBPROTOCOL
+
+    def encode(self, value) -> str:
+        return json.dumps(value)
+
+    def decode(self, message):
+        return json.loads(message)
+
+    def get_encoded_size(self, encoded) -> int:
+        # json.dumps escapes everything outside ASCII, so every character is a byte
+        return len(encoded)
+
+
+class OrjsonCodec(Codec):
+    """
+    The same JSON, encoded and decoded several times faster by orjson (pip install .[fast]). The output is
+    compact and not ASCII-escaped, so it isn't byte-for-byte what json.dumps writes.
+    """
+    subprotocol = JSON_SUBPROTOCOL
+
+    def __init__(self):
+        # The same update is sent to every JSON client in a room one after the other, so it's only measured once
+        self._last_size = (None, None)
+
+    def encode(self, value) -> str:
+        return orjson.dumps(value).decode()
+
+    def decode(self, message):
+        return orjson.loads(message)
+
+    def get_encoded_size(self, encoded) -> int:
+        last_encoded, last_size = self._last_size
+        if encoded is not last_encoded:
+            last_size = super().get_encoded_size(encoded)
+            self._last_size = (encoded, last_size)
+        return last_size
+
+
+def get_json_codec(name: str = "auto") -> Codec:
+    """
+    The JSON codec called name: "stdlib", "orjson", or "auto" for orjson if it is installed and the standard
+    library otherwise
+    """
+    if name not in ("auto", "orjson", "stdlib"):
+        raise ValueError(f"Unknown JSON codec: {name}")
+    if name == "stdlib":
+        return StdlibJsonCodec()
+    if orjson is None:
+        if name == "orjson":
+            logging.getLogger(__name__).warning("orjson is not installed (pip install .[fast]), using the standard library")
+        return StdlibJsonCodec()
+    return OrjsonCodec()
+
+
+STDLIB_JSON = StdlibJsonCodec()
+
+# Strings that come up in every update, each of which is written as a single byte by the BinaryCodec.
+# Their positions are part of the wire format, so new strings only ever go on the end (at most 96).
+KNOWN_STRINGS = (
+    "timestamp", "type", "version", "data",
+    "game_state_update", "game_state_delta",
+    "game_started", "players", "scorecards", "current_turn", "game_winner",
+    "chat_transcript", "game_transcript", "private_transcripts",
+    "last_roll", "roll_count", "selected_score_type", "player", "valid_scores", "die_id", "face_value",
+    "scores", "UPPER_BONUS", "UPPER_TOTAL", "LOWER_TOTAL", "GRAND_TOTAL", "yahtzee_bonus",
+    "player_name", "grand_total",
+    "ONES", "TWOS", "THREES", "FOURS", "FIVES", "SIXES", "THREE_OF_A_KIND", "FOUR_OF_A_KIND", "FULL_HOUSE",
+    "SMALL_STRAIGHT", "LARGE_STRAIGHT", "YAHTZEE", "CHANCE",
+    "bot_added", "chat_message", "player_joined", "player_left", "resync_requested", "rolled_dice",
+    "score_selected", "update_turn",
+    "content", "destination", "dice_to_roll", "bot_name", "strategy", "all",
+)
+KNOWN_STRING_INDICES = {string: index for index, string in enumerate(KNOWN_STRINGS)}
+
+NULL, FALSE, TRUE, INT, FLOAT, STRING, ARRAY, OBJECT = range(8)
+KNOWN_STRING = 0x20     # 0x20 + index of the string in KNOWN_STRINGS
+SMALL_INT = 0x80        # 0x80 + an int from 0 to 127
+DOUBLE = struct.Struct(">d")
+
+
+class BinaryCodec(Codec):
+    """
+    A compact binary encoding of the same values as the JSON, for clients that ask for it with the
+    "yahtzee.binary" subprotocol. Each value starts with a type byte:
+        0x00 null, 0x01 false, 0x02 true
+        0x03 int, as a zigzag varint
+        0x04 float, as a big-endian double
+        0x05 string, as a varint length then UTF-8
+        0x06 array, as a varint count then the items
+        0x07 object, as a varint count then the key and value of each member
+        0x20 to 0x7f one of the KNOWN_STRINGS, by index
+        0x80 to 0xff an int from 0 to 127
+    Dice, die ids, points and every key are a single byte each, so a turn with its valid scores is well under
+    a hundred bytes instead of about 500 as JSON.
+    """
+    subprotocol = BINARY_SUBPROTOCOL
+
+    def __init__(self, json_codec: Codec = STDLIB_JSON):
+        self.json_codec = json_codec
+        # The same update is sent to every binary client in a room one after the other, so it's only encoded once
+        self._last_update = (None, None)
+
+    def encode(self, value) -> bytes:
+        encoded = bytearray()
+        self._encode_value(value, encoded)
+        return bytes(encoded)
+
+    def encode_update(self, payload: str) -> bytes:
+        last_payload, last_encoded = self._last_update
+        if payload is not last_payload:
+            last_encoded = self.encode(self.json_codec.decode(payload))
+            self._last_update = (payload, last_encoded)
+        return last_encoded
+
+    def decode(self, message):
+        if not isinstance(message, (bytes, bytearray, memoryview)):
+            raise ValueError("Binary messages have to be bytes")
+        try:
+            value, position = self._decode_value(message, 0)
+        except (IndexError, UnicodeDecodeError, struct.error, RecursionError) as e:
+            raise ValueError(f"Truncated or malformed message: {e}")
+        if position != len(message):
+            raise ValueError("Unexpected bytes after the end of the message")
+        return value
+
+    def _encode_value(self, value, encoded: bytearray):
+        if value is None:
+            encoded.append(NULL)
+        elif value is True:
+            encoded.append(TRUE)
+        elif value is False:
+            encoded.append(FALSE)
+        elif isinstance(value, int):
+            if 0 <= value < 128:
+                encoded.append(SMALL_INT + value)
+            else:
+                encoded.append(INT)
+                self._encode_varint((value << 1) if value >= 0 else ((-value << 1) - 1), encoded)
+        elif isinstance(value, float):
+            encoded.append(FLOAT)
+            encoded += DOUBLE.pack(value)
+        elif isinstance(value, str):
+            self._encode_string(value, encoded)
+        elif isinstance(value, (list, tuple)):
+            encoded.append(ARRAY)
+            self._encode_varint(len(value), encoded)
+            for item in value:
+                self._encode_value(item, encoded)
+        elif isinstance(value, dict):
+            encoded.append(OBJECT)
+            self._encode_varint(len(value), encoded)
+            for key, item in value.items():
+                self._encode_string(key, encoded)
+                self._encode_value(item, encoded)
+        else:
+            raise TypeError(f"Can't encode a {type(value).__name__}")
+
+    def _encode_string(self, value: str, encoded: bytearray):
+        index = KNOWN_STRING_INDICES.get(value)
+        if index is not None:
+            encoded.append(KNOWN_STRING + index)
+            return
+        utf8 = value.encode()
+        encoded.append(STRING)
+        self._encode_varint(len(utf8), encoded)
+        encoded += utf8
+
+    @staticmethod
+    def _encode_varint(value: int, encoded: bytearray):
+        while value >= 0x80:
+            encoded.append((value & 0x7f) | 0x80)
+            value >>= 7
+        encoded.append(value)
+
+    @staticmethod
+    def _decode_varint(message, position: int):
+        value = shift = 0
+        while True:
+            byte = message[position]
+            position += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value, position
+            shift += 7
+
+    def _decode_value(self, message, position: int):
+        tag = message[position]
+        position += 1
+        if tag >= SMALL_INT:
+            return tag - SMALL_INT, position
+        if tag >= KNOWN_STRING:
+            if tag - KNOWN_STRING >= len(KNOWN_STRINGS):
+                raise ValueError(f"Unknown string {tag - KNOWN_STRING}")
+            return KNOWN_STRINGS[tag - KNOWN_STRING], position
+        if tag == NULL:
+            return None, position
+        if tag == FALSE:
+            return False, position
+        if tag == TRUE:
+            return True, position
+        if tag == INT:
+            zigzag, position = self._decode_varint(message, position)
+            return (zigzag >> 1) if not zigzag & 1 else -((zigzag + 1) >> 1), position
+        if tag == FLOAT:
+            return DOUBLE.unpack_from(message, position)[0], position + DOUBLE.size
+        if tag == STRING:
+            length, position = self._decode_varint(message, position)
+            if position + length > len(message):
+                raise ValueError("String runs past the end of the message")
+            return bytes(message[position:position + length]).decode(), position + length
+        if tag == ARRAY:
+            count, position = self._decode_varint(message, position)
+            items = []
+            for _ in range(count):
+                item, position = self._decode_value(message, position)
+                items.append(item)
+            return items, position
+        if tag == OBJECT:
+            count, position = self._decode_varint(message, position)
+            members = {}
+            for _ in range(count):
+                key, position = self._decode_value(message, position)
+                if not isinstance(key, str):
+                    raise ValueError("Object keys have to be strings")
+                members[key], position = self._decode_value(message, position)
+            return members, position
+        raise ValueError(f"Unknown type byte {tag}")
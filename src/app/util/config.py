@@ -1,4 +1,6 @@
+import copy
 import logging
+import os
 import yaml
 
 
@@ -9,6 +11,42 @@ class Config:
         self.HOST = self.__config["host"]
         self.PORT = self.__config["port"]
         self.LOG_LEVEL = self.set_log_level()
+        self.LOG_FORMAT = self.__config.get("log_format", "text")
+        self.LOG_QUEUE = self.__config.get("log_queue", False)
+        self.LOG_SAMPLE_EVERY = self.__config.get("log_sample_every", 1)
+        self.ROOM_IDLE_TIMEOUT = self.__config.get("room_idle_timeout", 300)
+        self.ROOM_EVICTION_INTERVAL = self.__config.get("room_eviction_interval", 60)
+        self.SEND_QUEUE_SIZE = self.__config.get("send_queue_size", 32)
+        self.SEND_TIMEOUT = self.__config.get("send_timeout", None)
+        self.MAX_MESSAGE_SIZE = self.__config.get("max_message_size", 2 ** 20)
+        self.MAX_FIELD_LENGTH = self.__config.get("max_field_length", None)
+        self.CONNECTION_RATE = self.__config.get("connection_rate", 0)
+        self.CONNECTION_BURST = self.__config.get("connection_burst", 20)
+        self.ROOM_RATE = self.__config.get("room_rate", 0)
+        self.ROOM_BURST = self.__config.get("room_burst", 100)
+        self.GAMEPLAY_RATE = self.__config.get("gameplay_rate", 0)
+        self.GAMEPLAY_BURST = self.__config.get("gameplay_burst", 40)
+        self.JSON_CODEC = self.__config.get("json_codec", "auto")
+        self.UPDATE_INTERVAL = self.__config.get("update_interval", 0)
+        self.BATCHED_EVENT_TYPES = self.__config.get("batched_event_types", ["chat_message"])
+        self.STRATEGY_TABLE_PATH = self.__config.get("strategy_table_path", "strategy_table.npy")
+        self.MAX_BOTS_PER_ROOM = self.__config.get("max_bots_per_room", 3)
+        self.BOT_MOVE_DELAY = self.__config.get("bot_move_delay", 0.5)
+        self.BOT_CPU_SECONDS_PER_MINUTE = self.__config.get("bot_cpu_seconds_per_minute", 1.0)
+        self.BOT_WORKERS = self.__config.get("bot_workers", 2)
+        self.EVENT_LOG_DIRECTORY = self.__config.get("event_log_directory", None)
+        self.EVENT_LOG_FSYNC_INTERVAL = self.__config.get("event_log_fsync_interval", 0.1)
+        self.SNAPSHOT_INTERVAL = self.__config.get("snapshot_interval", 60)
+        self.RECOVERED_PLAYER_TIMEOUT = self.__config.get("recovered_player_timeout", 120)
+        self.TRANSCRIPT_MAX_MESSAGES = self.__config.get("transcript_max_messages", 500)
+        self.METRICS_HOST = self.__config.get("metrics_host", "127.0.0.1")
+        self.METRICS_PORT = self.__config.get("metrics_port", None)
+        self.EVENT_LOOP_LAG_INTERVAL = self.__config.get("event_loop_lag_interval", 1.0)
+        self.WORKERS = self.__config.get("workers", 1) or os.cpu_count()
+        self.BACKPLANE = self.__config.get("backplane", "in_process")
+        self.BACKPLANE_HOST = self.__config.get("backplane_host", "127.0.0.1")
+        self.BACKPLANE_PORT = self.__config.get("backplane_port", 9110)
+        self.BACKPLANE_HUB = self.__config.get("backplane_hub", False)
 
     def set_log_level(self):
         log_level_map = {
@@ -19,6 +57,56 @@ class Config:
         }
         return log_level_map[self.__config["log_level"]]
 
+    def for_worker(self, worker_index: int):
+        """
+        A copy of the settings for one worker process. Workers can't share an event log or a metrics port,
+        so each one gets its own directory inside the event log directory, and the metrics port plus its index.
+        """
+        worker_config = copy.copy(self)
+        if self.EVENT_LOG_DIRECTORY:
+            worker_config.EVENT_LOG_DIRECTORY = os.path.join(self.EVENT_LOG_DIRECTORY, f"worker-{worker_index}")
+        if self.METRICS_PORT is not None:
+            worker_config.METRICS_PORT = self.METRICS_PORT + worker_index
+        # Only one process can run the backplane hub
+        worker_config.BACKPLANE_HUB = self.BACKPLANE_HUB and worker_index == 0
+        return worker_config
+
     def log_config_settings(self):
         self.log.info(f"HOST: {self.HOST}")
         self.log.info(f"PORT: {self.PORT}")
+        self.log.info(f"LOG_FORMAT: {self.LOG_FORMAT}")
+        self.log.info(f"LOG_QUEUE: {self.LOG_QUEUE}")
+        self.log.info(f"LOG_SAMPLE_EVERY: {self.LOG_SAMPLE_EVERY}")
+        self.log.info(f"ROOM_IDLE_TIMEOUT: {self.ROOM_IDLE_TIMEOUT}")
+        self.log.info(f"ROOM_EVICTION_INTERVAL: {self.ROOM_EVICTION_INTERVAL}")
+        self.log.info(f"SEND_QUEUE_SIZE: {self.SEND_QUEUE_SIZE}")
+        self.log.info(f"SEND_TIMEOUT: {self.SEND_TIMEOUT}")
+        self.log.info(f"MAX_MESSAGE_SIZE: {self.MAX_MESSAGE_SIZE}")
+        self.log.info(f"MAX_FIELD_LENGTH: {self.MAX_FIELD_LENGTH}")
+        self.log.info(f"CONNECTION_RATE: {self.CONNECTION_RATE}")
+        self.log.info(f"CONNECTION_BURST: {self.CONNECTION_BURST}")
+        self.log.info(f"ROOM_RATE: {self.ROOM_RATE}")
+        self.log.info(f"ROOM_BURST: {self.ROOM_BURST}")
+        self.log.info(f"GAMEPLAY_RATE: {self.GAMEPLAY_RATE}")
+        self.log.info(f"GAMEPLAY_BURST: {self.GAMEPLAY_BURST}")
+        self.log.info(f"JSON_CODEC: {self.JSON_CODEC}")
+        self.log.info(f"UPDATE_INTERVAL: {self.UPDATE_INTERVAL}")
+        self.log.info(f"BATCHED_EVENT_TYPES: {self.BATCHED_EVENT_TYPES}")
+        self.log.info(f"STRATEGY_TABLE_PATH: {self.STRATEGY_TABLE_PATH}")
+        self.log.info(f"MAX_BOTS_PER_ROOM: {self.MAX_BOTS_PER_ROOM}")
+        self.log.info(f"BOT_MOVE_DELAY: {self.BOT_MOVE_DELAY}")
+        self.log.info(f"BOT_CPU_SECONDS_PER_MINUTE: {self.BOT_CPU_SECONDS_PER_MINUTE}")
+        self.log.info(f"BOT_WORKERS: {self.BOT_WORKERS}")
+        self.log.info(f"EVENT_LOG_DIRECTORY: {self.EVENT_LOG_DIRECTORY}")
+        self.log.info(f"EVENT_LOG_FSYNC_INTERVAL: {self.EVENT_LOG_FSYNC_INTERVAL}")
+        self.log.info(f"SNAPSHOT_INTERVAL: {self.SNAPSHOT_INTERVAL}")
+        self.log.info(f"RECOVERED_PLAYER_TIMEOUT: {self.RECOVERED_PLAYER_TIMEOUT}")
+        self.log.info(f"TRANSCRIPT_MAX_MESSAGES: {self.TRANSCRIPT_MAX_MESSAGES}")
+        self.log.info(f"METRICS_HOST: {self.METRICS_HOST}")
+        self.log.info(f"METRICS_PORT: {self.METRICS_PORT}")
+        self.log.info(f"EVENT_LOOP_LAG_INTERVAL: {self.EVENT_LOOP_LAG_INTERVAL}")
+        self.log.info(f"WORKERS: {self.WORKERS}")
+        self.log.info(f"BACKPLANE: {self.BACKPLANE}")
+        self.log.info(f"BACKPLANE_HOST: {self.BACKPLANE_HOST}")
+        self.log.info(f"BACKPLANE_PORT: {self.BACKPLANE_PORT}")
+        self.log.info(f"BACKPLANE_HUB: {self.BACKPLANE_HUB}")
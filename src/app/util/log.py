@@ -0,0 +1,102 @@
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+from datetime import datetime
+from pprint import pformat
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Pass as extra= to a log call that happens for every message or every update, so that it can be sampled
+SAMPLED = {"sampled": True}
+
+# The attributes every LogRecord has, anything else on a record was passed in extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", logging.INFO, "", 0, "", (), None))) | {"message", "asctime", "sampled"}
+
+
+class LazyPformat:
+    def __init__(self, value):
+        """
+        Pretty-prints value only if the log line is actually written, e.g.
+            log.debug("Publishing game state update:\\n%s", LazyPformat(game_state_event))
+        """
+        self.value = value
+
+    def __str__(self):
+        return pformat(self.value)
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, sample_every: int):
+        """
+        Only lets through one in every sample_every records logged with extra=SAMPLED from the same line of code.
+        Everything else passes untouched.
+        """
+        super().__init__()
+        self.sample_every = sample_every
+        self.counters = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.sample_every <= 1 or not getattr(record, "sampled", False):
+            return True
+        counter = self.counters.get((record.pathname, record.lineno))
+        if counter is None:
+            counter = self.counters[(record.pathname, record.lineno)] = itertools.count()
+        return next(counter) % self.sample_every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, for log shippers. Anything passed in extra= is included as its own field.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on a queue for a QueueListener thread to format and write, so that the event loop never waits on
+    stdout. Unlike QueueHandler, the message isn't formatted before it's queued either, so the arguments of a log
+    call must not be changed after it's made.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure_logging(log_level, log_format: str = "text", use_queue: bool = False, sample_every: int = 1):
+    """
+    Sets up the root logger:
+        * log_format: "text" for people, "json" for one JSON object per line
+        * use_queue: write logs from a background thread rather than from the thread that logs them
+        * sample_every: keep only one in this many of the records logged with extra=SAMPLED
+    Returns the QueueListener if there is one, so it can be stopped at exit.
+    """
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT, DATE_FORMAT))
+
+    root_logger = logging.getLogger()
+    for existing_handler in list(root_logger.handlers):
+        root_logger.removeHandler(existing_handler)
+    root_logger.setLevel(log_level)
+
+    listener = None
+    if use_queue:
+        log_queue = queue.SimpleQueue() if hasattr(queue, "SimpleQueue") else queue.Queue()
+        listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        listener.start()
+        handler = DeferredQueueHandler(log_queue)
+    # Filter before queueing, so sampled-out records cost as little as possible
+    handler.addFilter(SamplingFilter(sample_every))
+    root_logger.addHandler(handler)
+    return listener
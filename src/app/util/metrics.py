@@ -0,0 +1,160 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from 100us (a cheap handler) to a few seconds (something is badly wrong)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Counter:
+    def __init__(self, name: str, description: str, label_names=()):
+        """
+        A count that only goes up, kept separately for each combination of label values
+        """
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+        return self
+
+    def get(self, *label_values) -> float:
+        return self.values.get(label_values, 0)
+
+
+class Gauge:
+    def __init__(self, name: str, description: str, label_names=(), function=None):
+        """
+        A value that can go up and down, kept separately for each combination of label values. A gauge without
+        labels can be given a function instead, which is called for the current value whenever it is reported.
+        """
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.function = function
+        self.values = {}
+
+    def set(self, value: float, *label_values):
+        self.values[label_values] = value
+        return self
+
+    def get(self, *label_values) -> float:
+        if self.function is not None:
+            return self.function()
+        return self.values.get(label_values, 0)
+
+
+class Histogram:
+    def __init__(self, name: str, description: str, label_names=(), buckets=DEFAULT_BUCKETS):
+        """
+        Counts observations (usually durations in seconds) into buckets, kept separately for each combination of
+        label values. Along with the buckets it keeps the number of observations and their sum.
+        """
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # label values -> [count in each bucket (not cumulative), plus one for anything above the last bucket], sum
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            bucket_counts, total = self.values.get(label_values) or ([0] * (len(self.buckets) + 1), 0)
+            bucket_counts[bisect_left(self.buckets, value)] += 1
+            self.values[label_values] = (bucket_counts, total + value)
+        return self
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def get_count(self, *label_values) -> int:
+        bucket_counts, total = self.values.get(label_values, ([0], 0))
+        return sum(bucket_counts)
+
+    def get_sum(self, *label_values) -> float:
+        return self.values.get(label_values, ([0], 0))[1]
+
+    def get_cumulative_counts(self, *label_values):
+        """
+        The number of observations at or below each bucket's upper bound, as (upper bound, count) pairs.
+        The last pair is (inf, count of all observations).
+        """
+        bucket_counts = self.values.get(label_values, ([0] * (len(self.buckets) + 1), 0))[0]
+        cumulative_counts, running_count = [], 0
+        for upper_bound, count in zip(self.buckets + (float("inf"),), bucket_counts):
+            running_count += count
+            cumulative_counts.append((upper_bound, running_count))
+        return cumulative_counts
+
+
+class MetricsRegistry:
+    def __init__(self):
+        """
+        Every metric of the server by name, so that they can all be reported together
+        """
+        self.metrics = {}
+
+    def counter(self, name: str, description: str, label_names=()) -> Counter:
+        return self._get_or_create(Counter, name, description, label_names)
+
+    def gauge(self, name: str, description: str, label_names=(), function=None) -> Gauge:
+        gauge = self._get_or_create(Gauge, name, description, label_names)
+        if function is not None:
+            gauge.function = function
+        return gauge
+
+    def histogram(self, name: str, description: str, label_names=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, description, label_names, buckets=buckets)
+
+    def _get_or_create(self, metric_class, name, description, label_names, **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = metric_class(name, description, label_names, **kwargs)
+            self.metrics[name] = metric
+        elif not isinstance(metric, metric_class):
+            raise ValueError(f"Metric {name} is already registered as a {type(metric).__name__}")
+        return metric
+
+    def render(self) -> str:
+        """
+        Every metric in the Prometheus text exposition format
+        """
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            if isinstance(metric, Histogram):
+                lines.append(f"# TYPE {metric.name} histogram")
+                for label_values in list(metric.values):
+                    for upper_bound, count in metric.get_cumulative_counts(*label_values):
+                        le = "+Inf" if upper_bound == float("inf") else repr(float(upper_bound))
+                        lines.append(f"{metric.name}_bucket{_format_labels(metric.label_names + ('le',), label_values + (le,))} {count}")
+                    labels = _format_labels(metric.label_names, label_values)
+                    lines.append(f"{metric.name}_sum{labels} {metric.get_sum(*label_values)}")
+                    lines.append(f"{metric.name}_count{labels} {metric.get_count(*label_values)}")
+            else:
+                lines.append(f"# TYPE {metric.name} {'counter' if isinstance(metric, Counter) else 'gauge'}")
+                label_values_list = [()] if getattr(metric, "function", None) is not None else list(metric.values)
+                for label_values in label_values_list:
+                    lines.append(f"{metric.name}{_format_labels(metric.label_names, label_values)} {metric.get(*label_values)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(label_names, label_values) -> str:
+    if not label_names:
+        return ""
+    escaped_values = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in label_values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(label_names, escaped_values)) + "}"
+
+
+METRICS = MetricsRegistry()
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+
+from util.metrics import MetricsRegistry
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsServer:
+    def __init__(self, registry: MetricsRegistry, host: str, port: int):
+        """
+        A bare-bones HTTP server for Prometheus to scrape: GET /metrics returns every metric in the registry.
+        It runs on the server's event loop, on its own port, and is meant to be reachable from the host only.
+        """
+        self.log = logging.getLogger(__name__)
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_request, self.host, self.port)
+        self.log.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+        return self
+
+    async def handle_request(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # The headers don't matter, but have to be read before responding
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?", 1)[0] == "/metrics":
+                status, body = "200 OK", self.registry.render().encode()
+            else:
+                status, body = "404 Not Found", b"Not found, try /metrics\n"
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {CONTENT_TYPE}\r\nContent-Length: {len(body)}\r\n"
+                         f"Connection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            self.log.debug(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        return self
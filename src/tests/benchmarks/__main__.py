@@ -0,0 +1,45 @@
+import argparse
+
+from src.tests.benchmarks.benchmarks import (BASELINE_PATH, BENCHMARKS, DEFAULT_THRESHOLD, compare, load_baseline,
+                                             run_benchmarks, save_baseline)
+
+
+def start_benchmarks():
+    """
+    Times the hot paths and compares them with the stored baseline, e.g. from the repository root:
+        PYTHONPATH=src/app python3 -m src.tests.benchmarks
+    Exits with 1 if anything is slower than the baseline by more than the threshold. Timings depend on the
+    machine, so save a baseline on the machine that runs the comparisons:
+        PYTHONPATH=src/app python3 -m src.tests.benchmarks --save-baseline
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the engine and serialization hot paths")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run, out of: {', '.join(BENCHMARKS)} (default all)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file to compare with or save to")
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="fraction slower than the baseline that counts as a regression")
+    parser.add_argument("--repeat", type=int, default=5, help="rounds to time each benchmark for, the best counts")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.names or None, repeat=args.repeat)
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        for name, seconds in results.items():
+            print(f"{name:<40} {seconds * 1e6:>12.2f}us")
+        print(f"Saved the baseline to {args.baseline}")
+        return
+
+    regressions = []
+    for name, seconds, baseline_seconds, ratio, is_regression in compare(results, load_baseline(args.baseline), args.threshold):
+        baseline_text = f"{baseline_seconds * 1e6:>12.2f}us" if baseline_seconds else f"{'-':>14}"
+        ratio_text = f"{ratio:>6.2f}x" if ratio is not None else f"{'new':>7}"
+        print(f"{name:<40} {seconds * 1e6:>12.2f}us {baseline_text} {ratio_text}{'  REGRESSION' if is_regression else ''}")
+        if is_regression:
+            regressions.append(name)
+    if regressions:
+        print(f"{len(regressions)} benchmarks are more than {args.threshold:.0%} slower than the baseline: {', '.join(regressions)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    start_benchmarks()
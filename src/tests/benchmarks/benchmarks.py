@@ -0,0 +1,220 @@
+import json
+import os
+import platform
+import random
+import timeit
+from itertools import cycle, product
+
+from src.app.engine.entities import Roll, Scorecard
+from src.app.events.event import Event
+from src.app.state.state_manager import StateManager
+from src.app.state.transcripts.message import Message
+from src.app.state.transcripts.transcript import Transcript
+from src.app.state.yahtzee.player import Player
+from src.app.util.codec import STDLIB_JSON, BinaryCodec, OrjsonCodec, orjson
+
+SEED = 1234
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_THRESHOLD = 0.25    # Slower than the baseline by more than this fraction is a regression
+
+BENCHMARKS = {}     # Name -> function that sets the benchmark up and returns what to time, see benchmark
+
+
+def benchmark(name: str):
+    """
+    Registers a benchmark. The decorated function does the (seeded) setup and returns a function without
+    arguments that runs the hot path once, which is what gets timed.
+    """
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def make_event(event_type: str, timestamp: int = 1700000000000, websocket=None, **data) -> Event:
+    return Event(json.dumps({"type": event_type, "timestamp": timestamp, "data": data}), websocket)
+
+
+def make_started_game(player_count: int, turn_count: int = 20, chat_count: int = 50,
+                      codec=STDLIB_JSON) -> StateManager:
+    """
+    A room part way through a game: player_count players, turn_count turns played and chat_count chat messages
+    """
+    random.seed(SEED)
+    state_manager = StateManager(codec=codec)
+    for i in range(player_count):
+        state_manager.process_event(make_event("player_joined", websocket=f"socket-{i}", player_name=f"player-{i}"))
+    state_manager.process_event(make_event("game_started", player_name="player-0"))
+    for _ in range(turn_count):
+        player_name = state_manager.game_engine.current_turn.player.name
+        state_manager.process_event(make_event("rolled_dice", player_name=player_name, dice_to_roll=[1, 2, 3, 4, 5]))
+        open_score_types = [score.score_type().value for score in state_manager.game_engine.current_scorecard.scores
+                            if score.selected_roll is None]
+        state_manager.process_event(make_event("score_selected", player_name=player_name,
+                                               selected_score_type=random.choice(open_score_types)))
+    for i in range(chat_count):
+        state_manager.process_event(make_event("chat_message", player_name=f"player-{i % player_count}",
+                                               content=f"message {i}", destination="all"))
+    return state_manager
+
+
+@benchmark("score_is_valid_for_roll")
+def setup_score_is_valid_for_roll():
+    """
+    Every score against every possible roll
+    """
+    scores = Scorecard(player=Player("player-0", None, None)).scores
+    rolls = [Roll.from_face_values(face_values) for face_values in product(range(1, 7), repeat=5)]
+
+    def run():
+        for roll in rolls:
+            for score in scores:
+                score.is_valid_for_roll(roll)
+    return run
+
+
+@benchmark("scorecard_to_dict")
+def setup_scorecard_to_dict():
+    scorecard = make_started_game(player_count=1, turn_count=7, chat_count=0).game_engine.scorecards[0]
+    return scorecard.to_dict
+
+
+def setup_publish_current_state(player_count: int, cached: bool = False):
+    """
+    A full snapshot of the room. Every fragment is encoded again each time (as after a change to each of them),
+    unless cached, which times the splicing of fragments that were already encoded (see state/rendering.py).
+    """
+    state_manager = make_started_game(player_count)
+    if cached:
+        return state_manager.publish_current_state
+
+    def run():
+        state_manager._fragments.clear()
+        state_manager.publish_current_state()
+    return run
+
+
+for _player_count in (2, 6, 12):
+    benchmark(f"publish_current_state_{_player_count}_players")(
+        lambda player_count=_player_count: setup_publish_current_state(player_count))
+benchmark("publish_current_state_12_players_cached")(lambda: setup_publish_current_state(12, cached=True))
+
+
+def setup_chat_then_personalized_snapshots(codec=STDLIB_JSON):
+    """
+    A chat message arriving, then a snapshot for every player, which is what a room full of reconnects costs
+    """
+    state_manager = make_started_game(player_count=12, codec=codec)
+    chat_message = make_event("chat_message", player_name="player-0", content="hello", destination="all")
+    player_names = [f"player-{i}" for i in range(12)]
+
+    def run():
+        state_manager.process_event(chat_message)
+        for player_name in player_names:
+            state_manager.publish_current_state(player_name)
+    return run
+
+
+benchmark("chat_then_personalized_snapshots_12_players")(setup_chat_then_personalized_snapshots)
+
+
+@benchmark("binary_encode_snapshot_12_players")
+def setup_binary_encode_snapshot():
+    """
+    Turning a snapshot rendered as JSON into the binary encoding, once per update for all binary clients
+    """
+    codec = BinaryCodec()
+    snapshot = make_started_game(player_count=12).publish_current_state()
+    return lambda: codec.encode(codec.json_codec.decode(snapshot))
+
+
+@benchmark("transcript_get_transcript_10k")
+def setup_transcript_get_transcript():
+    """
+    A message arriving in a full 10,000 line transcript, then the transcript being rendered for an update
+    """
+    transcript = Transcript(max_messages=10000)
+    messages = [Message(make_event("chat_message", player_name=f"player-{i % 6}", content=f"message {i}",
+                                   destination="all")) for i in range(10000)]
+    for message in messages:
+        transcript.add_message(message)
+    next_messages = cycle(messages)
+
+    def run():
+        transcript.add_message(next(next_messages))
+        transcript.get_transcript()
+    return run
+
+
+def setup_event_parsing(codec=STDLIB_JSON):
+    messages = [
+        json.dumps({"type": "rolled_dice", "timestamp": 1700000000000,
+                    "data": {"player_name": "player-0", "dice_to_roll": [1, 3, 5]}}),
+        json.dumps({"type": "chat_message", "timestamp": 1700000000000,
+                    "data": {"player_name": "player-0", "content": "nice roll!", "destination": "all"}}),
+        json.dumps({"type": "score_selected", "timestamp": 1700000000000,
+                    "data": {"player_name": "player-0", "selected_score_type": "chance"}}),
+    ]
+
+    messages = [codec.encode(json.loads(message)) for message in messages]
+
+    def run():
+        for message in messages:
+            Event(message, None, codec=codec)
+    return run
+
+
+benchmark("event_parsing")(setup_event_parsing)
+benchmark("event_parsing_binary")(lambda: setup_event_parsing(BinaryCodec()))
+
+# Only registered with orjson installed (pip install .[fast]), so that they never time the standard library against
+# a baseline recorded with orjson. See test_every_benchmark_has_a_baseline.
+ORJSON_BENCHMARKS = ("chat_then_personalized_snapshots_12_players_orjson", "event_parsing_orjson")
+if orjson is not None:
+    benchmark("chat_then_personalized_snapshots_12_players_orjson")(
+        lambda: setup_chat_then_personalized_snapshots(OrjsonCodec()))
+    benchmark("event_parsing_orjson")(lambda: setup_event_parsing(OrjsonCodec()))
+
+
+def measure(run, repeat: int = 5) -> float:
+    """
+    Seconds per call of run, the best of repeat rounds of enough calls to take at least 0.2s each
+    """
+    timer = timeit.Timer(run)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run_benchmarks(names=None, repeat: int = 5):
+    return {name: measure(setup(), repeat) for name, setup in BENCHMARKS.items() if names is None or name in names}
+
+
+def load_baseline(path: str = BASELINE_PATH):
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(results, path: str = BASELINE_PATH):
+    baseline = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "seconds_per_call": results
+    }
+    with open(path, "w") as baseline_file:
+        json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write("\n")
+    return baseline
+
+
+def compare(results, baseline, threshold: float = DEFAULT_THRESHOLD):
+    """
+    (name, seconds per call, baseline seconds per call, ratio, is a regression) for each result. Benchmarks
+    that aren't in the baseline yet have a ratio of None and are never regressions.
+    """
+    comparisons = []
+    for name, seconds in results.items():
+        baseline_seconds = baseline["seconds_per_call"].get(name)
+        ratio = seconds / baseline_seconds if baseline_seconds else None
+        comparisons.append((name, seconds, baseline_seconds, ratio, ratio is not None and ratio > 1 + threshold))
+    return comparisons
@@ -0,0 +1,33 @@
+import os
+import unittest
+
+from src.app.util.codec import orjson
+from src.tests.benchmarks.benchmarks import BENCHMARKS, ORJSON_BENCHMARKS, compare, load_baseline, run_benchmarks
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_every_benchmark_runs(self):
+        for name, setup in BENCHMARKS.items():
+            with self.subTest(name):
+                setup()()
+
+    def test_every_benchmark_has_a_baseline(self):
+        baseline_names = set(load_baseline()["seconds_per_call"])
+        if orjson is None:
+            baseline_names -= set(ORJSON_BENCHMARKS)
+        self.assertEqual(set(BENCHMARKS), baseline_names)
+
+    def test_compare(self):
+        baseline = {"seconds_per_call": {"fast": 1.0, "slow": 1.0}}
+        comparisons = compare({"fast": 1.1, "slow": 1.5, "new": 1.0}, baseline, threshold=0.25)
+        self.assertEqual([("fast", 1.1, 1.0, 1.1, False), ("slow", 1.5, 1.0, 1.5, True), ("new", 1.0, None, None, False)],
+                         comparisons)
+
+
+@unittest.skipUnless(os.environ.get("RUN_BENCHMARKS"), "timing is only meaningful on the baseline's machine, "
+                                                      "set RUN_BENCHMARKS=1 to run")
+class TestBenchmarkRegressions(unittest.TestCase):
+    def test_no_regressions(self):
+        comparisons = compare(run_benchmarks(), load_baseline())
+        regressions = [f"{name} ({ratio:.2f}x)" for name, _, _, ratio, is_regression in comparisons if is_regression]
+        self.assertEqual([], regressions)
@@ -1,7 +1,9 @@
 from dataclasses import dataclass
 from unittest import main, TestCase
 
-from src.app.engine.entities import Die, FullHouseScore, OnesScore, Roll, SmallStraightScore, ThreeOfAKindScore
+from src.app.engine.entities import Die, FullHouseScore, OnesScore, Roll, Scorecard, ScoreType, SmallStraightScore, \
+    ThreeOfAKindScore, Turn
+from src.app.state.yahtzee.player import Player
 
 @dataclass
 class OneFaceValueDie(Die):
@@ -135,5 +137,92 @@ class TestEntities(TestCase):
 
         self.assertEqual(is_valid_for_roll, False)
 
+    def test_scorecard_totals_are_updated_when_a_score_is_selected(self):
+        scorecard = Scorecard(player=Player(name="Player 1", websocket="foo", joined_at=None))
+        self.assertEqual(0, scorecard.get_grand_total())
+        self.assertEqual(0, scorecard.get_completed_turn_count())
+
+        scorecard.select_score_for_roll(ScoreType.SIXES, Roll([SixFaceValueDie(1), SixFaceValueDie(2), SixFaceValueDie(3), SixFaceValueDie(4), TwoFaceValueDie(5)]))
+        scorecard.select_score_for_roll(ScoreType.FULL_HOUSE, Roll([OneFaceValueDie(1), OneFaceValueDie(2), OneFaceValueDie(3), TwoFaceValueDie(4), TwoFaceValueDie(5)]))
+
+        self.assertEqual(24, scorecard.get_upper_section_score_sum())
+        self.assertEqual(25, scorecard.get_lower_section_total())
+        self.assertEqual(49, scorecard.get_grand_total())
+        self.assertEqual(2, scorecard.get_completed_turn_count())
+
+    def test_scorecard_totals_include_yahtzee_bonus(self):
+        scorecard = Scorecard(player=Player(name="Player 1", websocket="foo", joined_at=None))
+        yahtzee_roll = Roll([ThreeFaceValueDie(1), ThreeFaceValueDie(2), ThreeFaceValueDie(3), ThreeFaceValueDie(4), ThreeFaceValueDie(5)])
+
+        scorecard.select_score_for_roll(ScoreType.YAHTZEE, yahtzee_roll)
+        scorecard.select_score_for_roll(ScoreType.LARGE_STRAIGHT, yahtzee_roll)
+
+        self.assertEqual(100, scorecard.yahtzeebonus)
+        self.assertEqual(50 + 40 + 100, scorecard.get_lower_section_total())
+        self.assertEqual(scorecard.get_lower_section_total(), scorecard.to_dict()["LOWER_TOTAL"])
+
+    def test_roll_stores_face_values_by_die_id(self):
+        roll = Roll([TwoFaceValueDie(2), OneFaceValueDie(1), ThreeFaceValueDie(3), FourFaceValueDie(4), FiveFaceValueDie(5)])
+
+        self.assertEqual(bytes([1, 2, 3, 4, 5]), roll.get_face_values())
+        self.assertEqual(4, roll.get_die_by_id(4).face_value)
+        self.assertEqual([1, 2, 3, 4, 5], [die.face_value for die in roll.dice])
+
+    def test_roll_needs_five_dice_with_valid_face_values(self):
+        with self.assertRaises(ValueError):
+            Roll([Die(1, 3), Die(2, 3)])
+        with self.assertRaises(ValueError):
+            Roll([Die(1, 3), Die(1, 3), Die(3, 3), Die(4, 3), Die(5, 3)])
+        with self.assertRaises(ValueError):
+            Roll([Die(1, 3), Die(2, 3), Die(3, 3), Die(4, 3), Die(6, 3)])
+        with self.assertRaises(ValueError):
+            Roll.from_face_values([1, 2, 3, 4])
+        with self.assertRaises(ValueError):
+            Roll.from_face_values([0, 1, 2, 3, 4])
+        with self.assertRaises(ValueError):
+            Roll.from_face_values([1, 2, 3, 4, 7])
+
+    def test_dice_of_a_roll_are_views_of_it(self):
+        roll = Roll.from_face_values([1, 2, 3, 4, 5])
+        die = roll.get_die_by_id(2)
+        die.face_value = 6
+        self.assertEqual(bytes([1, 6, 3, 4, 5]), roll.get_face_values())
+
+        roll.dice[0].face_value = 7     # Not a face value, ignored like for any other die
+        rolled = roll.dice[4].roll()
+        self.assertEqual(bytes([1, 6, 3, 4, rolled.face_value]), roll.get_face_values())
+
+        roll.roll_selected_dice([roll.get_die_by_id(2)])
+        self.assertEqual(roll.get_face_values()[1], die.face_value)
+
+    def test_selected_score_keeps_its_own_copy_of_the_roll(self):
+        scorecard = Scorecard(player=Player(name="Player 1", websocket="foo", joined_at=None))
+        roll = Roll([OneFaceValueDie(1), OneFaceValueDie(2), OneFaceValueDie(3), TwoFaceValueDie(4), TwoFaceValueDie(5)])
+        scorecard.select_score_for_roll(ScoreType.ONES, roll)
+
+        roll.roll_selected_dice(roll.dice)
+
+        self.assertEqual(bytes([1, 1, 1, 2, 2]), scorecard.get_score(ScoreType.ONES).selected_roll.get_face_values())
+        self.assertEqual(3, scorecard.get_points(ScoreType.ONES))
+        self.assertIsNone(scorecard.get_points(ScoreType.TWOS))
+
+    def test_turn_valid_scores_are_only_scored_again_when_the_roll_or_scorecard_changes(self):
+        player = Player(name="Player 1", websocket="foo", joined_at=None)
+        scorecard = Scorecard(player=player)
+        yahtzee = [OneFaceValueDie(die_id) for die_id in range(1, 6)]
+        turn = Turn(player=player, last_roll=Roll(yahtzee))
+
+        valid_scores = turn.get_valid_scores(scorecard)
+        self.assertEqual(scorecard.get_points_for_roll(turn.last_roll), valid_scores)
+        self.assertIs(valid_scores, turn.get_valid_scores(scorecard))
+
+        # Selecting the yahtzee turns the next yahtzee into a bonus
+        scorecard.select_score_for_roll(ScoreType.YAHTZEE, turn.last_roll)
+        self.assertIsNot(valid_scores, turn.get_valid_scores(scorecard))
+        self.assertEqual(scorecard.get_points_for_roll(turn.last_roll), turn.get_valid_scores(scorecard))
+
+        turn.roll_selected_dice(turn.last_roll.dice)
+        self.assertEqual(scorecard.get_points_for_roll(turn.last_roll), turn.get_valid_scores(scorecard))
+
 if __name__ == '__main__':
     main()
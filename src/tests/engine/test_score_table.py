@@ -0,0 +1,39 @@
+from unittest import main, TestCase
+
+from src.app.engine.entities import Die, ROLL_SCORE_TABLE, Roll, ScoreType
+from src.app.engine.score_table import get_roll_key
+
+
+def make_roll(*face_values):
+    return Roll([Die(die_id, face_value) for die_id, face_value in enumerate(face_values, start=1)])
+
+
+class TestScoreTable(TestCase):
+    def test_table_has_one_row_per_distinct_roll(self):
+        self.assertEqual(252, len(ROLL_SCORE_TABLE))
+
+    def test_roll_key_ignores_dice_order(self):
+        self.assertEqual(get_roll_key([1, 2, 3, 4, 5]), get_roll_key([5, 3, 1, 4, 2]))
+        self.assertNotEqual(get_roll_key([1, 1, 2, 2, 3]), get_roll_key([1, 2, 2, 3, 3]))
+
+    def test_full_house_row(self):
+        roll_scores = ROLL_SCORE_TABLE.lookup(make_roll(2, 5, 2, 5, 5))
+        full_house_column = ROLL_SCORE_TABLE.get_column(ScoreType.FULL_HOUSE)
+        fives_column = ROLL_SCORE_TABLE.get_column(ScoreType.FIVES)
+
+        self.assertTrue(roll_scores.is_valid[full_house_column])
+        self.assertEqual(25, roll_scores.potential_points[full_house_column])
+        self.assertEqual(15, roll_scores.potential_points[fives_column])
+        self.assertFalse(roll_scores.is_yahtzee)
+
+    def test_yahtzee_row_has_joker_points(self):
+        roll_scores = ROLL_SCORE_TABLE.lookup(make_roll(4, 4, 4, 4, 4))
+        large_straight_column = ROLL_SCORE_TABLE.get_column(ScoreType.LARGE_STRAIGHT)
+
+        self.assertTrue(roll_scores.is_yahtzee)
+        self.assertEqual(0, roll_scores.potential_points[large_straight_column])
+        self.assertEqual(40, roll_scores.points[large_straight_column])
+
+
+if __name__ == '__main__':
+    main()
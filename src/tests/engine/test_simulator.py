@@ -0,0 +1,35 @@
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "the simulator needs numpy (pip install numpy)")
+class TestSimulator(unittest.TestCase):
+    def setUp(self):
+        from src.app.engine.simulator import BatchSimulator
+        self.result = BatchSimulator(seed=1234).simulate(500)
+
+    def test_every_score_is_selected_once_per_game(self):
+        for selected_scores in self.result.selected_scores:
+            self.assertEqual(list(range(13)), sorted(selected_scores.tolist()))
+
+    def test_same_seed_gives_same_games(self):
+        from src.app.engine.simulator import BatchSimulator
+        result = BatchSimulator(seed=1234).simulate(500)
+        self.assertTrue((result.grand_total == self.result.grand_total).all())
+
+    def test_simulated_games_score_the_same_in_game_engine(self):
+        from src.app.engine.simulator import cross_check_with_game_engine
+        self.assertEqual([], cross_check_with_game_engine(self.result, list(range(0, 500, 10))))
+
+    def test_cross_check_catches_a_scoring_difference(self):
+        from src.app.engine.simulator import cross_check_with_game_engine
+        self.result.grand_total[3] += 1
+        self.assertEqual([3], cross_check_with_game_engine(self.result, [2, 3, 4]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from src.app.engine.entities import Die, Roll, Scorecard, ScoreType, Turn
+from src.app.state.yahtzee.player import Player
+
+
+@unittest.skipIf(numpy is None, "the solver needs numpy (pip install numpy)")
+class TestSolver(unittest.TestCase):
+    def setUp(self):
+        from src.app.engine.solver import build_strategy_table
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "strategy_table.npy")
+        # Only the last two turns of the game, which is quick to solve
+        self.strategy_table = build_strategy_table(self.path, processes=1, min_selected_score_count=11)
+        self.scorecard = Scorecard(player=Player(name="Player 1", websocket=None, joined_at=None))
+        for score_type in list(ScoreType)[:11]:
+            self.scorecard.select_score_for_roll(score_type, Roll([Die(die_id, 1) for die_id in range(1, 6)]))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_end_of_game_values(self):
+        self.assertEqual(35, self.strategy_table.values[-1, 63])
+        self.assertEqual(0, self.strategy_table.values[-1, 62])
+
+    def test_expected_score(self):
+        current_score = self.scorecard.get_grand_total()
+        expected_score = self.strategy_table.get_expected_score(self.scorecard)
+        # Yahtzee and chance are left: chance alone is worth at least 5 points
+        self.assertGreater(expected_score, current_score + 5)
+
+    def test_best_score_type_for_yahtzee(self):
+        yahtzee_roll = Roll([Die(die_id, 6) for die_id in range(1, 6)])
+        self.assertEqual(ScoreType.YAHTZEE.value, self.strategy_table.get_best_score_type(self.scorecard, yahtzee_roll).value)
+
+    def test_best_keep(self):
+        turn = Turn(player=self.scorecard.player, last_roll=Roll([Die(1, 6), Die(2, 6), Die(3, 6), Die(4, 6), Die(5, 2)]))
+        self.assertEqual([1, 2, 3, 4, 5], self.strategy_table.get_best_keep(self.scorecard, turn).dice_to_roll)
+
+        turn.roll_count = 1
+        self.assertEqual([5], self.strategy_table.get_best_keep(self.scorecard, turn).dice_to_roll)
+
+        turn.roll_count = 3
+        self.assertEqual([], self.strategy_table.get_best_keep(self.scorecard, turn).dice_to_roll)
+
+    def test_build_resumes_from_last_solved_level(self):
+        from src.app.engine.solver import build_strategy_table
+        self.strategy_table.values[0, 0] = 1234
+        self.strategy_table.values.flush()
+
+        strategy_table = build_strategy_table(self.path, processes=1, min_selected_score_count=10)
+
+        self.assertEqual(1234, strategy_table.values[0, 0])
+        self.assertFalse(numpy.isnan(strategy_table.values[0b1111111111000]).any())
+        self.assertFalse(numpy.isnan(strategy_table.values[0b1111111111100]).any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from src.app.engine.entities import Roll, Scorecard, ScoreType, Turn
+from src.app.engine.strategies import GreedyStrategy
+from src.app.state.yahtzee.player import BotPlayer
+
+
+class TestGreedyStrategy(unittest.TestCase):
+    def setUp(self):
+        self.bot = BotPlayer(name="Bot", websocket=None, joined_at=None)
+        self.scorecard = Scorecard(player=self.bot)
+        self.strategy = GreedyStrategy()
+
+    def test_rolls_every_die_at_start_of_turn(self):
+        turn = Turn(player=self.bot)
+        self.assertEqual([1, 2, 3, 4, 5], self.strategy.choose_dice_to_roll(self.scorecard, turn))
+
+    def test_keeps_most_common_face(self):
+        turn = Turn(player=self.bot, last_roll=Roll.from_face_values([2, 5, 5, 3, 2]), roll_count=1)
+        # Ties go to the higher face
+        self.assertEqual([1, 4, 5], self.strategy.choose_dice_to_roll(self.scorecard, turn))
+
+    def test_stops_rolling_after_last_roll(self):
+        turn = Turn(player=self.bot, last_roll=Roll.from_face_values([2, 5, 5, 3, 2]), roll_count=Turn.MAX_ROLL_COUNT)
+        self.assertEqual([], self.strategy.choose_dice_to_roll(self.scorecard, turn))
+
+    def test_selects_highest_scoring_open_score(self):
+        turn = Turn(player=self.bot, last_roll=Roll.from_face_values([6, 6, 6, 6, 6]), roll_count=3)
+        self.assertEqual(ScoreType.YAHTZEE.value, self.strategy.choose_score_type(self.scorecard, turn).value)
+
+        self.scorecard.select_score_for_roll(self.scorecard.scores[11].score_type(), turn.last_roll)
+        # A yahtzee is a joker once the yahtzee score is taken
+        self.assertEqual(ScoreType.LARGE_STRAIGHT.value, self.strategy.choose_score_type(self.scorecard, turn).value)
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import unittest
+
+import websockets
+
+from src.app.events.backplane import BackplaneHub, InProcessBackplane, RoomUpdate, SocketBackplane
+from src.app.events.event_broker import EventBroker
+from src.app.util.config import Config
+
+
+class TestInProcessBackplane(unittest.TestCase):
+    def test_delivers_to_the_room_subscribers(self):
+        backplane = InProcessBackplane()
+        delivered = []
+
+        def deliver(room_id, updates):
+            delivered.extend((room_id, update.payload) for update in updates)
+
+        backplane.subscribe("table-1", deliver)
+        backplane.publish("table-1", RoomUpdate("first"))
+        backplane.publish("table-2", RoomUpdate("elsewhere"))
+        backplane.unsubscribe("table-1", deliver)
+        backplane.publish("table-1", RoomUpdate("after unsubscribing"))
+        self.assertEqual([("table-1", "first")], delivered)
+        self.assertEqual({}, backplane.subscribers)
+
+
+class TestSocketBackplane(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.hub = await BackplaneHub("127.0.0.1", 0).start()
+        port = self.hub.server.sockets[0].getsockname()[1]
+        self.publisher = await SocketBackplane("127.0.0.1", port, max_coalesced_updates=3).start()
+        self.subscriber = await SocketBackplane("127.0.0.1", port).start()
+        await self.wait_for(lambda: self.publisher.writer is not None and self.subscriber.writer is not None)
+        # Only the owner of a room publishes its updates
+        self.assertTrue(await self.publisher.claim("table-1"))
+        self.assertFalse(await self.subscriber.claim("table-1"))
+        self.local_deliveries, self.remote_deliveries = [], []
+        self.publisher.subscribe("table-1", lambda room_id, updates: self.local_deliveries.append(updates))
+        self.subscriber.subscribe("table-1", lambda room_id, updates: self.remote_deliveries.append(updates))
+        await self.wait_for(lambda: len(self.hub.subscriptions) == 2
+                            and all(room_ids for room_ids in self.hub.subscriptions.values()))
+
+    async def asyncTearDown(self):
+        await self.publisher.close()
+        await self.subscriber.close()
+        await self.hub.close()
+
+    async def wait_for(self, condition):
+        for _ in range(200):
+            if condition():
+                return
+            await asyncio.sleep(0.01)
+        self.fail("Timed out")
+
+    async def test_updates_are_batched_per_room(self):
+        self.publisher.publish("table-1", RoomUpdate("delta 1"))
+        self.publisher.publish("table-1", RoomUpdate("delta 2", {"alice": "delta 2 for alice"}))
+        self.publisher.publish("table-2", RoomUpdate("nobody else is in this room"))
+        # Delivered to this node's players straight away
+        self.assertEqual([["delta 1"], ["delta 2"]], [[update.payload for update in updates]
+                                                      for updates in self.local_deliveries])
+
+        await self.wait_for(lambda: self.remote_deliveries)
+        await asyncio.sleep(0.05)
+        self.assertEqual(1, len(self.remote_deliveries))
+        self.assertEqual(["delta 1", "delta 2"], [update.payload for update in self.remote_deliveries[0]])
+        self.assertEqual({"alice": "delta 2 for alice"}, self.remote_deliveries[0][1].recipient_payloads)
+
+    async def test_too_many_updates_are_sent_as_a_snapshot(self):
+        for i in range(5):
+            self.publisher.publish("table-1", RoomUpdate(f"delta {i}", get_latest_state=lambda: "snapshot"))
+        await self.wait_for(lambda: self.remote_deliveries)
+        self.assertEqual(["snapshot"], [update.payload for update in self.remote_deliveries[0]])
+
+    async def test_closing_the_hub_disconnects_the_nodes(self):
+        await self.hub.close()
+        self.assertEqual({}, self.hub.node_tasks)
+        await self.wait_for(lambda: self.publisher.writer is None and self.subscriber.writer is None)
+
+
+class TestRoomOwnership(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.hub = await BackplaneHub("127.0.0.1", 0).start()
+        self.brokers, self.servers = [], []
+        for _ in range(2):
+            config = Config()
+            config.EVENT_LOG_DIRECTORY = None
+            config.BACKPLANE = "socket"
+            config.BACKPLANE_PORT = self.hub.server.sockets[0].getsockname()[1]
+            config.UPDATE_INTERVAL = 0
+            config.BOT_MOVE_DELAY = 0.01
+            broker = EventBroker(config)
+            await broker.backplane.start(broker)
+            self.brokers.append(broker)
+            self.servers.append(await websockets.serve(broker.broker, "127.0.0.1", 0))
+        for _ in range(200):
+            if all(broker.backplane.writer is not None for broker in self.brokers):
+                break
+            await asyncio.sleep(0.01)
+        self.clients = []
+
+    async def asyncTearDown(self):
+        for client in self.clients:
+            await client.close()
+        for server, broker in zip(self.servers, self.brokers):
+            server.close()
+            await server.wait_closed()
+            await broker.backplane.close()
+        await self.hub.close()
+
+    async def connect(self, node: int, player_name: str):
+        port = self.servers[node].sockets[0].getsockname()[1]
+        client = await websockets.connect(f"ws://127.0.0.1:{port}/table-1")
+        self.clients.append(client)
+        await self.receive(client)
+        await self.send(client, "player_joined", player_name=player_name)
+        return client
+
+    @staticmethod
+    async def send(client, event_type: str, **data):
+        await client.send(json.dumps({"timestamp": 1626828897580, "type": event_type, "data": data}))
+
+    @staticmethod
+    async def receive(client, condition=lambda update: True):
+        while True:
+            update = json.loads(await asyncio.wait_for(client.recv(), 5))
+            if condition(update):
+                return update
+
+    async def test_only_the_owner_keeps_the_room(self):
+        alice = await self.connect(0, "Alice")
+        await self.receive(alice, lambda update: "Alice" in update["data"].get("players", []))
+        bob = await self.connect(1, "Bob")
+        for client in (alice, bob):
+            players = (await self.receive(client, lambda update: "Bob" in update["data"].get("players", [])))["data"]["players"]
+            self.assertEqual(["Alice", "Bob"], players)
+        self.assertIn("table-1", self.brokers[0].rooms.rooms)
+        self.assertNotIn("table-1", self.brokers[1].rooms.rooms)
+
+        # Bob's private message goes through the owner, and comes back to him as his own update
+        await self.send(bob, "chat_message", player_name="Bob", content="psst", destination="Alice")
+        updates = [await self.receive(client, lambda update: "private_transcripts" in update["data"]) for client in (alice, bob)]
+        self.assertEqual(updates[0]["version"], updates[1]["version"])
+        self.assertIn("Alice/Bob", updates[0]["data"]["private_transcripts"])
+        self.assertIn("Bob/Alice", updates[1]["data"]["private_transcripts"])
+
+        # A resync is answered by the owner, with the player's own view of the room
+        await self.send(bob, "resync_requested", player_name="Bob")
+        snapshot = await self.receive(bob, lambda update: update["type"] == "game_state_update")
+        self.assertEqual(updates[1]["version"], snapshot["version"])
+        self.assertIn("Bob/Alice", snapshot["data"]["private_transcripts"])
+
+        await bob.close()
+        players = (await self.receive(alice, lambda update: "players" in update["data"]))["data"]["players"]
+        self.assertEqual(["Alice"], players)
+        self.assertEqual({}, self.brokers[1].remote_rooms)
+
+    async def test_players_reconnect_when_the_owner_lets_go(self):
+        await self.connect(0, "Alice")
+        bob = await self.connect(1, "Bob")
+        await self.receive(bob, lambda update: "Bob" in update["data"].get("players", []))
+        self.brokers[0].backplane.release("table-1")
+        with self.assertRaises(websockets.ConnectionClosed):
+            await self.receive(bob)
+        self.assertEqual(1012, bob.close_code)
+
+    async def test_players_of_a_node_that_goes_away_leave(self):
+        alice = await self.connect(0, "Alice")
+        await self.connect(1, "Bob")
+        await self.receive(alice, lambda update: "Bob" in update["data"].get("players", []))
+        await self.brokers[1].backplane.close()
+        players = (await self.receive(alice, lambda update: "Bob" not in update["data"].get("players", ["Bob"])))["data"]["players"]
+        self.assertEqual(["Alice"], players)
+        self.assertEqual(set(), self.brokers[0].rooms.rooms["table-1"].remote_connections)
+
+    async def test_bots_play_for_players_on_another_node(self):
+        bob = await self.connect(0, "Bob")
+        alice = await self.connect(1, "Alice")
+        await self.receive(alice, lambda update: "Alice" in update["data"].get("players", []))
+        # Nobody is connected to the node that owns the room anymore
+        await bob.close()
+        await self.receive(alice, lambda update: update["data"].get("players") == ["Alice"])
+        await self.send(alice, "bot_added", player_name="Alice", bot_name="Robot")
+        await self.send(alice, "game_started", player_name="Alice")
+        await self.receive(alice, lambda update: (update["data"].get("current_turn") or {}).get("player") == "Alice")
+        await self.send(alice, "rolled_dice", player_name="Alice", dice_to_roll=[1, 2, 3, 4, 5])
+        await self.send(alice, "score_selected", player_name="Alice", selected_score_type="chance")
+        await self.receive(alice, lambda update: (update["data"].get("current_turn") or {}).get("player") == "Robot"
+                           and update["data"]["current_turn"]["roll_count"] > 0)
+        self.assertEqual(set(), self.brokers[0].rooms.rooms["table-1"].connections)
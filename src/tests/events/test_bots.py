@@ -0,0 +1,64 @@
+import asyncio
+import json
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from src.app.engine.strategies import GreedyStrategy
+from src.app.events.bots import BotBudget, BotController
+from src.app.events.event import Event
+from src.app.events.room import Room
+
+
+class TestBotBudget(unittest.TestCase):
+    def test_waits_once_budget_is_spent(self):
+        budget = BotBudget(cpu_seconds_per_minute=6)
+        self.assertEqual(0, budget.get_wait_time(now=budget.last_refill))
+
+        budget.charge(7, now=budget.last_refill)
+        # 1 second over budget, refilling at 0.1 CPU seconds per second
+        self.assertAlmostEqual(10, budget.get_wait_time(now=budget.last_refill))
+        self.assertEqual(0, budget.get_wait_time(now=budget.last_refill + 10))
+
+
+class TestBotController(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.room = Room("bots")
+        self.room.connections.add("foo")
+        self.updates = []
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.bots = BotController({"greedy": GreedyStrategy()}, self.executor, self.send_game_state_update,
+                                  move_delay=0, cpu_seconds_per_minute=60)
+        state_manager = self.room.state_manager
+        state_manager.process_event(Event('{"timestamp":1626828897580,"type":"player_joined","data":{"player_name":"Player 1"}}', "foo"))
+        state_manager.process_event(Event('{"timestamp":1626828897580,"type":"bot_added",'
+                                          '"data":{"player_name":"Player 1","bot_name":"Bot","strategy":"greedy"}}', "foo"))
+        state_manager.process_event(Event('{"timestamp":1626828897580,"type":"game_started","data":{"player_name":"Player 1"}}', "foo"))
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    async def send_game_state_update(self, room):
+        self.updates.append(json.loads(room.state_manager.publish_state_delta()))
+
+    async def test_bot_plays_its_turn_off_the_event_loop(self):
+        game_engine = self.room.state_manager.game_engine
+        self.assertEqual("Player 1", game_engine.current_turn.player.name)
+        self.bots.schedule(self.room)
+        self.assertIsNone(self.room.bot_task)
+
+        game_engine.select_score_for_roll("CHANCE")
+        self.assertEqual("Bot", game_engine.current_turn.player.name)
+        self.bots.schedule(self.room)
+        await asyncio.wait_for(self.room.bot_task, timeout=5)
+
+        self.assertEqual("Player 1", game_engine.current_turn.player.name)
+        self.assertEqual(1, game_engine.scorecards[1].get_completed_turn_count())
+        self.assertEqual("game_state_delta", self.updates[-1]["type"])
+        self.assertIn("Bot", self.updates[-1]["data"]["scorecards"])
+
+    async def test_bot_stops_when_room_is_empty(self):
+        self.room.connections.clear()
+        self.room.state_manager.game_engine.select_score_for_roll("CHANCE")
+        self.bots.schedule(self.room)
+        await asyncio.wait_for(self.room.bot_task, timeout=5)
+        self.assertEqual(0, self.room.state_manager.game_engine.scorecards[1].get_completed_turn_count())
@@ -0,0 +1,101 @@
+import asyncio
+import unittest
+
+from src.app.events.broadcast import BROADCAST_BYTES, Broadcaster, ClientConnection
+from src.app.util.codec import BinaryCodec
+
+
+class FakeWebsocket:
+    def __init__(self, blocked=False):
+        self.sent = []
+        self.close_code = None
+        self.unblocked = asyncio.Event()
+        if not blocked:
+            self.unblocked.set()
+
+    async def send(self, payload):
+        await self.unblocked.wait()
+        self.sent.append(payload)
+
+    async def close(self, code=1000, reason=""):
+        self.close_code = code
+
+
+class TestBroadcast(unittest.IsolatedAsyncioTestCase):
+    async def test_broadcast_sends_same_payload_to_every_connection(self):
+        connections = [ClientConnection(FakeWebsocket(), queue_size=4).start() for i in range(3)]
+        Broadcaster().broadcast(connections, "update 1")
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        for connection in connections:
+            self.assertEqual(["update 1"], connection.websocket.sent)
+            await connection.close()
+
+    async def test_broadcast_sends_recipient_payloads(self):
+        connections = {name: ClientConnection(FakeWebsocket(), queue_size=4).start() for name in ("a", "b", "c")}
+        recipients = {connection: name for name, connection in connections.items()}
+        Broadcaster().broadcast(connections.values(), "update 1", get_recipient=recipients.get,
+                                recipient_payloads={"a": "update 1 for a", "b": "update 1 for b"})
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        self.assertEqual(["update 1 for a"], connections["a"].websocket.sent)
+        self.assertEqual(["update 1 for b"], connections["b"].websocket.sent)
+        self.assertEqual(["update 1"], connections["c"].websocket.sent)
+        for connection in connections.values():
+            await connection.close()
+
+    async def test_slow_connection_does_not_block_others(self):
+        slow_connection = ClientConnection(FakeWebsocket(blocked=True), queue_size=2).start()
+        fast_connection = ClientConnection(FakeWebsocket(), queue_size=2).start()
+        broadcaster = Broadcaster()
+        latest_state_calls = []
+
+        def get_latest_state():
+            latest_state_calls.append(1)
+            return "snapshot"
+
+        for i in range(5):
+            broadcaster.broadcast([slow_connection, fast_connection], f"update {i}", get_latest_state)
+            await asyncio.sleep(0)
+
+        self.assertEqual([f"update {i}" for i in range(5)], fast_connection.websocket.sent)
+        self.assertEqual([], slow_connection.websocket.sent)
+        self.assertLessEqual(slow_connection.get_queue_depth(), 2)
+        self.assertGreater(slow_connection.coalesced_count, 0)
+
+        slow_connection.websocket.unblocked.set()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        self.assertIn("snapshot", slow_connection.websocket.sent)
+        self.assertEqual("update 4", slow_connection.websocket.sent[-1])
+        await slow_connection.close()
+        await fast_connection.close()
+
+    async def test_broadcast_bytes_are_counted_as_encoded(self):
+        payload = '{"type": "game_state_delta", "version": 3, "data": {"game_started": true}}'
+        binary_codec = BinaryCodec()
+        connections = [ClientConnection(FakeWebsocket(), queue_size=4),
+                       ClientConnection(FakeWebsocket(), queue_size=4, codec=binary_codec)]
+        broadcast_bytes = BROADCAST_BYTES.get()
+        Broadcaster().broadcast(connections, payload)
+        self.assertEqual(len(payload) + len(binary_codec.encode_update(payload)), BROADCAST_BYTES.get() - broadcast_bytes)
+
+    async def test_try_enqueue_leaves_a_full_queue_alone(self):
+        connection = ClientConnection(FakeWebsocket(blocked=True), queue_size=2)
+        connection.enqueue("update 1")
+        self.assertTrue(connection.try_enqueue("dropped 1"))
+        self.assertFalse(connection.try_enqueue("dropped 2"))
+        self.assertEqual(0, connection.coalesced_count)
+        self.assertEqual(["update 1", "dropped 1"], [connection.outbound.get_nowait() for _ in range(2)])
+
+    async def test_connection_that_takes_too_long_to_send_is_closed(self):
+        connection = ClientConnection(FakeWebsocket(blocked=True), queue_size=2, send_timeout=0.01).start()
+        connection.enqueue("update 1")
+        await asyncio.wait_for(connection.writer, 1)
+        self.assertEqual(1008, connection.websocket.close_code)
+        self.assertEqual([], connection.websocket.sent)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,41 @@
+import unittest
+
+from src.app.events.event import Event, EventType
+
+
+class TestEventDecoding(unittest.TestCase):
+    def test_valid_event(self):
+        event = Event('{"timestamp":1626828897580,"type":"player_joined","data":{"player_name":"Player 1"}}', websocket="foo")
+        self.assertTrue(event.is_valid)
+        self.assertEqual(EventType.PLAYER_JOINED, event.event_type)
+        self.assertEqual("player_joined", event.type)
+        self.assertEqual({"player_name": "Player 1"}, event.data)
+        self.assertEqual("2021-07-20 20:54:57", event.timestamp_est)
+
+    def test_rejects_malformed_messages(self):
+        for message in ['not json', '[1, 2]', '{"type":"shout","timestamp":1626828897580,"data":{"player_name":"a"}}',
+                        '{"type":"chat_message","data":{"player_name":"Player 1","content":"Hello","destination":"all"}}',
+                        '{"type":"chat_message","timestamp":1626828897580,"data":{"player_name":"Player 1","content":"Hello"}}',
+                        '{"type":"rolled_dice","timestamp":1626828897580,"data":{"player_name":"Player 1","dice_to_roll":1}}',
+                        '{"type":"rolled_dice","timestamp":1626828897580,"data":{"player_name":"Player 1","dice_to_roll":["x"]}}',
+                        '{"type":"rolled_dice","timestamp":1626828897580,"data":{"player_name":"Player 1","dice_to_roll":[0,6]}}',
+                        '{"type":"rolled_dice","timestamp":1626828897580,"data":{"player_name":"Player 1","dice_to_roll":[true]}}']:
+            self.assertFalse(Event(message, websocket="foo").is_valid, message)
+
+    def test_invalid_event_keeps_type_and_timestamp(self):
+        # The broker's own player_left message has no data, and is transcribed anyway
+        event = Event('{"timestamp":1626829899580,"type":"player_left","data":{}}', websocket="foo")
+        self.assertFalse(event.is_valid)
+        self.assertEqual("player_left", event.type)
+        self.assertEqual("2021-07-20 21:11:39", event.timestamp_est)
+
+    def test_rejects_fields_over_the_maximum_length(self):
+        message = '{"timestamp":1626828901443,"type":"chat_message","data":{"player_name":"Player 1","content":"%s","destination":"all"}}'
+        self.assertTrue(Event(message % ("x" * 10), websocket="foo", max_field_length=10).is_valid)
+        self.assertFalse(Event(message % ("x" * 11), websocket="foo", max_field_length=10).is_valid)
+        self.assertTrue(Event(message % ("x" * 11), websocket="foo").is_valid)
+
+
 """
 import unittest
 from src.app.events.event import Event
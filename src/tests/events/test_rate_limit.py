@@ -0,0 +1,54 @@
+import json
+import unittest
+
+from src.app.events.event import Event
+from src.app.events.event_broker import EventBroker
+from src.app.events.rate_limit import TokenBucket
+from src.app.events.room import Room
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_allows_bursts_then_the_rate(self):
+        bucket = TokenBucket(rate=2, burst=3)
+        now = bucket.last_refill
+        self.assertEqual([True, True, True, False], [bucket.try_take(now=now) for _ in range(4)])
+        # Two tokens a second
+        self.assertFalse(bucket.try_take(now=now + 0.25))
+        self.assertTrue(bucket.try_take(now=now + 0.5))
+        self.assertFalse(bucket.try_take(now=now + 0.5))
+        # Never more than the burst, however long it has been
+        self.assertEqual([True, True, True, False], [bucket.try_take(now=now + 100) for _ in range(4)])
+
+    def test_no_rate_allows_everything(self):
+        bucket = TokenBucket(rate=0, burst=1)
+        self.assertTrue(all(bucket.try_take() for _ in range(100)))
+
+
+class TestEventRateLimits(unittest.TestCase):
+    def setUp(self):
+        self.room = Room("limits")
+        self.room.rate_limit = TokenBucket(rate=1, burst=3)
+        self.rate_limit = TokenBucket(rate=1, burst=2)
+        self.gameplay_rate_limit = TokenBucket(rate=1, burst=5)
+
+    def take(self, event_type: str, **data):
+        event = Event(json.dumps({"timestamp": 1626828897580, "type": event_type,
+                                  "data": {"player_name": "Player 1", **data}}), "foo")
+        return EventBroker.take_rate_limit(event, self.room, self.rate_limit, self.gameplay_rate_limit)
+
+    def test_chat_can_not_hold_up_gameplay(self):
+        chat = [self.take("chat_message", content="spam", destination="all") for _ in range(3)]
+        self.assertEqual([None, None, "connection"], chat)
+        self.assertEqual([None] * 5 + ["gameplay"], [self.take("rolled_dice", dice_to_roll=[1]) for _ in range(6)])
+
+    def test_chat_from_the_whole_room_is_limited(self):
+        other_connection = TokenBucket(rate=1, burst=2)
+        self.take("chat_message", content="hi", destination="all")
+        self.take("chat_message", content="hi", destination="all")
+        self.rate_limit = other_connection
+        self.assertEqual([None, "room"], [self.take("chat_message", content="hi", destination="all") for _ in range(2)])
+        self.assertIsNone(self.take("resync_requested"))
+
+
+if __name__ == '__main__':
+    unittest.main()
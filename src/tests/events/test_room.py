@@ -0,0 +1,43 @@
+import unittest
+
+from src.app.events.room import DEFAULT_ROOM_ID, Room, RoomRegistry
+
+
+class TestRoomRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = RoomRegistry(idle_timeout=300)
+
+    def test_parse_room_id(self):
+        self.assertEqual(DEFAULT_ROOM_ID, RoomRegistry.parse_room_id("/"))
+        self.assertEqual(DEFAULT_ROOM_ID, RoomRegistry.parse_room_id(""))
+        self.assertEqual("table-1", RoomRegistry.parse_room_id("/table-1"))
+        self.assertEqual("table-1", RoomRegistry.parse_room_id("/table-1/?spectate=true"))
+        self.assertIsNone(RoomRegistry.parse_room_id("/../etc/passwd"))
+
+    def test_get_room_creates_separate_rooms(self):
+        room_1 = self.registry.get_room("table-1")
+        room_2 = self.registry.get_room("table-2")
+        self.assertIs(room_1, self.registry.get_room("table-1"))
+        self.assertIsNot(room_1.state_manager, room_2.state_manager)
+        self.assertIsNot(room_1.state_manager.game_engine, room_2.state_manager.game_engine)
+        self.assertEqual(2, len(self.registry))
+
+    def test_evict_idle_rooms(self):
+        empty_room = self.registry.get_room("empty")
+        busy_room = self.registry.get_room("busy")
+        busy_room.connections.add("foo")
+
+        evicted = self.registry.evict_idle_rooms(now=empty_room.last_active + 301)
+
+        self.assertEqual(["empty"], evicted)
+        self.assertNotIn("empty", self.registry.rooms)
+        self.assertIn("busy", self.registry.rooms)
+
+    def test_recently_active_room_is_not_evicted(self):
+        room = self.registry.get_room("recent")
+        self.assertEqual([], self.registry.evict_idle_rooms(now=room.last_active + 10))
+        self.assertIsInstance(self.registry.rooms["recent"], Room)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import select
+import socket
+import unittest
+from multiprocessing.reduction import recvfds
+
+from src.app.events.supervisor import Supervisor, Worker, get_worker_index, parse_request_path
+
+
+class TestSupervisor(unittest.TestCase):
+    def test_get_worker_index(self):
+        room_ids = [f"table-{i}" for i in range(1000)]
+        indices = [get_worker_index(room_id, 4) for room_id in room_ids]
+        self.assertEqual(indices, [get_worker_index(room_id, 4) for room_id in room_ids])
+        self.assertEqual({0, 1, 2, 3}, set(indices))
+        # Adding a worker only moves rooms to the new worker
+        for room_id, index in zip(room_ids, indices):
+            self.assertIn(get_worker_index(room_id, 5), (index, 4))
+
+    def test_parse_request_path(self):
+        self.assertEqual("/table-1", parse_request_path(b"GET /table-1 HTTP/1.1\r\nHost: localhost\r\n"))
+        self.assertEqual("", parse_request_path(b"\r\n"))
+        self.assertIsNone(parse_request_path(b"GET /table-1 HT"))
+
+    def test_hands_connection_to_the_worker_for_its_room(self):
+        supervisor = Supervisor(config=None, run_worker=None)
+        channels = [socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM) for _ in range(3)]
+        supervisor.workers = [Worker(index, None, supervisor_channel)
+                              for index, (supervisor_channel, _) in enumerate(channels)]
+        listener = socket.create_server(("127.0.0.1", 0))
+        client = socket.create_connection(listener.getsockname())
+        try:
+            supervisor.accept(listener)
+            connection = next(iter(supervisor.pending))
+
+            client.sendall(b"GET /table-1 HT")
+            select.select([connection], [], [], 1)
+            supervisor.route(connection)
+            self.assertIn(connection, supervisor.incomplete)
+
+            client.sendall(b"TP/1.1\r\n\r\n")
+            select.select([connection], [], [], 1)
+            supervisor.route(connection)
+            self.assertEqual({}, supervisor.pending)
+            self.assertEqual(set(), supervisor.incomplete)
+
+            worker_channel = channels[get_worker_index("table-1", 3)][1]
+            file_descriptor, = recvfds(worker_channel, 1)
+            with socket.socket(fileno=file_descriptor) as handed_off:
+                # Nothing was read from the connection, the worker gets the whole request
+                self.assertEqual(b"GET /table-1 HTTP/1.1\r\n\r\n", handed_off.recv(1024))
+        finally:
+            client.close()
+            listener.close()
+            for supervisor_channel, worker_channel in channels:
+                supervisor_channel.close()
+                worker_channel.close()
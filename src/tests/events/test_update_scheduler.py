@@ -0,0 +1,72 @@
+import asyncio
+import json
+import unittest
+
+from src.app.events.event import Event
+from src.app.events.room import Room
+from src.app.events.update_scheduler import UpdateScheduler
+
+
+class TestUpdateScheduler(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.room = Room("scheduler")
+        self.room.process_event(Event('{"timestamp":1626828897580,"type":"player_joined","data":{"player_name":"Player 1"}}', "foo"))
+        self.room.process_event(Event('{"timestamp":1626828897580,"type":"player_joined","data":{"player_name":"Player 2"}}', "bar"))
+        self.room.process_event(Event('{"timestamp":1626828897580,"type":"game_started","data":{"player_name":"Player 1"}}', "foo"))
+        # Joining and starting need a full snapshot, the updates from here on are deltas
+        self.room.state_manager.publish_state_delta()
+        self.updates = []
+        self.scheduler = UpdateScheduler(self.send_game_state_update, interval=0.01, batched_event_types=["chat_message"])
+
+    async def send_game_state_update(self, room):
+        self.updates.append(json.loads(room.state_manager.publish_state_delta()))
+
+    async def process(self, message: str):
+        event = Event(message, "foo")
+        self.room.process_event(event)
+        await self.scheduler.event_processed(self.room, event)
+
+    async def chat(self, content: str):
+        await self.process('{"timestamp":1626828901443,"type":"chat_message",'
+                           f'"data":{{"player_name":"Player 1","content":"{content}","destination":"all"}}}}')
+
+    async def test_chat_messages_are_sent_together_on_the_next_tick(self):
+        for i in range(50):
+            await self.chat(f"message {i}")
+        self.assertEqual([], self.updates)
+        self.assertTrue(self.scheduler.is_pending(self.room))
+
+        await asyncio.sleep(0.05)
+        self.assertEqual(1, len(self.updates))
+        self.assertEqual(50, len(self.updates[0]["data"]["chat_transcript"]))
+        self.assertFalse(self.scheduler.is_pending(self.room))
+
+    async def test_gameplay_events_are_sent_straight_away_with_the_pending_chat(self):
+        await self.chat("good luck")
+        await self.process('{"timestamp":1626828897580,"type":"rolled_dice","data":{"player_name":"Player 1","dice_to_roll":[1,2,3,4,5]}}')
+        self.assertEqual(1, len(self.updates))
+        self.assertEqual(1, self.updates[0]["data"]["current_turn"]["roll_count"])
+        self.assertIn("Player 1: good luck", self.updates[0]["data"]["chat_transcript"][0])
+        self.assertFalse(self.scheduler.is_pending(self.room))
+
+        # The tick that was scheduled for the chat doesn't send another update
+        await asyncio.sleep(0.05)
+        self.assertEqual(1, len(self.updates))
+
+    async def test_flush_pending_only_sends_waiting_updates(self):
+        await self.scheduler.flush_pending(self.room)
+        self.assertEqual([], self.updates)
+
+        await self.chat("hello")
+        await self.scheduler.flush_pending(self.room)
+        self.assertEqual(1, len(self.updates))
+
+    async def test_no_interval_sends_every_update(self):
+        self.scheduler.interval = 0
+        await self.chat("hello")
+        await self.chat("again")
+        self.assertEqual(2, len(self.updates))
+
+
+if __name__ == '__main__':
+    unittest.main()
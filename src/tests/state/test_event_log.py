@@ -0,0 +1,136 @@
+import glob
+import os
+import tempfile
+import unittest
+
+from src.app.events.event import Event
+from src.app.events.room import RoomRegistry
+from src.app.state.event_log import EventLog
+
+
+def create_event(event_type, data):
+    return '{"timestamp":1626828897580,"type":"%s","data":%s}' % (event_type, data)
+
+
+class TestEventLog(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.event_log = EventLog(self.directory.name)
+        self.rooms = RoomRegistry(idle_timeout=300, event_log=self.event_log)
+
+    def tearDown(self):
+        self.event_log.close()
+        self.directory.cleanup()
+
+    def play(self, room_id, event_type, data, websocket="foo"):
+        self.rooms.get_room(room_id).process_event(Event(create_event(event_type, data), websocket))
+
+    def recover(self):
+        event_log = EventLog(self.directory.name)
+        rooms = RoomRegistry(idle_timeout=300, event_log=event_log)
+        event_log.recover(rooms)
+        event_log.close()
+        return event_log, rooms
+
+    def assertSameRooms(self, expected, actual):
+        self.assertEqual(sorted(expected.rooms), sorted(actual.rooms))
+        for room_id, room in expected.rooms.items():
+            self.assertEqual(room.state_manager.to_snapshot(), actual.rooms[room_id].state_manager.to_snapshot())
+
+    async def test_recover_replays_events_after_snapshot(self):
+        self.play("table-1", "player_joined", '{"player_name":"Player 1"}', websocket="foo")
+        self.play("table-1", "player_joined", '{"player_name":"Player 2"}', websocket="bar")
+        self.play("table-1", "game_started", '{"player_name":"Player 1"}')
+        self.play("table-1", "rolled_dice", '{"player_name":"Player 1","dice_to_roll":[1,2,3]}')
+        await self.event_log.write_snapshot(self.rooms)
+        self.assertEqual([], glob.glob(os.path.join(self.directory.name, "events-*.log")))
+
+        self.play("table-1", "score_selected", '{"player_name":"Player 1","selected_score_type":"chance"}')
+        self.play("table-1", "chat_message", '{"player_name":"Player 2","destination":"Player 1","content":"hi"}')
+        self.play("table-1", "player_left", '{}', websocket="bar")
+        self.play("table-2", "player_joined", '{"player_name":"Player 3"}', websocket="baz")
+        await self.event_log.flush()
+
+        event_log, rooms = self.recover()
+        self.assertSameRooms(self.rooms, rooms)
+        self.assertEqual(self.event_log.sequence, event_log.sequence)
+        game_engine = rooms.get_room("table-1").state_manager.game_engine
+        self.assertEqual("Player 2", game_engine.current_turn.player.name)
+        self.assertEqual(["Player 1"], rooms.get_room("table-1").state_manager.get_connected_players())
+
+    async def test_recovered_rolls_match_the_transcript(self):
+        self.play("table-1", "player_joined", '{"player_name":"Player 1"}', websocket="foo")
+        self.play("table-1", "game_started", '{"player_name":"Player 1"}')
+        self.play("table-1", "rolled_dice", '{"player_name":"Player 1","dice_to_roll":[1,2,3,4,5]}')
+        self.play("table-1", "rolled_dice", '{"player_name":"Player 1","dice_to_roll":[1,2]}')
+        await self.event_log.flush()
+
+        event_log, rooms = self.recover()
+        expected, recovered = self.rooms.get_room("table-1").state_manager, rooms.get_room("table-1").state_manager
+        self.assertEqual(expected.game_transcript.get_transcript(), recovered.game_transcript.get_transcript())
+        self.assertEqual(expected.game_engine.current_turn.last_roll, recovered.game_engine.current_turn.last_roll)
+        self.assertEqual(2, recovered.game_engine.current_turn.roll_count)
+
+    async def test_recovered_turn_stays_with_the_same_seat(self):
+        # The two "Player 2"s are equal Players, only their seats tell them apart
+        self.play("table-1", "player_joined", '{"player_name":"Player 1"}', websocket="foo")
+        self.play("table-1", "player_joined", '{"player_name":"Player 2"}', websocket="bar")
+        self.play("table-1", "player_joined", '{"player_name":"Player 2"}', websocket="bar")
+        self.play("table-1", "game_started", '{"player_name":"Player 1"}')
+        self.play("table-1", "score_selected", '{"player_name":"Player 1","selected_score_type":"chance"}')
+        self.play("table-1", "score_selected", '{"player_name":"Player 2","selected_score_type":"chance"}')
+        game_engine = self.rooms.get_room("table-1").state_manager.game_engine
+        self.assertIs(game_engine.scorecards[2], game_engine.current_scorecard)
+        await self.event_log.write_snapshot(self.rooms)
+
+        event_log, rooms = self.recover()
+        self.assertSameRooms(self.rooms, rooms)
+        recovered = rooms.get_room("table-1").state_manager.game_engine
+        self.assertIs(recovered.scorecards[2], recovered.current_scorecard)
+        self.assertIs(recovered.scorecards[2].player, recovered.current_turn.player)
+
+    async def test_reconnecting_player_takes_their_recovered_seat(self):
+        self.play("table-1", "player_joined", '{"player_name":"Player 1"}', websocket="foo")
+        self.play("table-1", "player_joined", '{"player_name":"Player 2"}', websocket="bar")
+        self.play("table-1", "game_started", '{"player_name":"Player 1"}')
+        self.play("table-1", "score_selected", '{"player_name":"Player 1","selected_score_type":"chance"}')
+        await self.event_log.flush()
+
+        event_log, rooms = self.recover()
+        room = rooms.get_room("table-1")
+        game_engine = room.state_manager.game_engine
+        self.assertEqual(["Player 1", "Player 2"], [player.name for player in room.state_manager.get_recovered_players()])
+
+        room.process_event(Event(create_event("player_joined", '{"player_name":"Player 2"}'), "new-bar"))
+        self.assertIs(game_engine, room.state_manager.game_engine)
+        self.assertEqual(["Player 1", "Player 2"], room.state_manager.get_connected_players())
+        self.assertEqual("Player 2", room.state_manager.get_player_name("new-bar"))
+        self.assertEqual(["Player 1"], [player.name for player in room.state_manager.get_recovered_players()])
+
+        # Nobody reclaims Player 1, who then leaves like any disconnected player
+        player_1 = room.state_manager.get_recovered_players()[0]
+        room.process_event(Event(create_event("player_left", '{}'), player_1.websocket))
+        self.assertEqual(["Player 2"], room.state_manager.get_connected_players())
+        self.assertEqual("Player 2", game_engine.current_turn.player.name)
+
+    async def test_recover_drops_partially_written_record(self):
+        self.play("table-1", "player_joined", '{"player_name":"Player 1"}')
+        self.play("table-1", "game_started", '{"player_name":"Player 1"}')
+        await self.event_log.flush()
+        segment_path = glob.glob(os.path.join(self.directory.name, "events-*.log"))[0]
+        with open(segment_path, "a") as segment:
+            segment.write('{"sequence": 3, "room": "table-1", "mess')
+
+        event_log, rooms = self.recover()
+        self.assertSameRooms(self.rooms, rooms)
+        self.assertEqual(2, event_log.sequence)
+        with open(segment_path) as segment:
+            self.assertEqual(2, len(segment.read().splitlines()))
+
+    async def test_recover_forgets_evicted_rooms(self):
+        self.play("table-1", "player_joined", '{"player_name":"Player 1"}')
+        self.rooms.evict_idle_rooms(now=self.rooms.get_room("table-1").last_active + 301)
+        await self.event_log.flush()
+
+        event_log, rooms = self.recover()
+        self.assertEqual(0, len(rooms))
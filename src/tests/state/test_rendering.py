@@ -0,0 +1,25 @@
+import json
+import unittest
+
+from src.app.state.rendering import FragmentCache, encode_member, render_update
+
+
+class TestRendering(unittest.TestCase):
+    def test_render_update_matches_json_dumps(self):
+        data = {"players": ["Player 1", "Player 2"], "current_turn": {"player": "Player 1", "roll_count": 2},
+                "chat_transcript": ['6:28AM  Player 1: "quotes" \\ and ünïcode']}
+        rendered = render_update("game_state_delta", 1626828897.5, 3, [encode_member(name, value) for name, value in data.items()])
+        self.assertEqual(json.dumps({"timestamp": 1626828897.5, "type": "game_state_delta", "version": 3, "data": data}), rendered)
+        self.assertEqual('{"timestamp": 1.0, "type": "game_state_update", "version": 0, "data": {}}',
+                         render_update("game_state_update", 1.0, 0, []))
+
+    def test_fragment_cache_encodes_once_per_key(self):
+        cache = FragmentCache()
+        values = iter([["first"], ["second"]])
+        self.assertEqual('"players": ["first"]', cache.get("players", 1, lambda: next(values)))
+        self.assertEqual('"players": ["first"]', cache.get("players", 1, lambda: next(values)))
+        self.assertEqual('"players": ["second"]', cache.get("players", 2, lambda: next(values)))
+        self.assertEqual(2, cache.encoded_count)
+        cache.clear()
+        self.assertEqual('"players": ["third"]', cache.get("players", 2, lambda: ["third"]))
+        self.assertEqual(3, cache.encoded_count)
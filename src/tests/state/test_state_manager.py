@@ -1,7 +1,8 @@
+import json
 import unittest
 
 from src.app.events.event import Event
-from src.app.state.state_manager import StateManager
+from src.app.state.state_manager import HANDLER_LATENCY, StateManager
 
 from pprint import pformat
 
@@ -28,6 +29,106 @@ class TestStateManager(unittest.TestCase):
         self.assertIn('"player": "Player 1", "valid_scores": {', current_state)
         self.assertEqual(5, len(self.state_manager.game_engine.current_turn.last_roll.dice))
 
+    def test_publish_state_delta_after_player_joined_is_full_snapshot(self):
+        state_delta = json.loads(self.state_manager.publish_state_delta())
+        self.assertEqual("game_state_update", state_delta["type"])
+        self.assertEqual(1, state_delta["version"])
+        self.assertEqual(["Player 1", "Player 2"], state_delta["data"]["players"])
+
+    def test_publish_state_delta_only_contains_changes(self):
+        start_game_message = '{"timestamp":1626828897580,"type":"game_started","data":{"player_name":"Player 2"}}'
+        self.state_manager.start_game(Event(message=start_game_message, websocket="foo"))
+        self.state_manager.publish_state_delta()
+
+        chat_message = '{"timestamp":1626828901443,"type":"chat_message","data":{"player_name":"Player 1","content":"Hello world.","destination":"all"}}'
+        self.state_manager.send_chat_message(Event(message=chat_message, websocket="foo"))
+        state_delta = json.loads(self.state_manager.publish_state_delta())
+        self.assertEqual("game_state_delta", state_delta["type"])
+        self.assertEqual(2, state_delta["version"])
+        self.assertEqual(["chat_transcript"], list(state_delta["data"]))
+        self.assertEqual(1, len(state_delta["data"]["chat_transcript"]))
+        self.assertIn("Player 1: Hello world.", state_delta["data"]["chat_transcript"][0])
+
+        score_selected_message = '{"timestamp":1626828901443,"type":"score_selected","data":{"player_name":"Player 1","selected_score_type":"chance"}}'
+        self.state_manager.score_selected(Event(message=score_selected_message, websocket="foo"))
+        state_delta = json.loads(self.state_manager.publish_state_delta())
+        self.assertEqual(3, state_delta["version"])
+        self.assertEqual(["CHANCE"], list(state_delta["data"]["scorecards"]["Player 1"]["scores"]))
+        self.assertEqual("Player 2", state_delta["data"]["current_turn"]["player"])
+        self.assertEqual(2, len(state_delta["data"]["game_transcript"]))
+        self.assertNotIn("chat_transcript", state_delta["data"])
+
+    def test_private_transcripts_only_go_to_participants(self):
+        player_joined_3 = '{"timestamp":1626829899580,"type":"player_joined","data":{"player_name":"Player 3"}}'
+        self.state_manager.add_connected_player(Event(message=player_joined_3, websocket="baz"))
+        self.state_manager.publish_state_delta()
+        self.assertEqual({}, self.state_manager.private_transcripts)
+
+        private_message = '{"timestamp":1626828901443,"type":"chat_message","data":{"player_name":"Player 2","content":"Psst.","destination":"Player 1"}}'
+        self.state_manager.send_chat_message(Event(message=private_message, websocket="bar"))
+        reply = '{"timestamp":1626828901443,"type":"chat_message","data":{"player_name":"Player 1","content":"Hi.","destination":"Player 2"}}'
+        self.state_manager.send_chat_message(Event(message=reply, websocket="foo"))
+        self.assertEqual(["Player 1/Player 2"], list(self.state_manager.private_transcripts))
+
+        state_delta, player_deltas = self.state_manager.publish_state_deltas()
+        self.assertNotIn("private_transcripts", json.loads(state_delta)["data"])
+        self.assertEqual(["Player 1", "Player 2"], sorted(player_deltas))
+        player_2_delta = json.loads(player_deltas["Player 2"])
+        self.assertEqual(2, player_2_delta["version"])
+        self.assertEqual(["Player 2/Player 1"], list(player_2_delta["data"]["private_transcripts"]))
+        self.assertEqual(2, len(player_2_delta["data"]["private_transcripts"]["Player 2/Player 1"]))
+
+        self.assertEqual({}, json.loads(self.state_manager.publish_current_state("Player 3"))["data"]["private_transcripts"])
+        player_1_state = json.loads(self.state_manager.publish_current_state("Player 1"))
+        self.assertIn("Player 2: Psst.", player_1_state["data"]["private_transcripts"]["Player 1/Player 2"])
+
+    def test_private_messages_to_anyone_but_a_player_are_ignored(self):
+        self.state_manager.publish_state_delta()
+        for sender, destination in [("Player 1", "Nobody"), ("Nobody", "Player 1"), ("Player 1", "Player 1 ")]:
+            private_message = json.dumps({"timestamp": 1626828901443, "type": "chat_message",
+                                          "data": {"player_name": sender, "content": "Psst.", "destination": destination}})
+            self.state_manager.send_chat_message(Event(message=private_message, websocket="foo"))
+        self.assertEqual({}, self.state_manager.private_transcripts)
+        state_delta, player_deltas = self.state_manager.publish_state_deltas()
+        self.assertEqual({}, player_deltas)
+
+    def test_bots_need_a_name_nobody_else_has(self):
+        for bot_name in ("Player 1", "Bot", "Bot"):
+            self.state_manager.process_event(Event(json.dumps({"timestamp": 1626828897580, "type": "bot_added",
+                                                               "data": {"player_name": "Player 1", "bot_name": bot_name}}), "foo"))
+        self.assertEqual(["Player 1", "Player 2", "Bot"], [player.name for player in self.state_manager.players])
+        self.assertEqual(1, len(self.state_manager.get_bot_players()))
+
+    def test_process_event_dispatches_and_times_handlers(self):
+        calls_before = HANDLER_LATENCY.get_count("chat_message")
+        chat_message = '{"timestamp":1626828901443,"type":"chat_message","data":{"player_name":"Player 1","content":"Hello world.","destination":"all"}}'
+        self.state_manager.process_event(Event(message=chat_message, websocket="foo"))
+        self.assertIn("Player 1: Hello world.", self.state_manager.chat_transcript.get_transcript())
+        self.assertEqual(calls_before + 1, HANDLER_LATENCY.get_count("chat_message"))
+
+    def test_publish_current_state_does_not_bump_version(self):
+        self.state_manager.publish_state_delta()
+        current_state = json.loads(self.state_manager.publish_current_state())
+        self.assertEqual(1, current_state["version"])
+
+    def test_chat_reuses_encoded_game_state(self):
+        start_game_message = '{"timestamp":1626828897580,"type":"game_started","data":{"player_name":"Player 2"}}'
+        self.state_manager.process_event(Event(message=start_game_message, websocket="foo"))
+        self.state_manager.publish_current_state("Player 1")
+        scorecards = self.state_manager._fragments.fragments["scorecards"]
+
+        chat_message = '{"timestamp":1626828901443,"type":"chat_message","data":{"player_name":"Player 1","content":"Psst.","destination":"Player 2"}}'
+        self.state_manager.process_event(Event(message=chat_message, websocket="foo"))
+        encoded_count = self.state_manager._fragments.encoded_count
+        snapshots = {player_name: json.loads(self.state_manager.publish_current_state(player_name))
+                     for player_name in ("Player 1", "Player 2")}
+        # A private message changes nothing that's shared, so nothing shared is encoded again for either player
+        self.assertIs(scorecards, self.state_manager._fragments.fragments["scorecards"])
+        self.assertEqual(encoded_count, self.state_manager._fragments.encoded_count)
+        self.assertEqual(["Player 1/Player 2"], list(snapshots["Player 1"]["data"]["private_transcripts"]))
+        self.assertEqual(["Player 2/Player 1"], list(snapshots["Player 2"]["data"]["private_transcripts"]))
+        self.assertEqual(snapshots["Player 1"]["data"]["scorecards"], snapshots["Player 2"]["data"]["scorecards"])
+
 
 """
 import unittest
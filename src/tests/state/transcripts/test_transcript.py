@@ -40,6 +40,32 @@ class TestTranscript(unittest.TestCase):
         self.assertEqual(True, expected_text_2 in self.test_transcript.get_transcript())
         self.assertEqual(True, expected_text_3 in self.test_transcript.get_transcript())
 
+    def test_transcript_is_newest_first_and_cached(self):
+        rendered = self.test_transcript.get_transcript()
+        self.assertEqual(3, len(rendered.splitlines()))
+        self.assertIn("Player 3: Hello...", rendered.splitlines()[0])
+        self.assertIs(rendered, self.test_transcript.get_transcript())
+
+        self.test_transcript.add_message(self.chat_msg_1)
+        self.assertIn("Player 1: Hello world!", self.test_transcript.get_transcript().splitlines()[0])
+
+    def test_messages_since(self):
+        self.assertEqual(list(self.test_transcript.transcript_list)[1:], self.test_transcript.get_messages_since(1))
+        self.assertEqual([self.chat_msg_2.text], self.test_transcript.get_messages_since(1, limit=1))
+        self.assertEqual([self.chat_msg_1.text], self.test_transcript.get_messages_since(0, limit=1))
+        self.assertEqual([], self.test_transcript.get_messages_since(3))
+
+    def test_old_messages_are_dropped(self):
+        transcript = Transcript(max_messages=2)
+        for message in (self.chat_msg_1, self.chat_msg_2, self.chat_msg_3):
+            transcript.add_message(message)
+        self.assertEqual(2, len(transcript.transcript_list))
+        self.assertEqual(3, transcript.get_message_count())
+        self.assertEqual(1, transcript.get_first_message_index())
+        self.assertEqual([self.chat_msg_2.text, self.chat_msg_3.text], transcript.get_messages_since(0))
+        self.assertEqual([self.chat_msg_3.text], transcript.get_messages_since(2))
+        self.assertEqual([self.chat_msg_3.text, self.chat_msg_2.text], transcript.get_transcript().splitlines())
+
 
 if __name__ == '__main__':
     unittest.main()
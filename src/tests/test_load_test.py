@@ -0,0 +1,69 @@
+import json
+import os
+import random
+import unittest
+
+import websockets
+
+from src.app.events.event_broker import EventBroker
+from src.app.load_test import LatencyRecorder, LoadTest, SimulatedClient, percentile
+from src.app.util.config import Config
+
+
+class TestLatencyRecorder(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(50, percentile(values, 0.5))
+        self.assertEqual(99, percentile(values, 0.99))
+        self.assertEqual(1, percentile(values, 0))
+        self.assertEqual(7, percentile([7], 0.99))
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_summarize(self):
+        latencies = LatencyRecorder()
+        for seconds in (0.001, 0.002, 0.003):
+            latencies.record("rolled_dice", seconds)
+        latencies.record("chat_message", 0.010)
+        summary = latencies.summarize()
+        self.assertEqual({"count": 3, "p50_ms": 2.0, "p99_ms": 3.0, "max_ms": 3.0}, summary["rolled_dice"])
+        self.assertEqual(4, summary["all"]["count"])
+        self.assertEqual(10.0, summary["all"]["max_ms"])
+
+
+class TestSimulatedClient(unittest.TestCase):
+    def test_dropped_events_are_reported(self):
+        load_test = LoadTest("ws://127.0.0.1:8081", rooms=1, players_per_room=2, duration=1)
+        client = SimulatedClient(load_test, load_test.rooms[0], "player-1", random.Random(1))
+        load_test.events_sent = {"chat_message": 3, "rolled_dice": 1}
+        for event_type in ("chat_message", "chat_message", None):
+            client.receive(json.dumps({"timestamp": 1626828897580, "type": "message_dropped",
+                                       "data": {"event_type": event_type, "limit": "connection"}}))
+        throughput = load_test.report(elapsed=1)["throughput"]
+        self.assertEqual(3, throughput["events_dropped"])
+        self.assertEqual({"chat_message": 2, "invalid": 1}, throughput["events_dropped_by_type"])
+        self.assertEqual(1, throughput["events_handled_per_second"])
+
+
+class TestLoadTest(unittest.IsolatedAsyncioTestCase):
+    async def test_short_run(self):
+        config = Config()
+        config.EVENT_LOG_DIRECTORY = None
+        config.CONNECTION_RATE, config.ROOM_RATE, config.GAMEPLAY_RATE = 0, 0, 0
+        server = await websockets.serve(EventBroker(config).broker, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            load_test = LoadTest(f"ws://127.0.0.1:{port}", rooms=2, players_per_room=2, duration=1.5, ramp=0.2,
+                                 think_time=0.01, chat_interval=0.2, seed=1, server_pid=os.getpid())
+            report = await load_test.run()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+        self.assertEqual({"connected": 4, "failed": 0}, report["clients"])
+        self.assertGreater(report["throughput"]["events_sent_by_type"]["rolled_dice"], 0)
+        self.assertGreater(report["throughput"]["events_sent_by_type"]["chat_message"], 0)
+        self.assertEqual(0, report["throughput"]["events_dropped"])
+        self.assertGreater(report["latency"]["rolled_dice"]["count"], 0)
+        self.assertGreater(report["latency"]["chat_message"]["count"], 0)
+        self.assertLessEqual(report["latency"]["all"]["p50_ms"], report["latency"]["all"]["p99_ms"])
+        self.assertIsNotNone(report["server"]["rss_mb"])
@@ -0,0 +1,74 @@
+import json
+import unittest
+
+from src.app.events.event import Event, EventType
+from src.app.state.state_manager import StateManager
+from src.app.util.codec import BinaryCodec, OrjsonCodec, StdlibJsonCodec, get_json_codec, orjson
+
+
+class TestBinaryCodec(unittest.TestCase):
+    def setUp(self):
+        self.codec = BinaryCodec()
+
+    def test_round_trips_json_values(self):
+        values = [None, True, False, 0, 127, 128, -1, -300, 2 ** 40, 1626828897.58, "", "CHANCE", "ünïcode",
+                  [], {}, {"player_name": "Player 1", "scores": {"ONES": None, "CHANCE": 23}, "nested": [[1, "a"], {}]}]
+        for value in values:
+            with self.subTest(value=value):
+                self.assertEqual(value, self.codec.decode(self.codec.encode(value)))
+
+    def test_turn_packs_into_a_few_dozen_bytes(self):
+        dice = [{"die_id": die_id, "face_value": face_value} for die_id, face_value in zip(range(1, 6), [3, 3, 5, 1, 6])]
+        self.assertEqual(32, len(self.codec.encode(dice)))
+        self.assertLess(len(self.codec.encode(dice)), len(json.dumps(dice)) / 4)
+
+    def test_rejects_malformed_messages(self):
+        encoded = self.codec.encode({"type": "chat_message", "data": {"content": "Hello"}})
+        for message in [b"", encoded[:-1], encoded + b"\x00", b"\x1f", b"\x06\xff\xff\xff\xff\x0f", "text", b"\x7f"]:
+            with self.subTest(message=message):
+                with self.assertRaises(ValueError):
+                    self.codec.decode(message)
+
+    def test_update_is_encoded_once_for_every_client(self):
+        payload = json.dumps({"type": "game_state_delta", "version": 3, "data": {"game_started": True}})
+        encoded = self.codec.encode_update(payload)
+        self.assertIs(encoded, self.codec.encode_update(payload))
+        self.assertEqual(json.loads(payload), self.codec.decode(encoded))
+
+    def test_binary_events_decode_like_json(self):
+        message = {"timestamp": 1626828901443, "type": "chat_message",
+                   "data": {"player_name": "Player 1", "content": "Hello", "destination": "all"}}
+        event = Event(self.codec.encode(message), websocket="foo", codec=self.codec)
+        self.assertTrue(event.is_valid)
+        self.assertEqual(EventType.CHAT_MESSAGE, event.event_type)
+        self.assertEqual(message["data"], event.data)
+        self.assertFalse(Event(json.dumps(message), websocket="foo", codec=self.codec).is_valid)
+
+
+class TestJsonCodecs(unittest.TestCase):
+    def test_get_json_codec(self):
+        self.assertIsInstance(get_json_codec("stdlib"), StdlibJsonCodec)
+        self.assertIsInstance(get_json_codec("auto"), StdlibJsonCodec if orjson is None else OrjsonCodec)
+        with self.assertRaises(ValueError):
+            get_json_codec("yaml")
+
+    def test_encoded_size_is_in_utf8_bytes(self):
+        self.assertEqual(len(json.dumps("Plåyer")), StdlibJsonCodec().get_encoded_size(json.dumps("Plåyer")))
+        self.assertEqual(3, BinaryCodec().get_encoded_size(b"\x05\x01a"))
+        if orjson is not None:
+            self.assertEqual(len('"Plåyer"') + 1, OrjsonCodec().get_encoded_size(OrjsonCodec().encode("Plåyer")))
+
+    @unittest.skipIf(orjson is None, "orjson is not installed")
+    def test_orjson_updates_decode_the_same(self):
+        state_managers = [StateManager(codec=codec) for codec in (StdlibJsonCodec(), OrjsonCodec())]
+        for state_manager in state_managers:
+            for player_name in ("Player 1", "Plåyer 2"):
+                state_manager.process_event(Event(json.dumps({"timestamp": 1626828897580, "type": "player_joined",
+                                                              "data": {"player_name": player_name}}), "foo"))
+        stdlib_state, orjson_state = [json.loads(state_manager.publish_current_state("Player 1", timestamp=1.5))
+                                      for state_manager in state_managers]
+        self.assertEqual(stdlib_state, orjson_state)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import io
+import json
+import logging
+import logging.handlers
+import queue
+import unittest
+
+from src.app.util.log import DeferredQueueHandler, JsonFormatter, LazyPformat, SAMPLED, SamplingFilter
+
+
+class CountingRepr:
+    def __init__(self):
+        self.repr_count = 0
+
+    def __repr__(self):
+        self.repr_count += 1
+        return "counted"
+
+
+class TestLog(unittest.TestCase):
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.handler = logging.StreamHandler(self.stream)
+        self.log = logging.getLogger("test_log")
+        self.log.propagate = False
+        self.log.setLevel(logging.INFO)
+        self.log.addHandler(self.handler)
+
+    def tearDown(self):
+        self.log.removeHandler(self.handler)
+
+    def test_lazy_pformat_only_formats_written_lines(self):
+        value = CountingRepr()
+        self.log.debug("State: %s", LazyPformat([value]))
+        self.assertEqual(0, value.repr_count)
+        self.log.info("State: %s", LazyPformat([value]))
+        self.assertGreater(value.repr_count, 0)
+        self.assertEqual("State: [counted]\n", self.stream.getvalue())
+
+    def test_sampling_keeps_one_in_n_per_line(self):
+        self.handler.addFilter(SamplingFilter(3))
+        for i in range(7):
+            self.log.info("sampled %d", i, extra=SAMPLED)
+            self.log.info("kept %d", i)
+        lines = self.stream.getvalue().splitlines()
+        self.assertEqual(["sampled 0", "sampled 3", "sampled 6"], [line for line in lines if line.startswith("sampled")])
+        self.assertEqual(7, len([line for line in lines if line.startswith("kept")]))
+
+    def test_json_formatter(self):
+        self.handler.setFormatter(JsonFormatter())
+        self.log.info("Creating room: %s", "abc", extra={"room_id": "abc"})
+        entry = json.loads(self.stream.getvalue())
+        self.assertEqual("INFO", entry["level"])
+        self.assertEqual("test_log", entry["logger"])
+        self.assertEqual("Creating room: abc", entry["message"])
+        self.assertEqual("abc", entry["room_id"])
+        self.assertIn("time", entry)
+
+    def test_deferred_queue_handler_formats_on_the_listener(self):
+        self.log.removeHandler(self.handler)
+        log_queue = queue.Queue()
+        listener = logging.handlers.QueueListener(log_queue, self.handler)
+        queue_handler = DeferredQueueHandler(log_queue)
+        self.log.addHandler(queue_handler)
+        value = CountingRepr()
+        try:
+            self.log.info("State: %s", LazyPformat([value]))
+            # Queued as it was logged, nothing has been formatted yet
+            self.assertEqual(1, log_queue.qsize())
+            self.assertEqual(0, value.repr_count)
+        finally:
+            listener.start()
+            listener.stop()
+            self.log.removeHandler(queue_handler)
+        self.assertEqual("State: [counted]\n", self.stream.getvalue())
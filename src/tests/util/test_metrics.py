@@ -0,0 +1,70 @@
+import asyncio
+import unittest
+
+from src.app.util.metrics import Counter, Histogram, MetricsRegistry
+from src.app.util.metrics_server import MetricsServer
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counter_counts_per_label(self):
+        counter = Counter("events_total", "Events", label_names=["event_type"])
+        counter.inc("chat_message")
+        counter.inc("chat_message", amount=2)
+        counter.inc("rolled_dice")
+        self.assertEqual(3, counter.get("chat_message"))
+        self.assertEqual(1, counter.get("rolled_dice"))
+        self.assertEqual(0, counter.get("score_selected"))
+
+    def test_histogram_buckets(self):
+        histogram = Histogram("latency_seconds", "Latency", label_names=["event_type"], buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, "chat_message")
+        self.assertEqual(4, histogram.get_count("chat_message"))
+        self.assertAlmostEqual(3.65, histogram.get_sum("chat_message"))
+        self.assertEqual([(0.1, 2), (1, 3), (float("inf"), 4)], histogram.get_cumulative_counts("chat_message"))
+        self.assertEqual(0, histogram.get_count("rolled_dice"))
+
+    def test_histogram_time(self):
+        histogram = Histogram("latency_seconds", "Latency")
+        with histogram.time():
+            pass
+        self.assertEqual(1, histogram.get_count())
+
+    def test_registry_returns_same_metric(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("events_total", "Events")
+        self.assertIs(counter, registry.counter("events_total", "Events"))
+        with self.assertRaises(ValueError):
+            registry.histogram("events_total", "Events")
+
+
+class TestMetricsRendering(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.registry.counter("events_total", "Events", label_names=["event_type"]).inc('say "hi"')
+        self.registry.gauge("sockets", "Sockets", function=lambda: 3)
+        self.registry.histogram("latency_seconds", "Latency", buckets=(0.1,)).observe(0.05)
+
+    def test_render(self):
+        lines = self.registry.render().splitlines()
+        self.assertIn("# TYPE events_total counter", lines)
+        self.assertIn('events_total{event_type="say \\"hi\\""} 1', lines)
+        self.assertIn("sockets 3", lines)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 1', lines)
+        self.assertIn("latency_seconds_count 1", lines)
+
+    async def test_metrics_server(self):
+        server = await MetricsServer(self.registry, "127.0.0.1", 0).start()
+        port = server.server.sockets[0].getsockname()[1]
+        try:
+            for path, expected_status in (("/metrics", b"200"), ("/", b"404")):
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+                response = await reader.read()
+                writer.close()
+                self.assertIn(expected_status, response.split(b"\r\n", 1)[0])
+                if expected_status == b"200":
+                    self.assertIn(b"sockets 3", response)
+        finally:
+            await server.close()